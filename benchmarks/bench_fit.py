@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Benchmark the four level trace model against its original expression
+and the cost of a global fit of several traces against a single trace.
+
+Run with: `python benchmarks/bench_fit.py`
+"""
+
+import sys
+import timeit
+from pathlib import Path
+import numpy as np
+import pysfg
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'tests'))
+from test_fit import four_level_reference  # noqa: E402
+
+params = (0.04, 1.9, 0.7, 0.85, 0.1, 0.15, -1)
+
+if __name__ == "__main__":
+    for size in (35, 1000):
+        t = np.linspace(-1, 10, size)
+        cases = {
+            'reference model': lambda: four_level_reference(t, *params),
+            'model': lambda: pysfg.fit.TraceFourLevel.model(None, t, *params),
+            'jacobian': lambda: pysfg.fit.TraceFourLevel.jacobian(None, t, *params),
+        }
+        print('Points: {}'.format(size))
+        for name, func in cases.items():
+            number = 200
+            time = min(timeit.repeat(func, number=number, repeat=5))/number
+            print('{:<25} {:8.3f} ms'.format(name, time*1000))
+
+    t = np.linspace(-1, 10, 35)
+    y = pysfg.fit.TraceFourLevel.model(None, t, *params)
+    start = dict(zip(('Amp', 't1', 't2', 'c', 'mu', 'sigma', 'offset'), params))
+    fits = {'single trace': pysfg.fit.TraceFourLevel(t, y, **start)}
+    for traces in (3, 10):
+        fits['global {} traces'.format(traces)] = pysfg.fit.GlobalFit(
+            [t]*traces, [y]*traces, shared=('t2', 'mu', 'sigma'), **start
+        )
+    print('Cost and gradient of 35 points per trace')
+    for name, fit in fits.items():
+        par = fit.minuit.np_values()
+        number = 200
+        time = min(timeit.repeat(
+            lambda: (fit.lsq(*par), fit.lsq.grad(*par)), number=number, repeat=5
+        ))
+        print('{:<25} {:8.3f} ms'.format(name, time/number*1000))
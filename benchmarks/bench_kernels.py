@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Benchmark the fused kernels against the plain numpy expressions.
+
+Run with: `python benchmarks/bench_kernels.py`
+"""
+
+import timeit
+import numpy as np
+import pysfg
+
+shape = (200, 1600)
+rng = np.random.default_rng(0)
+a, b = rng.uniform(1, 2, shape), rng.uniform(1, 2, shape)
+aE, bE = rng.uniform(0, 0.1, shape), rng.uniform(0, 0.1, shape)
+out, outE = np.empty(shape), np.empty(shape)
+
+
+def difference_expression():
+    return a - b, np.sqrt(aE**2 + bE**2)
+
+
+def ratio_expression():
+    return a / b, np.sqrt((aE/b)**2 + (a*bE/b**2)**2)
+
+
+cases = {
+    'difference expression': difference_expression,
+    'difference kernel': lambda: pysfg.kernels.difference(a, aE, b, bE),
+    'difference kernel out': lambda: pysfg.kernels.difference(a, aE, b, bE, out, outE),
+    'ratio expression': ratio_expression,
+    'ratio kernel': lambda: pysfg.kernels.ratio(a, aE, b, bE),
+    'ratio kernel out': lambda: pysfg.kernels.ratio(a, aE, b, bE, out=out, outE=outE),
+}
+if pysfg.kernels.numexpr:
+    cases['ratio kernel numexpr'] = lambda: pysfg.kernels.ratio(
+        a, aE, b, bE, out=out, outE=outE, backend='numexpr'
+    )
+
+if __name__ == "__main__":
+    print('Shape: {}'.format(shape))
+    for name, func in cases.items():
+        number = 100
+        time = min(timeit.repeat(func, number=number, repeat=5))/number
+        print('{:<25} {:8.3f} ms'.format(name, time*1000))
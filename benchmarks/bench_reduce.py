@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Benchmark the scan reduction against np.median and scipy.stats.sem.
+
+Run with: `python benchmarks/bench_reduce.py`
+"""
+
+import os
+import timeit
+import numpy as np
+from scipy.stats import sem
+import pysfg
+
+shape = (100, 50, 1600)
+rng = np.random.default_rng(0)
+data = rng.normal(1000, 30, shape)
+
+
+def numpy_reduction():
+    return np.median(data, axis=1), sem(data, axis=1)
+
+
+cases = {'numpy median and sem': numpy_reduction}
+threads = 1
+while threads <= (os.cpu_count() or 1):
+    cases['aggregate {} threads'.format(threads)] = lambda threads=threads: pysfg.reduce.aggregate(
+        data, ('median', 'sem'), threads=threads
+    )
+    threads *= 2
+
+if __name__ == "__main__":
+    print('Shape: {}'.format(shape))
+    serial = pysfg.reduce.aggregate(data, ('median', 'sem'), threads=1)
+    for name, func in cases.items():
+        number = 5
+        time = min(timeit.repeat(func, number=number, repeat=3))/number
+        print('{:<25} {:8.3f} ms'.format(name, time*1000))
+    parallel = pysfg.reduce.aggregate(data, ('median', 'sem'))
+    print('Bit identical: {}'.format(all(
+        np.array_equal(serial[name], parallel[name]) for name in serial
+    )))
@@ -1,9 +1,10 @@
 # pysfg init file
 
-from . import read, calibration, spectrum, experiments, fit, plot, filter
+from . import read, calibration, spectrum, experiments, fit, plot, filter, kernels, rebin, reduce, noise, background
 from .spectrum import (
     Spectrum, PumpProbe, Bleach,
-    json_to_spectrum, json_to_pumpprobe, json_to_bleach, json_to_trace, json_to_PSSHG
+    json_to_spectrum, json_to_pumpprobe, json_to_bleach, json_to_trace,
+    json_to_tracestack, json_to_PSSHG
     )
 
 from .select import SelectorPP
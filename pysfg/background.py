@@ -0,0 +1,203 @@
+"""Library of master background frames.
+
+Background files taken with the same detector settings are combined into
+one master background frame, the median over all their pp_delays and
+scans. Master frames are indexed by the detector settings
+`(exposure_time, gain, tempSet, central_wl, roi)` of the data, so the
+matching background of a measurement is found automatically. The library
+can be saved to a compressed `.npz` cache, which is reused as long as the
+background files are unchanged.
+
+Example:
+```
+library = pysfg.background.BackgroundLibrary.from_files(
+    Path('data').glob('*bg*.dat'), cache='cache/background.npz'
+)
+data = pysfg.read.victor.data_file('data/gold.dat')
+baseline = library.master(data)  # Shape is (spectra, pixel)
+```
+"""
+
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from .read import victor, spe
+from .reduce import aggregate
+
+
+def read_data_file(fname):
+    """Read victor `.dat` or `.spe` data file."""
+    fname = Path(fname)
+    if fname.suffix == '.dat':
+        return victor.data_file(fname)
+    if fname.suffix == '.spe':
+        return spe.data_file(fname)
+    raise ValueError("Can't import %s with suffix %s" % (fname, fname.suffix))
+
+
+def settings(data):
+    """Detector settings of a data dict.
+
+    data: Data dict as returned by `pysfg.read.victor.data_file` or
+      `pysfg.read.spe.data_file`.
+
+    Returns tuple of (exposure_time, gain, tempSet, central_wl, roi). Missing
+    settings are None.
+    """
+    exposure_time = data.get('exposure_time')
+    if not isinstance(exposure_time, type(None)):
+        exposure_time = exposure_time.total_seconds()
+    gain = data.get('gain')
+    if not isinstance(gain, type(None)):
+        gain = float(gain)
+    temperature = data.get('tempSet')
+    if not isinstance(temperature, type(None)):
+        temperature = float(temperature)
+    central_wl = data.get('central_wl')
+    if not isinstance(central_wl, type(None)):
+        central_wl = round(float(central_wl), 3)
+    roi = data.get('roi')
+    if not isinstance(roi, type(None)):
+        roi = json.dumps(roi, sort_keys=True)
+    return (exposure_time, gain, temperature, central_wl, roi)
+
+
+def _sources(files):
+    """Files and their modification times to validate the cache with."""
+    return [[str(Path(fname).resolve()), Path(fname).stat().st_mtime] for fname in files]
+
+
+class BackgroundLibrary:
+    def __init__(self, masters=None, sources=None):
+        """Master background frames indexed by detector settings.
+
+        masters: dict of settings tuple and master frame. The frames are
+          made read only, as they are shared by all measurements.
+        sources: list of background files and their modification times.
+        """
+        self.masters = dict(masters or {})
+        for frame in self.masters.values():
+            frame.setflags(write=False)
+        self.sources = list(sources or [])
+
+    @classmethod
+    def from_files(cls, files, cache=None):
+        """Build library from background files.
+
+        files: Paths of background data files.
+        cache: Optional path of a `.npz` cache file. If it exists and was
+          built from the same unchanged files, the library is loaded from it.
+          Otherwise the library is built and saved to it.
+        """
+        files = sorted(str(fname) for fname in files)
+        sources = _sources(files)
+        if not isinstance(cache, type(None)) and Path(cache).is_file():
+            library = cls.load(cache)
+            if library.sources == sources:
+                return library
+            logging.info('Background files changed. Rebuilding %s', cache)
+
+        frames = {}
+        for fname in files:
+            data = read_data_file(fname)
+            # Pool pp_delays and scans of all files with the same settings.
+            shape = data['data'].shape
+            frames.setdefault(settings(data), []).append(
+                data['data'].reshape((-1,) + shape[2:])
+            )
+        masters = {}
+        for key, stack in frames.items():
+            masters[key] = aggregate(np.concatenate(stack), 'median', axis=0)['median']
+        library = cls(masters, sources)
+        if not isinstance(cache, type(None)):
+            library.save(cache)
+        return library
+
+    def master(self, data):
+        """Master background frame with the detector settings of data.
+
+        data: Data dict of a measurement.
+
+        Returns read only array with the shape of a single frame, e.g.
+        (spectra, pixel) for victor files. Copy it to modify it.
+        """
+        key = settings(data)
+        try:
+            return self.masters[key]
+        except KeyError:
+            raise ValueError('No background with settings %s in library' % (key,))
+
+    def save(self, fname):
+        """Save library to a compressed `.npz` file."""
+        logging.info('Saving to: %s' % fname)
+        arrays = {'frame_%d' % i: frame for i, frame in enumerate(self.masters.values())}
+        np.savez_compressed(
+            fname,
+            keys=json.dumps(list(self.masters.keys())),
+            sources=json.dumps(self.sources),
+            **arrays
+        )
+
+    @classmethod
+    def load(cls, fname):
+        """Load library saved with `save`."""
+        with np.load(fname) as cache:
+            keys = json.loads(str(cache['keys']))
+            masters = {
+                _hashable(key): cache['frame_%d' % i] for i, key in enumerate(keys)
+            }
+            sources = json.loads(str(cache['sources']))
+        return cls(masters, sources)
+
+    def __len__(self):
+        return len(self.masters)
+
+    def __contains__(self, data):
+        return settings(data) in self.masters
+
+
+def _hashable(value):
+    """Turn json lists back into tuples."""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+@lru_cache(maxsize=8)
+def _library(files, cache, mtimes):
+    return BackgroundLibrary.from_files(files, cache)
+
+
+def library(files, cache=None):
+    """Background library of files. Libraries are built once per process
+    and rebuilt if the background files change.
+
+    See `BackgroundLibrary.from_files`.
+    """
+    files = tuple(sorted(str(fname) for fname in files))
+    mtimes = tuple(mtime for _, mtime in _sources(files))
+    if not isinstance(cache, type(None)):
+        cache = str(cache)
+    return _library(files, cache, mtimes)
+
+
+def from_config(config, config_path='.'):
+    """Background library of a configuration.
+
+    config: dict with `files`, a glob pattern or list of glob patterns of
+      background files, and an optional `cache` file. Paths are relative
+      to config_path.
+    """
+    config_path = Path(config_path)
+    patterns = config.get('files')
+    if isinstance(patterns, type(None)):
+        raise ValueError('background_library needs files to build the library from')
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    files = [fname for pattern in patterns for fname in config_path.glob(pattern)]
+    cache = config.get('cache')
+    if not isinstance(cache, type(None)):
+        cache = config_path / Path(cache)
+    return library(files, cache)
@@ -1,7 +1,9 @@
 """Calibration related module"""
 
+from functools import lru_cache
 import numpy as np
 from . import read
+from .select import range_to_slice, nearest_index
 
 class Calibration:
     def __init__(self, central_wl, vis_wl, calib_central_wl, calib_coeff, numberOfPixel=1600):
@@ -13,6 +15,10 @@ class Calibration:
         `Vicotr.wavenumber` is the typically used SFG wavenumber corrected for
         the visible wavelength.
 
+        Calibration objects are immutable and hashable. The axes are computed
+        once and returned as read only arrays. Use `from_parameters` to share
+        calibrations with the same parameters.
+
         central_wl: float, central wavelength of the grating
         vis_wl: float, visible wavelength
         calib_central_wl: float, central wl during calibration
@@ -20,35 +26,71 @@ class Calibration:
         numberOfPixel: horizontal number of camera pixels
 
         """
-        self.central_wl = float(central_wl)
-        self.vis_wl = float(vis_wl)
-        self.calib_coeff = tuple(calib_coeff)
-        self.calib_central_wl = float(calib_central_wl)
-        self.poly = np.poly1d(calib_coeff)
-        self.pixel = np.arange(numberOfPixel)
+        _set = super().__setattr__
+        _set('central_wl', float(central_wl))
+        _set('vis_wl', float(vis_wl))
+        _set('calib_coeff', tuple(calib_coeff))
+        _set('calib_central_wl', float(calib_central_wl))
+        _set('numberOfPixel', int(numberOfPixel))
+        _set('poly', np.poly1d(calib_coeff))
+        _set('pixel', _read_only(np.arange(numberOfPixel)))
+
+        # central_wl and calib_wl correspond to a lateral translation of the calibration
+        # assuming that the grating is chaning linear according to its setting
+        wavelength = self.poly(self.pixel) + self.central_wl - self.calib_central_wl
+        _set('_wavelength', _read_only(wavelength))
+        _set('_frequency', _read_only(_frequency(wavelength)))
+        _set('_wavenumber', _read_only(_wavenumber(wavelength, self.vis_wl)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Calibration objects are immutable')
+
+    @property
+    def key(self):
+        """Tuple of the parameters defining this calibration."""
+        return (
+            self.central_wl, self.vis_wl, self.calib_central_wl, self.calib_coeff,
+            self.numberOfPixel
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Calibration):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
 
     @property
     def wavelength(self):
         """Wavelength of spectrum in nm"""
-
-        # central_wl and calib_wl correspond to a lateral translation of the calibration
-        # assuming that the grating is chaning linear according to its setting
-        return self.poly(self.pixel) + self.central_wl - self.calib_central_wl
+        return self._wavelength
 
     @property
     def frequency(self):
         """Frequency of the signal in wavenumbers. This is before vis subtraction."""
-
-        # 10**7 is the translation factor for wavelength in nm to wavenumber in 1/cm
-        return 10**7/self.wavelength
+        return self._frequency
 
     @property
     def wavenumber(self):
         """The spectral wavenumber in 1/cm after subtraction of the upconversion."""
+        return self._wavenumber
+
+    def wavenumber_to_pixel(self, wavenumber):
+        """Pixel closest to wavenumber. Also works with arrays."""
+        return self.pixel[nearest_index(self.wavenumber, wavenumber)]
+
+    def wavelength_to_pixel(self, wavelength):
+        """Pixel closest to wavelength. Also works with arrays."""
+        return self.pixel[nearest_index(self.wavelength, wavelength)]
 
-        # As the calibration is not that precise anyways,
-        # rounding on 2 digits is more than enough
-        return np.round(10**7/(1/(1/self.wavelength - 1/self.vis_wl)), 2)
+    def wavenumber_slice(self, start=None, stop=None, closed=True):
+        """Slice of pixels with wavenumber between start and stop."""
+        return range_to_slice(self.wavenumber, start, stop, closed)
+
+    def wavelength_slice(self, start=None, stop=None, closed=True):
+        """Slice of pixels with wavelength between start and stop."""
+        return range_to_slice(self.wavelength, start, stop, closed)
 
     def __str__(self):
         str = "Central Wavelength: {}\nVisible Wavelength: {}\nCalibration Coefficients: {}\nCalibration Central Wavelength: {}\n".format(self.central_wl, self.vis_wl, self.calib_coeff, self.calib_central_wl)
@@ -57,26 +99,110 @@ class Calibration:
 
 class Calibration2:
     def __init__(self, vis_wl, wavelength):
-        """Calibrate with a given list of wavelength and the visible wavelength """
-        self.vis_wl = float(vis_wl)
-        self.wavelength = np.array(wavelength)
+        """Calibrate with a given list of wavelength and the visible wavelength
+
+        Calibration2 objects are immutable and hashable. Use `from_wavelength`
+        to share calibrations with the same parameters.
+        """
+        _set = super().__setattr__
+        _set('vis_wl', float(vis_wl))
+        wavelength = _read_only(np.array(wavelength))
+        _set('wavelength', wavelength)
+        _set('_frequency', _read_only(_frequency(wavelength)))
+        _set('_wavenumber', _read_only(_wavenumber(wavelength, self.vis_wl)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Calibration2 objects are immutable')
+
+    @property
+    def key(self):
+        """Tuple of the parameters defining this calibration."""
+        return (self.vis_wl, self.wavelength.dtype.str, self.wavelength.tobytes())
+
+    def __eq__(self, other):
+        if not isinstance(other, Calibration2):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
 
     @property
     def frequency(self):
         """Frequency of the signal in wavenumbers. This is before vis subtraction."""
-
-        # 10**7 is the translation factor for wavelength in nm to wavenumber in 1/cm
-        return 10**7/self.wavelength
+        return self._frequency
 
     @property
     def wavenumber(self):
         """The spectral wavenumber in 1/cm after subtraction of the upconversion."""
+        return self._wavenumber
+
+    def wavenumber_to_pixel(self, wavenumber):
+        """Pixel closest to wavenumber. Also works with arrays."""
+        return nearest_index(self.wavenumber, wavenumber)
+
+    def wavelength_to_pixel(self, wavelength):
+        """Pixel closest to wavelength. Also works with arrays."""
+        return nearest_index(self.wavelength, wavelength)
+
+    def wavenumber_slice(self, start=None, stop=None, closed=True):
+        """Slice of pixels with wavenumber between start and stop."""
+        return range_to_slice(self.wavenumber, start, stop, closed)
+
+    def wavelength_slice(self, start=None, stop=None, closed=True):
+        """Slice of pixels with wavelength between start and stop."""
+        return range_to_slice(self.wavelength, start, stop, closed)
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+def _frequency(wavelength):
+    # 10**7 is the translation factor for wavelength in nm to wavenumber in 1/cm
+    return 10**7/wavelength
+
+
+def _wavenumber(wavelength, vis_wl):
+    # As the calibration is not that precise anyways,
+    # rounding on 2 digits is more than enough
+    return np.round(10**7/(1/(1/wavelength - 1/vis_wl)), 2)
+
 
-        # As the calibration is not that precise anyways,
-        # rounding on 2 digits is more than enough
-        return np.round(10**7/(1/(1/self.wavelength - 1/self.vis_wl)), 2)
+@lru_cache(maxsize=128)
+def _cached_calibration(central_wl, vis_wl, calib_central_wl, calib_coeff, numberOfPixel):
+    return Calibration(central_wl, vis_wl, calib_central_wl, calib_coeff, numberOfPixel)
 
 
+def from_parameters(central_wl, vis_wl, calib_central_wl, calib_coeff, numberOfPixel=1600):
+    """Calibration object shared by all calls with the same parameters.
+
+    The objects are kept in a process wide LRU cache, so files of a
+    campaign with identical calibration parameters share the same object
+    and its axes are only calculated once.
+
+    Arguments are the same as for `Calibration`.
+    """
+    return _cached_calibration(
+        float(central_wl), float(vis_wl), float(calib_central_wl),
+        tuple(float(coeff) for coeff in calib_coeff), int(numberOfPixel)
+    )
+
+
+@lru_cache(maxsize=32)
+def _cached_calibration2(vis_wl, dtype, wavelength):
+    return Calibration2(vis_wl, np.frombuffer(wavelength, dtype=dtype).copy())
+
+
+def from_wavelength(vis_wl, wavelength):
+    """Calibration2 object shared by all calls with the same parameters.
+
+    Arguments are the same as for `Calibration2`.
+    """
+    wavelength = np.asarray(wavelength)
+    return _cached_calibration2(float(vis_wl), wavelength.dtype.str, wavelength.tobytes())
+
 
 def from_victor_header(header):
     """Returns Victor calibration class object by reading a victor data header.
@@ -86,7 +212,7 @@ def from_victor_header(header):
     object. If only the wavenumber is desired, than call .wavenumber on the
     return of this function
     """
-    calib = Calibration(
+    calib = from_parameters(
         header['central_wl'],
         header['vis_wl'],
         header['calib_central_wl'],
@@ -123,7 +249,7 @@ def from_victor_file_wavenumber(fpath):
 # are not saved within the Program, thus I append them here.
 def from_vivian_file(fpath, calib_central_wl=680, calib_coeff=[0.080881, 615.18]):
     header = read.victor.header(fpath)
-    calib = Calibration(
+    calib = from_parameters(
         header['central_wl'],
         header['vis_wl'],
         calib_central_wl,
@@ -1,9 +1,8 @@
 from . import victor, vivian
-import numpy as np
-from scipy.stats import sem
 from ..select import SelectorPP
+from ..reduce import aggregate
 from ..spectrum import Spectrum, PumpProbe
-from ..calibration import Calibration
+from ..calibration import from_parameters
 
 
 
@@ -40,10 +39,9 @@ def spectrum(
 
     # Handle various background data inputs
     if isinstance(background_data, dict):
-        baseline = np.median(
-            background_data['data'][background_select.select],
-            axis=(0, 1)
-        )
+        baseline = aggregate(
+            background_data['data'][background_select.tselect], 'median', axis=(0, 1)
+        )['median']
     elif isinstance(background_data, Spectrum):
         baseline = background_data.intensity
     # Spectrum can handle the input or will fail
@@ -52,18 +50,16 @@ def spectrum(
 
     if not isinstance(data, dict):
         raise NotImplementedError
-    intensity = np.median(
-        data['data'][data_select.select],
-        axis=(0, 1) # Median over pp_delay and scans
-    )
-
-    intensityE = sem(
-        np.median(data['data'][data_select.select], axis=0),
-        axis=(0) # Median over pp_delay sem over scans.
-    )
+    selected = data['data'][data_select.tselect]
+    # Median over pp_delay and scans
+    intensity = aggregate(selected, 'median', axis=(0, 1))['median']
+    # Median over pp_delay sem over scans.
+    intensityE = aggregate(
+        aggregate(selected, 'median', axis=0)['median'], 'sem', axis=0
+    )['sem']
 
     if isinstance(calibration, type(None)):
-        calibration = Calibration(
+        calibration = from_parameters(
             data['central_wl'], data['vis_wl'], data['calib_central_wl'], data['calib_coeff']
         )
     wavenumber = calibration.wavenumber[data_select.pixel]
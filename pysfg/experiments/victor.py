@@ -6,8 +6,9 @@ things easier and faster.
 
 """
 import numpy as np
-from scipy.stats import sem
 from ..select import SelectorPP
+from ..reduce import aggregate
+from ..noise import scan_average
 from ..spectrum import Spectrum, PumpProbe
 from ..calibration import from_victor_header
 
@@ -43,10 +44,9 @@ def spectrum(
 
     # Handle various background data inputs
     if isinstance(background_data, dict):
-        baseline = np.median(
-            background_data['data'][background_select.select],
-            axis=(0, 1)
-        )
+        baseline = aggregate(
+            background_data['data'][background_select.tselect], 'median', axis=(0, 1)
+        )['median']
     elif isinstance(background_data, Spectrum):
         baseline = background_data.intensity
     # Spectrum can handle the input or will fail
@@ -55,10 +55,9 @@ def spectrum(
 
     if not isinstance(data, dict):
         raise NotImplementedError
-    intensity = np.median(
-        data['data'][data_select.select],
-        axis=(0, 1) # Median over pp_delay and scans
-    )
+    intensity = aggregate(
+        data['data'][data_select.tselect], 'median', axis=(0, 1)
+    )['median']
 
     if isinstance(wavenumber, type(None)):
         wavenumber = from_victor_header(
@@ -87,6 +86,7 @@ def pumpProbe(
         wavenumber=None,
         pp_delay=None,
         pixel=None,
+        noise_model=None,
 ):
     """Make pump-probe spectrum object taking the median over the scan axis.
 
@@ -118,6 +118,9 @@ def pumpProbe(
       the above passed data dict.
     pp_delay: Not fully impelemented, but if None, pp_delays is read of the `data`
       dict.
+    noise_model: Optional `pysfg.noise.NoiseModel`. If given, the scans are
+      combined with inverse variance weights instead of the median and the
+      uncertainty of the weighted mean is used as intensityE.
 
     Example:
       see `pysfg/test/pump_probe.py` for example usage.
@@ -130,24 +133,33 @@ def pumpProbe(
         raise NotImplementedError
         # Need to implement alternative default wavenumber
         # Need to implement alternative for pp_delay
-    intensity = np.median(
-        data['data'][data_select.select],
-        axis=(1) # Median scans
-    )
-
-    intensityE = sem(
-        data['data'][intensityE_select.select], axis=(1)
-    )
-
     # Handle various background data inputs
     if isinstance(background_data, dict):
-        baseline = np.median(
-            background_data['data'][background_select.select],
-            axis=(1)
-        )
+        baseline = aggregate(
+            background_data['data'][background_select.tselect], 'median'
+        )['median']
     else:
         baseline = background_data
 
+    if not isinstance(noise_model, type(None)):
+        background = 0
+        if not isinstance(baseline, type(None)):
+            background = np.asarray(baseline)
+            # Broadcast pp_delay resolved baselines against the scan axis
+            if background.ndim == 2:
+                background = background[:, None]
+        intensity, intensityE = scan_average(
+            data['data'][data_select.tselect], noise_model, background
+        )
+    # Median and sem over the scans in one pass, if both use the same data.
+    elif intensityE_select.select == data_select.select:
+        stats = aggregate(data['data'][data_select.tselect], ('median', 'sem'))
+        intensity = stats['median']
+        intensityE = stats['sem']
+    else:
+        intensity = aggregate(data['data'][data_select.tselect], 'median')['median']
+        intensityE = aggregate(data['data'][intensityE_select.tselect], 'sem')['sem']
+
     # Assume norm is correct shape else it will fail
     # during assingment TODO: Add shape checking
     if isinstance(norm, PumpProbe):
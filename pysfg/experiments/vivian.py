@@ -5,13 +5,13 @@ is slightly different.
 
 """
 import numpy as np
-from scipy.stats import sem
 from ..select import SelectorPP
+from ..reduce import aggregate
 from ..spectrum import Spectrum, PumpProbe
-from ..calibration import Calibration
+from ..calibration import from_parameters
 
 # The parameters were determined by Simon
-calibration = lambda central_wl: Calibration(central_wl, 799.7, 680, [0.080881, 615.18])
+calibration = lambda central_wl: from_parameters(central_wl, 799.7, 680, [0.080881, 615.18])
 
 def spectrum(
         data,
@@ -45,10 +45,9 @@ def spectrum(
 
     # Handle various background data inputs
     if isinstance(background_data, dict):
-        baseline = np.median(
-            background_data['data'][background_select.select],
-            axis=(0, 1)
-        )
+        baseline = aggregate(
+            background_data['data'][background_select.tselect], 'median', axis=(0, 1)
+        )['median']
     elif isinstance(background_data, Spectrum):
         baseline = background_data.intensity
     # Spectrum can handle the input or will fail
@@ -57,15 +56,13 @@ def spectrum(
 
     if not isinstance(data, dict):
         raise NotImplementedError
-    intensity = np.median(
-        data['data'][data_select.select],
-        axis=(0, 1) # Median over pp_delay and scans
-    )
-
-    intensityE = sem(
-        np.median(data['data'][data_select.select], axis=0),
-        axis=(0) # Median over pp_delay sem over scans.
-    )
+    selected = data['data'][data_select.tselect]
+    # Median over pp_delay and scans
+    intensity = aggregate(selected, 'median', axis=(0, 1))['median']
+    # Median over pp_delay sem over scans.
+    intensityE = aggregate(
+        aggregate(selected, 'median', axis=0)['median'], 'sem', axis=0
+    )['sem']
 
     if isinstance(wavenumber, type(None)):
         wavenumber = calibration(data['central_wl']).wavenumber[data_select.pixel]
@@ -136,21 +133,20 @@ def pumpProbe(
         raise NotImplementedError
         # Need to implement alternative default wavenumber
         # Need to implement alternative for pp_delay
-    intensity = np.median(
-        data['data'][data_select.select],
-        axis=(1) # Median scans
-    )
-
-    intensityE = sem(
-        data['data'][intensityE_select.select], axis=(1)
-    )
+    # Median and sem over the scans in one pass, if both use the same data.
+    if intensityE_select.select == data_select.select:
+        stats = aggregate(data['data'][data_select.tselect], ('median', 'sem'))
+    else:
+        stats = aggregate(data['data'][data_select.tselect], 'median')
+        stats.update(aggregate(data['data'][intensityE_select.tselect], 'sem'))
+    intensity = stats['median']
+    intensityE = stats['sem']
 
     # Handle various background data inputs
     if isinstance(background_data, dict):
-        baseline = np.median(
-            background_data['data'][background_select.select],
-            axis=(1)
-        )
+        baseline = aggregate(
+            background_data['data'][background_select.tselect], 'median'
+        )['median']
     else:
         baseline = background_data
 
@@ -7,11 +7,12 @@ def heat_time(t, H0, tau=1000, c=0):
     t:        array type
         t time points
 
-    H0:        number
-        Amlitude or max heat of the model
+    H0:        number or array
+        Amlitude or max heat of the model. An array e.g. with one value
+        per pixel is broadcasted against the time axis.
 
-    tau:     number
-        time constant of the heat model
+    tau:     number or array
+        time constant of the heat model. Can be given per pixel like H0.
 
     c:        number
         time offset of the model
@@ -20,42 +21,223 @@ def heat_time(t, H0, tau=1000, c=0):
 
     ----------------
     return
-        array of resulting values
+        array of resulting values with shape (len(t), *shape of H0/tau)
     """
-    HM = lambda x: H0*(1-np.e**(-1*x/tau))+c
-    if hasattr(t, '__iter__'):
-        ret = np.array([HM(time) for time in t])
-        # need to remove negative times, because
-        # model is unphysical in this region
-        mask = np.where(t <= 0)
-        ret[mask] = 0
-        return ret
-    if t <= 0:
-        return 0
-    return HM(t)
-
-def heat_filter(input, times, tau=700, c=0):
-    """Filter input by substracting the last spectrum assuming exponential ingroth of heat."""
-    H0 = input[-1]
+    if np.ndim(t) == 0:
+        if t <= 0:
+            return 0
+        return H0*(1-np.e**(-1*t/tau))+c
+    t = np.asarray(t)
+    ndim = max(np.ndim(H0), np.ndim(tau), np.ndim(c))
+    time = t.reshape(t.shape + (1,)*ndim)
+    with np.errstate(over='ignore'):
+        ret = H0*(1-np.e**(-1*time/tau))+c
+    # need to remove negative times, because
+    # model is unphysical in this region
+    return np.where(time <= 0, 0, ret)
+
+
+def fit_heat(input, times, tau=None, c=0, tail=None, taus=None):
+    """Fit the heat model to the late delays of input for all pixels at once.
+
+    For a given tau the model is linear in H0, so H0 has a closed form
+    least squares solution. If tau is not given, this is done for every
+    tau in taus and the tau with the smallest residual is chosen per pixel.
+
+    input: 2D array of shape (pp_delay, pixel). E.g. `Bleach.normalized`.
+      A 1D trace is treated as a single pixel.
+    times: 1D array of pp_delays
+    tau: number or array with one tau per pixel. If None tau is fitted.
+    c: time offset of the model
+    tail: Smallest pp_delay used for the fit. Defaults to the later half
+      of the positive pp_delays.
+    taus: Candidates for tau. Defaults to 100 log spaced values between
+      1/100 and 10 times the largest pp_delay.
+
+    Returns H0 and tau. Both with one value per pixel.
+    """
+    input = np.asarray(input, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if input.ndim == 1:
+        H0, tau = fit_heat(input[:, None], times, tau, c, tail, taus)
+        return H0[0], tau[0]
+    if isinstance(tail, type(None)):
+        tail = times.max()/2
+    index = times >= max(tail, np.finfo(float).tiny)
+    if not np.any(index):
+        raise ValueError('No positive pp_delays in the tail')
+    t = times[index]
+    y = input[index] - c
+    if isinstance(tau, type(None)):
+        if isinstance(taus, type(None)):
+            taus = np.geomspace(times.max()/100, times.max()*10, 100)
+        taus = np.asarray(taus, dtype=float)
+        # Model shape for each candidate tau: (n_tau, n_tail)
+        g = 1 - np.exp(-t/taus[:, None])
+        gy = g @ y
+        gg = np.sum(g**2, axis=1)[:, None]
+        # Residual up to the constant sum of y**2
+        best = np.argmax(gy**2/gg, axis=0)
+        pixel = np.arange(y.shape[1])
+        return gy[best, pixel]/gg[best, 0], taus[best]
+    tau = np.broadcast_to(tau, y.shape[1:])
+    g = 1 - np.exp(-t[:, None]/tau)
+    return np.sum(g*y, axis=0)/np.sum(g**2, axis=0), tau
+
+
+def heat_filter(input, times, tau=700, c=0, H0=None, tail=None, taus=None, baseline=0):
+    """Filter input by substracting the last spectrum assuming exponential
+    ingroth of heat.
+
+    input: 2D array of shape (pp_delay, pixel)
+    times: 1D array of pp_delays
+    tau: time constant of the heat model. Number, array with one value per
+      pixel or 'auto' to fit it per pixel with `fit_heat`.
+    c: time offset of the model
+    H0: Amplitude of the heat. Defaults to the last spectrum of input.
+      'auto' fits it per pixel with `fit_heat`.
+    tail, taus: Passed to `fit_heat`.
+    baseline: Level of input without heat. E.g. 1 for ratios.
+    """
+    if isinstance(tau, str) and tau == 'auto':
+        H0, tau = fit_heat(input, times, None, c + baseline, tail, taus)
+    elif isinstance(H0, str) and H0 == 'auto':
+        H0, tau = fit_heat(input, times, tau, c + baseline, tail)
+    elif isinstance(H0, type(None)):
+        H0 = input[-1] - baseline
     h = heat_time(times, H0, tau, c)
     return input - h
 
 
-def drift_correction(params, intensity_data, background_data):
+def estimate_drift(intensity_data, background_data=0, roi=slice(None), deg=1):
+    """Estimate drift_correction parameters from the data itself.
+
+    The baseline subtracted intensity is integrated over the roi for every
+    pp_delay and scan in one reduction. Each pp_delay is divided by its
+    mean over the scans, so that only the change during the acquisition
+    remains. A polynom of degree deg is fitted to this relative intensity
+    in acquisition order, i.e. with the pp_delay changing fastest.
+
+    intensity_data: Raw data with (pp_delay, scans, ...) as first axes and
+      pixel as last axis. E.g. 3D or 4D victor data.
+    background_data: Number or array broadcastable to intensity_data.
+    roi: slice of pixels to integrate over.
+    deg: Degree of the drift polynom.
+
+    Returns params for `drift_correction`
+    """
+    intensity_data = np.asarray(intensity_data)
+    axis = tuple(range(2, intensity_data.ndim))
+    background_data = np.broadcast_to(background_data, intensity_data.shape)
+    integral = np.sum(intensity_data[..., roi], axis=axis) - \
+        np.sum(background_data[..., roi], axis=axis)
+    relative = integral/integral.mean(axis=1, keepdims=True)
+    series = relative.flatten(order='F')
+    return np.polyfit(np.arange(len(series)), series, deg)
+
+
+def drift_correction(params, intensity_data, background_data, inplace=False):
     """
-    Apply drift correction by generating a polynom from params and correct intensity_data over time
-    with the polinom.
+    Apply drift correction by generating a polynom from params and correct
+    intensity_data over time with the polinom.
     intensity_data and background data must be 4D Raw Intensity data.
+    background_data can also be anything that broadcasts against intensity_data.
+
+    inplace: If True and intensity_data is a float array, the correction is
+      written into intensity_data. Otherwise a single corrected copy is made.
 
     Return corrected intensity_data
     """
+    if inplace and np.issubdtype(np.asarray(intensity_data).dtype, np.floating):
+        data = intensity_data
+    else:
+        data = np.array(intensity_data, dtype=float)
+    shape = np.shape(data)
+    line = np.poly1d(params)
+    number_of_scans = np.prod(shape[:2])
+    c_factors = line(0)/line(np.arange(number_of_scans))
+    c_factors = np.reshape(c_factors, shape[:2], order='F')
+    c_factors = np.reshape(c_factors, shape[:2] + (1,)*(len(shape) - 2))
     # The correction is only true for the baseline free part
     # Because PumProbe expects the data to contain a baseline, we need
     # to first remove and then add it.
-    _data = intensity_data - background_data
-    line = np.poly1d(params)
-    number_of_scans = np.prod(np.shape(_data)[:2])
-    c_factors = line(0)/line(np.arange(number_of_scans))
-    c_factors = np.reshape(c_factors, np.shape(_data)[:2], order='F')
-    _data = np.transpose(c_factors.T * _data.T)
-    return _data + background_data
+    data -= background_data
+    data *= c_factors
+    data += background_data
+    return data
+
+
+def _find_spikes(data, threshold, window):
+    """Spike mask of a block of data with scans on axis 1 and pixel last."""
+    deviation = data - np.median(data, axis=1, keepdims=True)
+    absolute = np.abs(deviation)
+    if data.shape[1] > 1:
+        # The deviation of the median scan is zero, or the smallest twice
+        # for an even number of scans. Exclude it.
+        absolute = np.sort(absolute, axis=1)[:, 1:]
+    # Pool the median absolute deviation over blocks of neighbouring pixels,
+    # so that the noise estimate is robust also for few scans.
+    mad = np.median(absolute, axis=1, keepdims=True)
+    pixel = mad.shape[-1]
+    window = min(window, pixel)
+    n_blocks = -(-pixel // window)
+    padding = [(0, 0)]*(data.ndim - 1) + [(0, n_blocks*window - pixel)]
+    mad = np.pad(mad, padding, mode='reflect')
+    mad = np.median(mad.reshape(mad.shape[:-1] + (n_blocks, window)), axis=-1)
+    sigma = 1.4826 * np.repeat(mad, window, axis=-1)[..., :pixel]
+    sigma = np.maximum(sigma, np.finfo(float).tiny)
+    limit = threshold * sigma
+
+    # Spikes are narrow. Thus a spike must also stand out from its
+    # neighbouring pixels.
+    padding = [(0, 0)]*(data.ndim - 1) + [(1, 1)]
+    padded = np.pad(deviation, padding, mode='reflect')
+    neighbours = (padded[..., :-2] + padded[..., 2:])/2
+    candidates = deviation > limit
+    mask = candidates & (deviation - neighbours > limit)
+    # Wide spikes: Also flag candidates next to a spike.
+    grown = mask.copy()
+    grown[..., 1:] |= mask[..., :-1]
+    grown[..., :-1] |= mask[..., 1:]
+    mask |= candidates & grown
+    return mask
+
+
+def remove_spikes(data, threshold=6, window=51, chunk_size=16, inplace=False):
+    """Remove cosmic spikes from raw data.
+
+    For every pixel the deviation of each scan from the median over the
+    scans is compared to a robust noise estimate. The noise is the median
+    absolute deviation over the scans, pooled over blocks of `window`
+    neighbouring pixels. Values above `threshold` times the noise that also stand out
+    from their neighbouring pixels are flagged and replaced by the median
+    of the remaining scans. The data is processed in chunks of `chunk_size`
+    pp_delays.
+
+    data: Raw data with (pp_delay, scans, ...) as first axes and pixel as
+      last axis. E.g. 4D victor data or data selected with `SelectorPP`.
+    threshold: Threshold in units of the noise.
+    window: Number of pixels per block of the noise estimate.
+    chunk_size: Number of pp_delays processed at once.
+    inplace: If True and data is a float array, data is cleaned in place.
+
+    Returns cleaned data and a boolean mask of the removed values.
+    """
+    if inplace and np.issubdtype(np.asarray(data).dtype, np.floating):
+        cleaned = data
+    else:
+        cleaned = np.array(data, dtype=float)
+    mask = np.zeros(cleaned.shape, dtype=bool)
+    for start in range(0, cleaned.shape[0], chunk_size):
+        block = slice(start, start + chunk_size)
+        spikes = _find_spikes(cleaned[block], threshold, window)
+        mask[block] = spikes
+        # Replace spikes with the median of the remaining scans. Only
+        # pixels with spikes are touched.
+        columns = np.nonzero(spikes.any(axis=1))
+        values = np.moveaxis(cleaned[block], 1, -1)
+        flagged = np.moveaxis(spikes, 1, -1)[columns]
+        column_values = values[columns]
+        replacement = np.nanmedian(np.where(flagged, np.nan, column_values), axis=-1)
+        values[columns] = np.where(flagged, replacement[:, None], column_values)
+    return cleaned, mask
@@ -4,10 +4,12 @@ Fitting is based in iminnuit. Make yourself famialiar with
 https://github.com/scikit-hep/iminuit
 """
 import numpy as np
+import pandas as pd
 import json
 import logging
 import sys
-from scipy.special import erf, erfc
+from concurrent.futures import ProcessPoolExecutor
+from scipy.special import erf, erfc, erfcx
 from scipy.stats import norm
 from iminuit import Minuit, describe
 from iminuit.util import make_func_code
@@ -32,18 +34,106 @@ def from_json(fname):
     return fit
 
 
+def _convolved_decay(rate, u, sigma):
+    """Unit step exponential decay `exp(-rate*u)` convolved with a normalized
+    gaussian of width sigma. u is the time relative to the gaussian center.
+
+    rate can be an array of shape (rates, 1, ...) to evaluate several decays
+    with one call of each transcendental function. sigma must broadcast
+    against u. Where the argument z of erfc is positive, the scaled
+    complementary error function is used, so the exponential never
+    overflows, also for very fast decays.
+    """
+    u = np.atleast_1d(u)
+    z = (rate*sigma**2 - u)/(np.sqrt(2)*sigma)
+    # Only the transcendental functions are restricted to the masked values
+    exponent_scaled = np.broadcast_to(-u**2/(2*sigma**2), z.shape)
+    exponent = rate**2*sigma**2/2 - rate*u
+    value = np.empty(z.shape)
+    scaled = z > 0
+    direct = ~scaled
+    value[scaled] = 0.5*np.exp(exponent_scaled[scaled])*erfcx(z[scaled])
+    value[direct] = 0.5*np.exp(exponent[direct])*erfc(z[direct])
+    return value
+
+
+def _expand(stack, ndim):
+    """Reshape stack of shape (n, ...) to broadcast against arrays with ndim
+    dimensions along its first axis."""
+    stack = np.asarray(stack)
+    return stack.reshape(stack.shape[:1] + (1,)*(ndim + 1 - stack.ndim) + stack.shape[1:])
+
+
+def _convolved_decay_derivatives(rate, u, sigma, value):
+    """Derivatives of `_convolved_decay` with respect to rate, u and sigma.
+
+    value: Result of `_convolved_decay` for the same arguments.
+    """
+    gauss = np.exp(-u**2/(2*sigma**2))/np.sqrt(2*np.pi)
+    d_rate = (rate*sigma**2 - u)*value - sigma*gauss
+    d_u = gauss/sigma - rate*value
+    d_sigma = rate**2*sigma*value - gauss*(rate + u/sigma**2)
+    return d_rate, d_u, d_sigma
+
+
+def dict_to_json(d, fname):
+    """Export serialized fit d, see `FitBase.dict`, to json file fname."""
+    logging.info('Saving to: %s' % fname)
+    with open(Path(fname), 'w') as outfile:
+        json.dump(d, outfile, indent=2)
+
+
 class LeastSquares:
-    def __init__(self, model, x, y, yerr):
+    def __init__(self, model, x, y, yerr, jacobian=None):
+        """Chi2 cost function of model.
+
+        jacobian: Optional function with the signature of model, that returns
+          the derivatives of the model with respect to all parameters as
+          array of shape (parameters, x). If given, `grad` is the analytic
+          gradient of the cost function.
+        """
         self.model = model  # model predicts y for given x
+        self.jacobian = jacobian
         self.x = np.array(x)
         self.y = np.array(y)
         self.yerr = np.array(yerr)
         self.func_code = make_func_code(describe(self.model)[1:])
 
     def __call__(self, *par):  # par is a variable number of model parameters
-        ym = self.model(self.x, *par)
-        chi2 = sum(((self.y - ym)/self.yerr)**2)
-        return chi2
+        residuals = (self.y - self.model(self.x, *par))/self.yerr
+        return np.dot(residuals, residuals)
+
+    def grad(self, *par):
+        """Gradient of chi2 with respect to the parameters."""
+        residuals = (self.y - self.model(self.x, *par))/self.yerr**2
+        return -2*np.dot(self.jacobian(self.x, *par), residuals)
+
+    def curvature(self, *par):
+        """Gauss-Newton approximation of the second derivatives of chi2 by
+        the parameters, divided by 2."""
+        return np.sum((self.jacobian(self.x, *par)/self.yerr)**2, axis=1)
+
+
+def _init_errors(minuit, lsq, kwargs):
+    """Initial step sizes from the curvature of chi2.
+
+    With an analytic gradient minuit estimates the second derivatives
+    from the initial errors only. Errors not given by the user are
+    therefore taken from the Gauss-Newton approximation of the curvature
+    at the start values. Minuit defaults are kept if the model is not
+    defined at the start values.
+    """
+    try:
+        with np.errstate(all='ignore'):
+            curvature = lsq.curvature(*minuit.values.values())
+    except ZeroDivisionError:
+        return
+    for name, value in zip(minuit.parameters, curvature):
+        if 'error_' + name in kwargs or minuit.fixed[name]:
+            continue
+        if not np.isfinite(value) or value <= 0:
+            continue
+        minuit.errors[name] = np.sqrt(minuit.errordef/value)
 
 
 class FitBase():
@@ -56,17 +146,26 @@ class FitBase():
             yerr = np.ones_like(self.x)
         self.yerr = np.array(yerr)
 
-        self.lsq = LeastSquares(self.model, self.x, self.y, self.yerr)
+        self.lsq = LeastSquares(self.model, self.x, self.y, self.yerr, self.jacobian)
         # set to default to avoid error message
         if not kwargs.get('errordef'):
             kwargs['errordef'] = 1
+        # Analytic gradients save minuit the numerical derivatives
+        if not isinstance(self.jacobian, type(None)):
+            kwargs.setdefault('grad', self.lsq.grad)
         # get the args from line and strip 'x'
         self.minuit = Minuit(self.lsq, **kwargs)
+        if not isinstance(self.jacobian, type(None)):
+            _init_errors(self.minuit, self.lsq, kwargs)
 
     def model(self, *args, **kwargs):
         """This must be implemented by the subcalsses."""
         raise NotImplementedError
 
+    # Subclasses can implement the derivatives of the model with respect
+    # to its parameters. See `LeastSquares`.
+    jacobian = None
+
     @property
     def dict(self):
         """A serialized representation of this fit class"""
@@ -89,9 +188,7 @@ class FitBase():
         """Export json serialized version. fname is a string with a path to
         where to save the serialized json object.
         """
-        logging.info('Saving to: %s' % fname)
-        with open(Path(fname), 'w') as outfile:
-            json.dump(self.dict, outfile, indent=2)
+        dict_to_json(self.dict, fname)
 
 
 class Gaussian(FitBase):
@@ -100,10 +197,52 @@ class Gaussian(FitBase):
         super().__init__(x, y, yerr, **kwargs)
 
     def model(self, x, A, mu, sigma, c):
-        if sigma < 0:
+        if np.any(np.less(sigma, 0)):
             return 0
         return A * norm.pdf(x, mu, sigma) + c
 
+    def jacobian(self, x, A, mu, sigma, c):
+        """Derivatives of the model by A, mu, sigma and c."""
+        x = np.asarray(x, dtype=float)
+        if np.any(np.less(sigma, 0)):
+            return np.zeros((4,) + np.broadcast(x, A, mu, sigma, c).shape)
+        pdf = norm.pdf(x, mu, sigma)
+        u = (x - mu)/sigma
+        return np.array(np.broadcast_arrays(
+            pdf, A*pdf*u/sigma, A*pdf*(u**2 - 1)/sigma, 1.
+        ))
+
+
+def _four_level_populations(Amp, a, c):
+    """Amplitudes of the ground, first and second excited state terms of
+    the four level model. a is `t2/(t1 - t2)`. Parameters are scalars or
+    arrays of the same shape.
+    """
+    return np.array([1 - Amp + c*Amp, -Amp*(1 - a) - c*Amp*(1 + a), Amp*a*(c - 1)])
+
+
+# Pairs of states whose product of populations is a term of the model
+_FOUR_LEVEL_PAIRS = np.array(((0, 0), (1, 1), (2, 2), (0, 1), (0, 2), (1, 2))).T
+# Mixed products appear twice in the square of the sum
+_FOUR_LEVEL_FACTORS = np.where(_FOUR_LEVEL_PAIRS[0] == _FOUR_LEVEL_PAIRS[1], 1, 2)
+
+
+def _four_level_products(p, k1, k2, ndim):
+    """Decay rates and weights of the products of the state populations.
+
+    p: Amplitudes of the states, see `_four_level_populations`.
+    k1, k2: Decay rates of the first and second excited state.
+    ndim: Dimensions of the time array.
+
+    Returns rates and weights, both of shape (6, ...) broadcastable against
+    the time array.
+    """
+    i, j = _FOUR_LEVEL_PAIRS
+    k = np.array([0*k1, k1, k2])
+    factors = _expand(_FOUR_LEVEL_FACTORS, p.ndim - 1)
+    return _expand(k[i] + k[j], ndim), _expand(factors*p[i]*p[j], ndim)
+
+
 class TraceFourLevel(FitBase):
     def __init__(self, x, y, yerr=None,  **kwargs):
         """4 Level model trace
@@ -125,6 +264,11 @@ class TraceFourLevel(FitBase):
         This exact implementation has a problem when t1==t2 exactly. Due to
         numerical constrains this must be avoided.
 
+        The signal is the square of a sum of the exponentially decaying
+        state populations. It is evaluated as the six products of two
+        populations, each a decay convolved with the gaussian, in one
+        broadcasted call of `_convolved_decay`.
+
         If difference instead of ratio is used. The function keeps the same
         due to the distributivity of the convolution and the fact that gaussian
         convolved with -1 gives -1. Therefore only -1 needs to be subtract.
@@ -150,229 +294,54 @@ class TraceFourLevel(FitBase):
         of **t** time values.
 
         """
-        pi=np.pi;
-        #a0 = erf((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/sigma))
-        def mysqrt(x): return np.sqrt(x)
-        aux0=sigma*((t1**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux1=sigma*((t1**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux2=sigma*((t1**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux3=(((t1-t2)**2))*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma)))));
-        aux4=sigma*(t1*(t2*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma)))))));
-        aux5=sigma*(t1*(t2*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma)))))));
-        aux6=sigma*(t1*(t2*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma)))))));
-        aux7=sigma*((t2**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux8=sigma*((t2**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux9=sigma*((t2**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)/\
-        sigma))))));
-        aux10=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux11=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*((t1**2)*(-1.+(erf(aux10))))));
-        aux12=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux13=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux12)))))));
-        aux14=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux15=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux14)))))));
-        aux16=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux17=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux16))))));
-        aux18=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux19=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux18))))));
-        aux20=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux21=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux20)))))));
-        aux22=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux23=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux22)))))));
-        aux24=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux25=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux24))))));
-        aux26=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux27=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux26)))))));
-        aux28=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux29=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux28))))));
-        aux30=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux31=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux30))))));
-        aux32=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux33=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux32))))));
-        aux34=(0.5*((sigma**2)*(t1**-2.)))+((mu/t1)+((0.5*((sigma**2)*(t2**-2.\
-           )))+((mu/t2)+(((sigma**2)/t2)/t1))));
-        aux35=(((2.**-0.5)*mu)/sigma)+((((2.**-0.5)*sigma)/t1)+(((2.**-0.5)*\
-        sigma)/t2));
-        aux36=(mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf((aux35-(((2.**-0.5)*t)/sigma))))))));
-        aux37=(0.5*((sigma**2)*(t1**-2.)))+((mu/t1)+((0.5*((sigma**2)*(t2**-2.\
-           )))+((mu/t2)+(((sigma**2)/t2)/t1))));
-        aux38=(((2.**-0.5)*mu)/sigma)+((((2.**-0.5)*sigma)/t1)+(((2.**-0.5)*\
-        sigma)/t2));
-        aux39=(mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf((aux38-(((2.**-0.5)*t)/sigma)))))));
-        aux40=(0.5*((sigma**2)*(t1**-2.)))+((mu/t1)+((0.5*((sigma**2)*(t2**-2.\
-           )))+((mu/t2)+(((sigma**2)/t2)/t1))));
-        aux41=(((2.**-0.5)*mu)/sigma)+((((2.**-0.5)*sigma)/t1)+(((2.**-0.5)*\
-        sigma)/t2));
-        aux42=(mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf((aux41-(((2.**-0.5)*t)/sigma)))))));
-        aux43=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t2))-(((2.**-0.5)\
-        *t)/sigma);
-        aux44=(np.exp(((2.*((sigma**2)*(t2**-2.)))+(((2.*mu)/t2)+((-2.*t)/t2))\
-           )))*((mysqrt((2.*pi)))*(sigma*((t2**2)*(-1.+(erf(aux43))))));
-        aux45=t1*(t2*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t1))-(t*t1)))/t1)/\
-        sigma))));
-        aux46=(np.exp((0.5*((t1**-2.)*((sigma**2)+((2.*(mu*t1))+(-2.*(t*t1))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux45));
-        aux47=t1*(t2*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t1))-(t*t1)))/t1)/\
-        sigma))));
-        aux48=(np.exp((0.5*((t1**-2.)*((sigma**2)+((2.*(mu*t1))+(-2.*(t*t1))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux47));
-        aux49=(t2**2)*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t1))-(t*t1)))/t1)/\
-        sigma)));
-        aux50=(np.exp((0.5*((t1**-2.)*((sigma**2)+((2.*(mu*t1))+(-2.*(t*t1))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux49));
-        aux51=t1*(t2*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t2))-(t*t2)))/t2)/\
-        sigma))));
-        aux52=(np.exp((0.5*((t2**-2.)*((sigma**2)+((2.*(mu*t2))+(-2.*(t*t2))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux51));
-        aux53=(t2**2)*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t2))-(t*t2)))/t2)/\
-        sigma)));
-        aux54=(np.exp((0.5*((t2**-2.)*((sigma**2)+((2.*(mu*t2))+(-2.*(t*t2))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux53));
-        aux55=(3.*(Amp*aux46))+((Amp*(c*aux48))+((-2.*(Amp*aux50))+((Amp*(c*\
-        aux52))+(Amp*aux54))));
-        aux56=(-2.*((Amp**2)*(c*((np.exp(((aux40-(t/t2))-(t/t1))))*aux42))))+(\
-        ((Amp**2)*(c*aux44))+aux55);
-        aux57=((Amp**2)*((c**2)*((np.exp(((aux34-(t/t2))-(t/t1))))*aux36)))+((\
-        2.*((Amp**2)*((np.exp(((aux37-(t/t2))-(t/t1))))*aux39)))+aux56);
-        aux58=((Amp**2)*aux29)+((-2.*((Amp**2)*(c*aux31)))+(((Amp**2)*((c**2)*\
-        aux33))+aux57));
-        aux59=(2.*((Amp**2)*(c*aux23)))+((-2.*((Amp**2)*aux25))+((2.*((Amp**2)\
-        *(c*aux27)))+aux58));
-        aux60=(-2.*((Amp**2)*aux17))+((2.*((Amp**2)*(c*aux19)))+((2.*((Amp**2)\
-        *aux21))+aux59));
-        aux61=((Amp**2)*((c**2)*aux11))+((3.*((Amp**2)*aux13))+((-2.*((Amp**2)\
-        *(c*aux15)))+aux60));
-        aux62=((Amp**2)*((c**2)*((mysqrt((0.5*pi)))*aux8)))+((Amp*(c*((\
-        mysqrt((2.*pi)))*aux9)))+aux61);
-        aux63=(2.*((Amp**2)*(c*((mysqrt((2.*pi)))*aux6))))+(((Amp**2)*((\
-        mysqrt((0.5*pi)))*aux7))+aux62);
-        aux64=(2.*(Amp*((mysqrt((2.*pi)))*aux4)))+((-2.*(Amp*(c*((mysqrt((\
-        2.*pi)))*aux5))))+aux63);
-        aux65=(Amp*(c*((mysqrt((2.*pi)))*aux2)))+(((mysqrt((0.5*pi)))*(\
-        sigma*aux3))+aux64);
-        aux66=((Amp**2)*((mysqrt((0.5*pi)))*aux0))+(((Amp**2)*((c**2)*((\
-        mysqrt((0.5*pi)))*aux1)))+aux65);
-        aux67=(t2**2)*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t2))-(t*t2)))/t2)/\
-        sigma)));
-        aux68=(np.exp((0.5*((t2**-2.)*((sigma**2)+((2.*(mu*t2))+(-2.*(t*t2))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux67));
-        aux69=t1*(t2*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t2))-(t*t2)))/t2)/\
-        sigma))));
-        aux70=(np.exp((0.5*((t2**-2.)*((sigma**2)+((2.*(mu*t2))+(-2.*(t*t2))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux69));
-        aux71=(t1**2)*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t1))-(t*t1)))/t1)/\
-        sigma)));
-        aux72=(np.exp((0.5*((t1**-2.)*((sigma**2)+((2.*(mu*t1))+(-2.*(t*t1))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux71));
-        aux73=(t1**2)*(erfc(((((2.**-0.5)*(((sigma**2)+(mu*t1))-(t*t1)))/t1)/\
-        sigma)));
-        aux74=(np.exp((0.5*((t1**-2.)*((sigma**2)+((2.*(mu*t1))+(-2.*(t*t1))))\
-           ))))*((mysqrt((2.*pi)))*(sigma*aux73));
-        aux75=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t2))-(((2.**-0.5)\
-        *t)/sigma);
-        aux76=(np.exp(((2.*((sigma**2)*(t2**-2.)))+(((2.*mu)/t2)+((-2.*t)/t2))\
-           )))*((mysqrt((0.5*pi)))*(sigma*((t2**2)*(-1.+(erf(aux75))))));
-        aux77=((((aux66-(Amp*(c*aux68)))-(Amp*aux70))-(Amp*(c*aux72)))-(Amp*\
-        aux74))-((Amp**2)*((c**2)*aux76));
-        aux78=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t2))-(((2.**-0.5)\
-        *t)/sigma);
-        aux79=(np.exp(((2.*((sigma**2)*(t2**-2.)))+(((2.*mu)/t2)+((-2.*t)/t2))\
-           )))*((mysqrt((0.5*pi)))*(sigma*((t2**2)*(-1.+(erf(aux78))))));
-        aux80=(0.5*((sigma**2)*(t1**-2.)))+((mu/t1)+((0.5*((sigma**2)*(t2**-2.)))+((mu/t2)+(((sigma**2)/t2)/t1))));
-        aux81=(((2.**-0.5)*mu)/sigma)+((((2.**-0.5)*sigma)/t1)+(((2.**-0.5)*\
-        sigma)/t2));
-        aux82=(mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf((aux81-(((2.**-0.5)*t)/sigma))))))));
-        aux83=(aux77-((Amp**2)*aux79))-((Amp**2)*((np.exp(((aux80-(t/t2))-(t/\
-        t1))))*aux82));
-        aux84=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux85=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux84)))))));
-        aux86=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t2))-(((2.**-0.5)*\
-        t)/sigma);
-        aux87=(np.exp((((0.5*((sigma**2)*(t2**-2.)))+(mu/t2))-(t/t2))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux86)))))));
-        aux88=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux89=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((2.*pi)))*(sigma*((t1**2)*(-1.+(erf(aux88))))));
-        aux90=((aux83-((Amp**2)*((c**2)*aux85)))-((Amp**2)*aux87))-((Amp**2)*(\
-        c*aux89));
-        aux91=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux92=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((0.5*pi)))*(sigma*((t1**2)*(-1.+(erf(aux91))))));
-        aux93=((((2.**-0.5)*mu)/sigma)+(((mysqrt(2.))*sigma)/t1))-(((2.**-0.5)\
-        *t)/sigma);
-        aux94=(np.exp(((2.*((sigma**2)*(t1**-2.)))+(((2.*mu)/t1)+((-2.*t)/t1))\
-           )))*((mysqrt((0.5*pi)))*(sigma*((t1**2)*(-1.+(erf(aux93))))));
-        aux95=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux96=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*(t1*(t2*(-1.+(erf(aux95)))))));
-        aux97=((aux90-((Amp**2)*((c**2)*aux92)))-((Amp**2)*aux94))-((Amp**2)*(\
-        (c**2)*aux96));
-        aux98=((((2.**-0.5)*mu)/sigma)+(((2.**-0.5)*sigma)/t1))-(((2.**-0.5)*\
-        t)/sigma);
-        aux99=(np.exp((((0.5*((sigma**2)*(t1**-2.)))+(mu/t1))-(t/t1))))*((\
-        mysqrt((2.*pi)))*(sigma*((t1**2)*(-1.+(erf(aux98))))));
-        aux100=sigma*((t2**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*\
-        t)/sigma))))));
-        aux101=sigma*((t2**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*\
-        t)/sigma))))));
-        aux102=((aux97-((Amp**2)*aux99))-((Amp**2)*(c*((mysqrt((2.*pi)))*\
-        aux100))))-(Amp*((mysqrt((2.*pi)))*aux101));
-        aux103=sigma*(t1*(t2*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)\
-        /sigma)))))));
-        aux104=sigma*(t1*(t2*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*t)\
-        /sigma)))))));
-        aux105=(aux102-((Amp**2)*((c**2)*((mysqrt((2.*pi)))*aux103))))-((\
-        Amp**2)*((mysqrt((2.*pi)))*aux104));
-        aux106=sigma*((t1**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*\
-        t)/sigma))))));
-        aux107=sigma*((t1**2)*(1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*\
-        t)/sigma))))));
-        aux108=(aux105-((Amp**2)*(c*((mysqrt((2.*pi)))*aux106))))-(Amp*((\
-        mysqrt((2.*pi)))*aux107));
-        aux109=(((t1-t2)**2))*(-1.-(erf(((((2.**-0.5)*mu)/sigma)-(((2.**-0.5)*\
-        t)/sigma)))));
-        aux110=((2.*pi)**-0.5)*(((t1-t2)**-2.)*(aux108-((mysqrt((0.5*pi)\
-           ))*(sigma*aux109))));
-        output=aux110/sigma + offset
+        u = np.atleast_1d(np.asarray(t, dtype=float) - mu)
+        p = _four_level_populations(Amp, t2/(t1 - t2), c)
+        rates, weights = _four_level_products(p, 1/t1, 1/t2, u.ndim)
+        decays = _convolved_decay(rates, u, sigma)
+        # The unpumped signal before time zero is the complement of the step
+        output = np.sum(weights*decays, axis=0) + 1 - decays[0] + offset
+        if np.ndim(t) == 0:
+            return output[0]
         return output
 
+    def jacobian(self, t, Amp, t1, t2, c, mu, sigma, offset):
+        """Derivatives of the model by all its parameters.
+
+        The model is a sum over the products of the populations of the ground,
+        first and second excited state. Each product is a decay with the sum
+        of the rates of its states, convolved with the gaussian pump pulse.
+        """
+        u = np.atleast_1d(np.asarray(t, dtype=float) - mu)
+        a = t2/(t1 - t2)
+        p = _four_level_populations(Amp, a, c)
+        rates, weights = _four_level_products(p, 1/t1, 1/t2, u.ndim)
+        decays = _convolved_decay(rates, u, sigma)
+        d_rate, d_u, d_sigma = _convolved_decay_derivatives(rates, u, sigma, decays)
+
+        i, j = _FOUR_LEVEL_PAIRS
+        factors = _expand(_FOUR_LEVEL_FACTORS, p.ndim - 1)
+
+        def d_weights(*dp):
+            dp = np.array(dp)
+            return _expand(factors*(dp[i]*p[j] + p[i]*dp[j]), u.ndim)
+
+        # Derivatives of the populations by Amp, c and a
+        dw_dAmp = d_weights(c - 1, -(1 - a) - c*(1 + a), a*(c - 1))
+        dw_dc = d_weights(Amp, -Amp*(1 + a), Amp*a)
+        dw_da = d_weights(0*Amp, Amp*(1 - c), Amp*(c - 1))
+        # Derivatives of the rates by t1 and t2
+        drate_dt1 = -_expand(np.add(i == 1, j == 1, dtype=float), u.ndim)/t1**2
+        drate_dt2 = -_expand(np.add(i == 2, j == 2, dtype=float), u.ndim)/t2**2
+        return np.array([
+            np.sum(dw_dAmp*decays, axis=0),
+            np.sum(dw_da*-t2/(t1 - t2)**2*decays + weights*drate_dt1*d_rate, axis=0),
+            np.sum(dw_da*t1/(t1 - t2)**2*decays + weights*drate_dt2*d_rate, axis=0),
+            np.sum(dw_dc*decays, axis=0),
+            d_u[0] - np.sum(weights*d_u, axis=0),
+            np.sum(weights*d_sigma, axis=0) - d_sigma[0],
+            np.ones(decays.shape[1:]),
+        ])
+
 
 class TraceExponential(FitBase):
     def __init__(self, x, y, yerr=None, **kwargs):
@@ -404,3 +373,224 @@ class TraceExponential(FitBase):
             A * np.exp(((sigma**2 - 2 * t * t1 + 2 * mu * t1)/(2 * t1**2))) *
             erfc((sigma**2 - t * t1 + mu * t1)/(np.sqrt(2) * sigma * t1))
         ) + ofs
+
+    def jacobian(self, t, A, t1, c, mu, ofs, sigma):
+        """Derivatives of the model by all its parameters."""
+        u = np.atleast_1d(np.asarray(t, dtype=float) - mu)
+        rates = _expand([0/t1, 1/t1], u.ndim)
+        values = _convolved_decay(rates, u, sigma)
+        d_rate, d_u, d_sigma = _convolved_decay_derivatives(rates, u, sigma, values)
+        step, decay = values
+        return np.array([
+            -decay,
+            A*d_rate[1]/t1**2,
+            step,
+            A*d_u[1] - c*d_u[0],
+            np.ones(values.shape[1:]),
+            c*d_sigma[0] - A*d_sigma[1],
+        ])
+
+
+class GlobalLeastSquares:
+    def __init__(self, model, jacobian, x, y, yerr, index, names):
+        """Chi2 cost function of a model evaluated for several traces at once.
+
+        model, jacobian: Functions as in `LeastSquares`. They must broadcast
+          parameters of shape (traces, 1) against x.
+        x, y, yerr: Arrays of shape (traces, points). Points with infinite
+          yerr do not contribute.
+        index: Integer array of shape (model parameters, traces) with the
+          index of the global parameter of every model parameter and trace.
+        names: Names of the global parameters.
+        """
+        self.model = model
+        self.jacobian = jacobian
+        self.x = x
+        self.y = y
+        self.weights = 1/yerr
+        self.index = index
+        self.func_code = make_func_code(names)
+
+    def parameters(self, par):
+        """Model parameters of shape (traces, 1) from the global parameters."""
+        return np.asarray(par, dtype=float)[self.index][..., np.newaxis]
+
+    def _collect(self, per_trace, size):
+        """Sum contributions of every model parameter and trace into the
+        global parameters."""
+        return np.bincount(self.index.ravel(), per_trace.ravel(), minlength=size)
+
+    def __call__(self, *par):
+        residuals = (self.y - self.model(self.x, *self.parameters(par)))*self.weights
+        return np.sum(residuals**2)
+
+    def grad(self, *par):
+        """Gradient of chi2 with respect to the global parameters."""
+        params = self.parameters(par)
+        residuals = (self.y - self.model(self.x, *params))*self.weights**2
+        per_trace = -2*np.sum(self.jacobian(self.x, *params)*residuals, axis=-1)
+        return self._collect(per_trace, len(par))
+
+    def curvature(self, *par):
+        """See `LeastSquares.curvature`."""
+        jac = self.jacobian(self.x, *self.parameters(par))
+        return self._collect(np.sum((jac*self.weights)**2, axis=-1), len(par))
+
+
+class GlobalFit:
+    def __init__(self, x, y, yerr=None, fit_class=TraceFourLevel, shared=('mu', 'sigma'),
+                 **kwargs):
+        """Fit several traces at once with shared parameters.
+
+        x, y, yerr: Lists with the data of every trace. Traces can have
+          different lengths.
+        fit_class: Fit class with the model of all traces. Its model and
+          jacobian must broadcast, as those of `TraceFourLevel` do.
+        shared: Names of the model parameters shared by all traces. All other
+          parameters have one copy per trace with the suffix `_i`, e.g.
+          `Amp_0`.
+        kwargs are passed to minuit. Start values, fix_, limit_ and error_
+        of per trace parameters without suffix apply to all traces, e.g.
+        `fix_t2=True`. Values with suffix take precedence.
+
+        Example:
+        ```
+        fit = GlobalFit(
+            [tr.pp_delay for tr in traces], [tr.bleach for tr in traces],
+            [tr.bleachE for tr in traces], shared=('t2', 'mu', 'sigma'),
+            Amp=0.1, t1=1, t2=0.7, c=0.5, mu=0, sigma=0.15, offset=-1,
+            fix_offset=True,
+        )
+        fit.minuit.migrad()
+        fit.results
+        ```
+        """
+        self.fit_class = fit_class
+        self.shared = tuple(shared)
+        self.x = [np.array(xi, dtype=float) for xi in x]
+        self.y = [np.array(yi, dtype=float) for yi in y]
+        if isinstance(yerr, type(None)):
+            yerr = [np.ones_like(xi) for xi in self.x]
+        self.yerr = [np.array(yerri, dtype=float) for yerri in yerr]
+        if not len(self.x) == len(self.y) == len(self.yerr):
+            raise ValueError('Need x, y and yerr of every trace')
+
+        self.model_parameters = describe(fit_class.model)[2:]
+        unknown = set(self.shared) - set(self.model_parameters)
+        if unknown:
+            raise ValueError('%s are no parameters of %s' % (unknown, fit_class.__name__))
+        names = []
+        index = np.empty((len(self.model_parameters), self.traces), dtype=int)
+        for row, name in enumerate(self.model_parameters):
+            if name in self.shared:
+                index[row] = len(names)
+                names.append(name)
+            else:
+                index[row] = np.arange(len(names), len(names) + self.traces)
+                names.extend('%s_%d' % (name, i) for i in range(self.traces))
+
+        # Pad all traces to the same length. Padding does not contribute.
+        points = max(len(xi) for xi in self.x)
+        x, y = np.zeros((self.traces, points)), np.zeros((self.traces, points))
+        yerr = np.full((self.traces, points), np.inf)
+        for i in range(self.traces):
+            size = len(self.x[i])
+            x[i] = self.x[i][-1]
+            x[i, :size], y[i, :size], yerr[i, :size] = self.x[i], self.y[i], self.yerr[i]
+
+        # Instance of the fit class without data. Only its model and
+        # jacobian are used.
+        self.models = fit_class.__new__(fit_class)
+        self.lsq = GlobalLeastSquares(
+            self.models.model, self.models.jacobian, x, y, yerr, index, names
+        )
+        kwargs = self._expand_kwargs(kwargs)
+        if not kwargs.get('errordef'):
+            kwargs['errordef'] = 1
+        kwargs.setdefault('grad', self.lsq.grad)
+        self.minuit = Minuit(self.lsq, **kwargs)
+        _init_errors(self.minuit, self.lsq, kwargs)
+
+    @property
+    def traces(self):
+        """Number of traces."""
+        return len(self.x)
+
+    def _expand_kwargs(self, kwargs):
+        """Apply kwargs of per trace parameters without suffix to all traces."""
+        per_trace = [name for name in self.model_parameters if name not in self.shared]
+        expanded, defaults = {}, {}
+        for key, value in kwargs.items():
+            for prefix in ('fix_', 'limit_', 'error_', ''):
+                name = key[len(prefix):]
+                if key.startswith(prefix) and name in per_trace:
+                    for i in range(self.traces):
+                        defaults['%s%s_%d' % (prefix, name, i)] = value
+                    break
+            else:
+                expanded[key] = value
+        return {**defaults, **expanded}
+
+    def values(self, i):
+        """Dict of the model parameters of trace i."""
+        params = self.lsq.parameters(self.minuit.np_values())[:, i, 0]
+        return dict(zip(self.model_parameters, params))
+
+    def errors(self, i):
+        """Dict of the errors of the model parameters of trace i."""
+        errors = self.lsq.parameters(self.minuit.np_errors())[:, i, 0]
+        return dict(zip(self.model_parameters, errors))
+
+    def fit(self, x, i):
+        """Fit function of trace i at value x."""
+        return self.models.model(x, *self.values(i).values())
+
+    @property
+    def results(self):
+        """pandas DataFrame with the values and errors of every trace."""
+        rows = []
+        for i in range(self.traces):
+            row = self.values(i)
+            row.update({name + 'E': value for name, value in self.errors(i).items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def _fit_problem(args):
+    """Fit a single problem of `fit_batch` and summarize the result."""
+    fit_class, (x, y, yerr, init) = args
+    fit = fit_class(x, y, yerr, **init)
+    fit.minuit.migrad()
+    fmin = fit.minuit.fmin
+    row = dict(fit.minuit.values)
+    row.update({name + 'E': value for name, value in fit.minuit.errors.items()})
+    row.update({
+        'fval': fmin.fval,
+        'valid': fmin.is_valid,
+        'accurate': fmin.has_accurate_covar,
+        'nfcn': fmin.nfcn,
+        'fit': fit.dict,
+    })
+    return row
+
+
+def fit_batch(problems, fit_class=TraceFourLevel, jobs=1):
+    """Fit many problems in a pool of processes.
+
+    problems: Iterable of (x, y, yerr, init) tuples. init is a dict of
+      keyword arguments of fit_class, e.g. start values and fix_ flags.
+    fit_class: Fit class of all problems, e.g. `TraceFourLevel`.
+    jobs: Number of processes. 1 fits in this process. None uses all cpus.
+
+    Returns pandas DataFrame with one row per problem in the order of
+    problems. Columns are the fitted values, their errors with an `E`
+    suffix, the fit status `fval`, `valid`, `accurate` and `nfcn` and `fit`,
+    the serialized fit that can be saved with `dict_to_json`.
+    """
+    tasks = [(fit_class, problem) for problem in problems]
+    if jobs == 1:
+        rows = list(map(_fit_problem, tasks))
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            rows = list(executor.map(_fit_problem, tasks))
+    return pd.DataFrame(rows)
@@ -0,0 +1,116 @@
+"""Fused arithmetic kernels to combine pump-probe data.
+
+The kernels calculate a value and its propagated uncertainty in a fixed
+number of passes over the data. Results are written into preallocated
+buffers, so no full size temporaries are created. If numexpr is
+installed it can be used as backend with `backend='numexpr'`.
+
+Example:
+```
+value, valueE = pysfg.kernels.ratio(
+    probed.normalized, probed.normalizedE, pumped.normalized, pumped.normalizedE
+)
+```
+"""
+
+import numpy as np
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+
+def _buffers(a, b, out, outE, *inputs):
+    """Allocate output buffers if they are not given.
+
+    The buffers are used as scratch space. Thus they must not share memory
+    with any of the inputs.
+    """
+    for buffer in (out, outE):
+        if any(np.may_share_memory(buffer, array) for array in inputs):
+            raise ValueError('Output buffers must not share memory with the inputs')
+    shape = np.broadcast(a, b).shape
+    dtype = np.result_type(a, b, float)
+    if isinstance(out, type(None)):
+        out = np.empty(shape, dtype=dtype)
+    if isinstance(outE, type(None)):
+        outE = np.empty(shape, dtype=dtype)
+    return out, outE
+
+
+def _blocks(shape, size=2**16):
+    """Index of blocks of rows of an array of shape with about size elements."""
+    if len(shape) == 0:
+        return [Ellipsis]
+    step = max(1, size // max(1, int(np.prod(shape[1:]))))
+    return [slice(start, start + step) for start in range(0, shape[0], step)]
+
+
+def _check_backend(backend):
+    if backend == 'numexpr' and isinstance(numexpr, type(None)):
+        raise ImportError('numexpr backend requested, but numexpr is not installed')
+    if backend not in ('numpy', 'numexpr'):
+        raise ValueError('Unknown backend: %s' % backend)
+
+
+def difference(a, aE, b, bE, out=None, outE=None, backend='numpy'):
+    """Difference of a and b with propagated uncertainty.
+
+    a, b: arrays of values
+    aE, bE: uncertainties of a and b
+    out, outE: optional buffers to write the value and the uncertainty into.
+      They must not share memory with the inputs.
+    backend: 'numpy' or 'numexpr'
+
+    Returns `a - b` and `sqrt(aE**2 + bE**2)`
+    """
+    _check_backend(backend)
+    out, outE = _buffers(a, b, out, outE, a, aE, b, bE)
+    if backend == 'numexpr':
+        numexpr.evaluate('a - b', out=out)
+        numexpr.evaluate('sqrt(aE**2 + bE**2)', out=outE)
+        return out, outE
+
+    # out is used as scratch space before the value is written.
+    np.multiply(aE, aE, out=outE)
+    np.multiply(bE, bE, out=out)
+    outE += out
+    np.sqrt(outE, out=outE)
+    np.subtract(a, b, out=out)
+    return out, outE
+
+
+def ratio(a, aE, b, bE, out=None, outE=None, backend='numpy'):
+    """Ratio of a and b with propagated uncertainty.
+
+    a, b: arrays of values
+    aE, bE: uncertainties of a and b
+    out, outE: optional buffers to write the value and the uncertainty into.
+      They must not share memory with the inputs.
+    backend: 'numpy' or 'numexpr'
+
+    Returns `a/b` and `sqrt((aE/b)**2 + (a*bE/b**2)**2)`
+    """
+    _check_backend(backend)
+    out, outE = _buffers(a, b, out, outE, a, aE, b, bE)
+    if backend == 'numexpr':
+        numexpr.evaluate('a/b', out=out)
+        numexpr.evaluate('sqrt(aE**2 + (out*bE)**2)/abs(b)', out=outE)
+        return out, outE
+
+    # The ratio is calculated once and reused for the uncertainty
+    # sqrt(aE**2 + (a/b*bE)**2)/|b|. aE**2 needs scratch space, which is
+    # kept small by working on blocks of rows.
+    np.divide(a, b, out=out)
+    aE = np.broadcast_to(aE, out.shape)
+    bE = np.broadcast_to(bE, out.shape)
+    for rows in _blocks(out.shape):
+        block = outE[rows]
+        np.multiply(out[rows], bE[rows], out=block)
+        block *= block
+        block += np.square(aE[rows])
+    np.sqrt(outE, out=outE)
+    np.divide(outE, b, out=outE)
+    np.abs(outE, out=outE)
+    return out, outE
@@ -0,0 +1,115 @@
+"""Noise model of the raw camera data.
+
+The variance of every point of the raw data is estimated from the shot
+noise of the signal and the dark current and from the readout noise of the
+camera. Scans can then be combined with inverse variance weights. The
+uncertainty of the weighted mean follows analytically from the weights.
+
+Example:
+```
+data = pysfg.read.victor.data_file('sample.dat')
+model = pysfg.noise.NoiseModel.from_header(data, sensitivity=4, readout=2)
+intensity, intensityE = pysfg.noise.scan_average(
+    data['data'][selector.tselect], model, background
+)
+```
+"""
+
+import numpy as np
+from .reduce import aggregate
+
+
+class NoiseModel:
+    def __init__(self, sensitivity=1, gain=1, readout=0, dark_current=0, exposure_time=0):
+        """Shot and readout noise of a CCD camera.
+
+        sensitivity: Electrons per count at gain 1.
+        gain: Gain setting of the camera. Counts per electron scale with it.
+        readout: Readout noise in counts.
+        dark_current: Dark current in electrons per second and pixel.
+        exposure_time: Exposure time in seconds.
+        """
+        self.sensitivity = sensitivity
+        self.gain = gain
+        self.readout = readout
+        self.dark_current = dark_current
+        self.exposure_time = exposure_time
+
+    @classmethod
+    def from_header(cls, data, sensitivity=1, readout=0, dark_current=0, gains=None):
+        """Noise model with gain and exposure time of a data file.
+
+        data: Data dict as returned by `pysfg.read.victor.data_file` or
+          `pysfg.read.spe.data_file`. A missing exposure time defaults to 0.
+        gains: Optional dict of the gain setting code of the header, e.g.
+          1, 2, 3 for low, medium and high, and the gain of that setting.
+          The header only stores the code, so without gains the gain is 1
+          and sensitivity must be the electrons per count of the data.
+        """
+        gain = 1
+        code = data.get('gain')
+        if not isinstance(gains, type(None)) and not isinstance(code, type(None)):
+            try:
+                gain = gains[int(code)]
+            except KeyError:
+                raise ValueError('No gain for gain setting %s in %s' % (code, gains))
+        exposure_time = data.get('exposure_time')
+        if isinstance(exposure_time, type(None)):
+            exposure_time = 0
+        else:
+            exposure_time = exposure_time.total_seconds()
+        return cls(sensitivity, float(gain), readout, dark_current, exposure_time)
+
+    @classmethod
+    def from_background(cls, background_data, axis=1, **kwargs):
+        """Noise model with readout noise estimated from background data.
+
+        The readout noise is the median over the pixels of the standard
+        deviation over the scans of the background data.
+        """
+        readout = np.median(np.std(background_data, axis=axis, ddof=1))
+        return cls(readout=readout, **kwargs)
+
+    @property
+    def electrons_per_count(self):
+        return self.sensitivity/self.gain
+
+    def variance(self, data, background=0):
+        """Variance of every point of data in counts squared.
+
+        data: Raw data in counts.
+        background: Background of data, e.g. the baseline. It has no shot
+          noise, but data below it is treated as zero signal.
+        """
+        signal = np.clip(np.subtract(data, background, dtype=float), 0, None)
+        signal /= self.electrons_per_count
+        signal += self.dark_current*self.exposure_time/self.electrons_per_count**2
+        signal += self.readout**2
+        return signal
+
+    def __repr__(self):
+        return (
+            'NoiseModel(sensitivity={}, gain={}, readout={}, dark_current={}, '
+            'exposure_time={})'.format(
+                self.sensitivity, self.gain, self.readout, self.dark_current,
+                self.exposure_time,
+            )
+        )
+
+
+def scan_average(data, model, background=0, axis=1):
+    """Inverse variance weighted mean over the scans.
+
+    data: Raw data, e.g. selected with a `SelectorPP`.
+    model: `NoiseModel` to estimate the variance of data with.
+    background: Background of data. See `NoiseModel.variance`.
+    axis: Scan axis.
+
+    The variance is estimated from the data itself. For low counts this
+    weights scans with downward fluctuations slightly higher.
+
+    Returns weighted mean and its uncertainty.
+    """
+    errors = np.sqrt(model.variance(data, background))
+    stats = aggregate(data, ('weighted_mean', 'weighted_meanE'), axis=axis, errors=errors)
+    return stats['weighted_mean'], stats['weighted_meanE']
@@ -3,7 +3,7 @@
 import struct
 import logging
 import locale
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from pathlib import Path
 import numpy as np
@@ -27,6 +27,19 @@ tf = {
 
 }
 
+# Data types of the binary data. Key is the datatype from the header,
+# value is the struct format, the bytes per pixel and the numpy dtype
+# the data is returned with.
+data_types = {
+    0: ('f', 4, 'float32'),
+    1: ('i', 4, 'int32'),
+    2: ('h', 2, 'int16'),
+    3: ('H', 2, 'int32'),
+    5: ('d', 8, 'float64'),
+    6: ('B', 1, 'int8'),
+    8: ('I', 4, 'int32'),
+}
+
 # All spe files contain atleast this information in there header
 header_general = {
     "file_header_ver": ("32f", 1992),
@@ -167,20 +180,11 @@ def _readData(fname, xdim, ydim, numFrames, datatype):
     datatype: integer describing data type of binary data.
 
     """
-    dataTypeDict = {
-        0: ('f', 4, 'float32'),
-        1: ('i', 4, 'int32'),
-        2: ('h', 2, 'int16'),
-        3: ('H', 2, 'int32'),
-        5: ('d', 8, 'float64'),
-        6: ('B', 1, 'int8'),
-        8: ('I', 4, 'int32'),
-    }
     nBytesHeader = 4100
     nPixels = xdim * ydim
     # fileheader datatypes translated into struct fromatter
     # This tells us what the format of the actual data is
-    fmtStr, bytesPerPixel, npfmtStr = dataTypeDict[datatype]
+    fmtStr, bytesPerPixel, npfmtStr = data_types[datatype]
     fmtStr = str(xdim * ydim) + fmtStr
     logging.debug('fmtStr: %s' % fmtStr)
 
@@ -204,6 +208,33 @@ def _readData(fname, xdim, ydim, numFrames, datatype):
     return data
 
 
+def iter_frames(fname, chunk_size=100):
+    """Iterate over the frames of an .spe file in chunks.
+
+    Only chunk_size frames are in memory at the same time, so also very
+    long acquisitions can be processed.
+
+    fname: Path to .spe file
+    chunk_size: Number of frames per chunk.
+
+    Yields arrays of shape (n_frames, ydim, xdim) with n_frames <= chunk_size.
+    The values are the same as in `readSpeFile(fname)['data']`.
+    """
+    header = _readHeader(fname)
+    xdim, ydim = header['xdim'], header['ydim']
+    fmtStr, _, dtype = data_types[header['datatype']]
+    # spe files are little endian
+    file_dtype = np.dtype('<' + fmtStr)
+    nBytesHeader = 4100
+    with open(Path(fname), 'rb') as spe:
+        spe.seek(nBytesHeader)
+        for start in range(0, header['NumFrames'], chunk_size):
+            n_frames = min(chunk_size, header['NumFrames'] - start)
+            logging.debug('Read frames %s to %s' % (start, start + n_frames))
+            data = np.fromfile(spe, dtype=file_dtype, count=n_frames*ydim*xdim)
+            yield data.astype(dtype).reshape(n_frames, ydim, xdim)
+
+
 def _calc_wavelength_from_header(header):
     """calculate wavelength from header information.
     Raise ValueError if it all polynom_coeff in header are 0"""
@@ -261,6 +292,7 @@ def data_file(fpath):
         ret['wavelength'] = _calc_wavelength_from_header(spe['header'])
         ret['gain'] = spe['header']['gain']
         ret['exposureTime'] = spe['header']['exp_sec']
+        ret['exposure_time'] = timedelta(seconds=float(ret['exposureTime']))
         ret['date'] = spe['header']['date']
         ret['tempSet'] = spe['header']['DetTemperature']
         ret['central_wl'] = ret['wavelength'][spe['header']['xdim']//2]
@@ -287,6 +319,8 @@ def data_file(fpath):
         )
         ret['grating'] = spe['footer']["SpeFormat"]["DataHistories"]['DataHistory']["Origin"]["Experiment"]["Devices"]['Spectrometers']["Spectrometer"]["Grating"]['Selected']['#text']
         ret['exposureTime'] = float(spe['footer']['SpeFormat']['DataHistories']['DataHistory']['Origin']['Experiment']['Devices']['Cameras']['Camera']['ShutterTiming']['ExposureTime']['#text'])
+        # Same as in victor files. Exposure time of spe3 files is in ms.
+        ret['exposure_time'] = timedelta(milliseconds=ret['exposureTime'])
         temp = spe['footer']['SpeFormat']['DataHistories']['DataHistory']['Origin']['Experiment']['Devices']['Cameras']['Camera']['Sensor']['Temperature']
         ret['tempSet'] = int(temp['SetPoint']['#text'])
         ret['tempRead'] = int(temp['Reading']['#text'])
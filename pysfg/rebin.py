@@ -0,0 +1,251 @@
+"""Rebin spectra onto a common wavenumber grid.
+
+Spectra taken with different calibrations have different, nonuniform
+wavenumber axes. This module builds a sparse rebin matrix from a source
+axis to a target axis. Each target bin is the overlap weighted mean of the
+source bins it covers, so the integral of densities is conserved. The
+matrices are cached per source and target axis, so all spectra of a
+calibration share the same matrix.
+
+Example:
+```
+grid = pysfg.rebin.uniform_grid(bleach1.wavenumber, bleach2.wavenumber, step=2)
+bleach1 = pysfg.rebin.rebin(bleach1, grid)
+bleach2 = pysfg.rebin.rebin(bleach2, grid)
+# Glue spectra of different central wavelengths together
+broadband = pysfg.rebin.stitch([spectrum1, spectrum2], grid)
+```
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from .calibration import Calibration, Calibration2
+from .spectrum import Spectrum, PumpProbe, Bleach, inverse_variance_mean, axis_cache
+
+
+def bin_edges(centers):
+    """Edges of the bins around sorted centers.
+
+    Inner edges are the midpoints between centers, the outer edges are
+    extrapolated by half a bin.
+    """
+    centers = np.asarray(centers, dtype=float)
+    if len(centers) < 2:
+        raise ValueError('Need at least two points to define bins')
+    middle = (centers[1:] + centers[:-1])/2
+    return np.concatenate([
+        [centers[0] - (centers[1] - centers[0])/2],
+        middle,
+        [centers[-1] + (centers[-1] - centers[-2])/2],
+    ])
+
+
+@axis_cache(maxsize=64)
+def _rebin_matrix(source, target):
+    source_order = np.argsort(source)
+    target_order = np.argsort(target)
+    source_edges = bin_edges(source[source_order])
+    target_edges = bin_edges(target[target_order])
+
+    # Every segment between two edges lies in exactly one source and one
+    # target bin. Its length is the overlap of the two bins.
+    edges = np.union1d(source_edges, target_edges)
+    centers = (edges[1:] + edges[:-1])/2
+    length = np.diff(edges)
+    source_index = np.searchsorted(source_edges, centers) - 1
+    target_index = np.searchsorted(target_edges, centers) - 1
+    valid = (source_index >= 0) & (source_index < len(source)) & \
+        (target_index >= 0) & (target_index < len(target))
+    rows = target_order[target_index[valid]]
+    columns = source_order[source_index[valid]]
+    matrix = coo_matrix(
+        (length[valid], (rows, columns)), shape=(len(target), len(source))
+    ).tocsr()
+    matrix.sum_duplicates()
+
+    # Normalize rows, so that a target bin is the weighted mean of the
+    # source bins it overlaps with.
+    overlap = np.asarray(matrix.sum(axis=1)).ravel()
+    covered = overlap > 0
+    scale = np.zeros_like(overlap)
+    scale[covered] = 1/overlap[covered]
+    matrix = matrix.multiply(scale[:, None]).tocsr()
+    return matrix, covered
+
+
+def rebin_matrix(source, target):
+    """Sparse rebin matrix from source axis to target axis.
+
+    source: 1D array of bin centers, e.g. wavenumbers. Can also be a
+      `Calibration` object. Then its wavenumber is used.
+    target: 1D array of bin centers to rebin onto.
+
+    Both axes can be in any order. Matrices are cached per axis pair.
+
+    Returns read only `scipy.sparse.csr_matrix` of shape (len(target), len(source))
+    and a read only boolean array marking the target bins covered by the source.
+    """
+    if isinstance(source, (Calibration, Calibration2)):
+        source = source.wavenumber
+    return _rebin_matrix(source, target)
+
+
+def uniform_grid(*axes, step=None):
+    """Uniform grid covering all given axes.
+
+    axes: 1D arrays, e.g. wavenumbers of several spectra.
+    step: Spacing of the grid. Defaults to the mean spacing of the first axis.
+
+    Returns 1D array in ascending order.
+    """
+    if len(axes) == 0:
+        raise ValueError('Need at least one axis')
+    if isinstance(step, type(None)):
+        step = np.abs(np.diff(axes[0])).mean()
+    start = min(np.min(axis) for axis in axes)
+    stop = max(np.max(axis) for axis in axes)
+    return np.arange(start, stop + step/2, step)
+
+
+def rebin_array(data, matrix, covered, errors=False):
+    """Apply a rebin matrix along the last axis of data.
+
+    data: array with the source axis as last axis.
+    matrix, covered: Output of `rebin_matrix`.
+    errors: If True, data are uncertainties and are propagated as
+      independent errors.
+
+    Returns array with the target axis as last axis. Target bins not covered
+    by the source are NaN.
+    """
+    data = np.asarray(data, dtype=float)
+    shape = data.shape
+    data = data.reshape(-1, shape[-1])
+    if errors:
+        ret = np.sqrt(matrix.power(2) @ np.square(data).T).T
+    else:
+        ret = (matrix @ data.T).T
+    ret[:, ~covered] = np.nan
+    return ret.reshape(shape[:-1] + (matrix.shape[0],))
+
+
+def _rebin_fields(obj, names, matrix, covered):
+    """Rebin many fields with one sparse-dense multiply for values and errors."""
+    values = [name for name in names if not name.endswith('E')]
+    errors = [name for name in names if name.endswith('E')]
+    ret = {}
+    for group, is_error in ((values, False), (errors, True)):
+        if not group:
+            continue
+        data = np.stack([np.asarray(getattr(obj, name), dtype=float) for name in group])
+        for name, rebinned in zip(group, rebin_array(data, matrix, covered, is_error)):
+            ret[name] = rebinned
+    return ret
+
+
+def _source_axis(obj, calibration):
+    if isinstance(calibration, type(None)):
+        return obj.wavenumber
+    return calibration.wavenumber[np.asarray(obj.pixel)]
+
+
+def rebin(obj, target, calibration=None):
+    """Rebin a `Spectrum`, `PumpProbe` or `Bleach` onto a target axis.
+
+    obj: `Spectrum`, `PumpProbe` or `Bleach` object.
+    target: 1D array of wavenumbers to rebin onto.
+    calibration: Optional `Calibration` of obj. If given, the unrounded
+      calibration wavenumbers of the pixels of obj are used as source axis.
+      Otherwise `obj.wavenumber` is used.
+
+    Returns new object of the same type on the target axis. Uncertainties
+    are propagated. Of a `Bleach` only the fields that are set are rebinned.
+    """
+    target = np.asarray(target, dtype=float)
+    matrix, covered = rebin_matrix(_source_axis(obj, calibration), target)
+    names = ('intensity', 'baseline', 'norm', 'intensityE')
+
+    if isinstance(obj, Spectrum):
+        fields = _rebin_fields(obj, names, matrix, covered)
+        return Spectrum(wavenumber=target, **fields)
+    if isinstance(obj, PumpProbe):
+        fields = _rebin_fields(obj, names, matrix, covered)
+        return PumpProbe(
+            wavenumber=target, pp_delay=obj.pp_delay, pump_freq=obj.pump_freq,
+            pump_width=obj.pump_width, cc_width=obj.cc_width, **fields
+        )
+    if isinstance(obj, Bleach):
+        # Only fields that are set. Lazy fields are not calculated.
+        names = [
+            name for name in obj.fields
+            if not isinstance(obj._fields.get(name), type(None))
+        ]
+        fields = _rebin_fields(obj, names, matrix, covered)
+        return Bleach(
+            wavenumber=target, pp_delay=obj.pp_delay, pixel=np.arange(len(target)),
+            pump_freq=obj.pump_freq, pump_width=obj.pump_width,
+            cc_width=obj.cc_width, **fields
+        )
+    raise NotImplementedError('Can not rebin objects of type %s' % type(obj))
+
+
+def stitch(objects, target=None, calibrations=None, step=None):
+    """Stitch spectra of different central wavelengths together.
+
+    All objects are rebinned onto the target axis and merged with inverse
+    variance weights of their normalized values. Where only one object
+    covers the target, its values are used. Target points not covered by
+    any object are NaN. The work is vectorized over the pp_delay axis.
+
+    objects: list of `Spectrum` or list of `PumpProbe` objects. PumpProbe
+      objects must share their pp_delays.
+    target: 1D array of wavenumbers. Defaults to a uniform grid covering
+      all objects.
+    calibrations: Optional list with one `Calibration` per object. See `rebin`.
+    step: Step of the default grid.
+
+    Returns `Spectrum` or `PumpProbe` with the stitched normalized values
+    as intensity, no baseline and no norm.
+    """
+    objects = list(objects)
+    if len(objects) == 0:
+        raise ValueError('Need at least one object to stitch')
+    if isinstance(calibrations, type(None)):
+        calibrations = [None for obj in objects]
+    if len(calibrations) != len(objects):
+        raise ValueError('Need one calibration per object')
+    first = objects[0]
+    if not all(isinstance(obj, type(first)) for obj in objects) or \
+       not isinstance(first, (Spectrum, PumpProbe)):
+        raise NotImplementedError(
+            'Only lists of Spectrum or of PumpProbe objects can be stitched'
+        )
+    if isinstance(first, PumpProbe):
+        for obj in objects[1:]:
+            if not np.array_equal(obj.pp_delay, first.pp_delay):
+                raise ValueError('pp_delays of the objects must be the same')
+
+    axes = [
+        _source_axis(obj, calibration) for obj, calibration in zip(objects, calibrations)
+    ]
+    if isinstance(target, type(None)):
+        target = uniform_grid(*axes, step=step)
+    target = np.asarray(target, dtype=float)
+
+    def rebinned(prop, errors):
+        for obj, axis in zip(objects, axes):
+            matrix, covered = rebin_matrix(axis, target)
+            yield rebin_array(getattr(obj, prop), matrix, covered, errors)
+
+    with np.errstate(invalid='ignore'):
+        normalized, normalizedE = inverse_variance_mean(
+            rebinned('normalized', False), rebinned('normalizedE', True)
+        )
+    normalizedE[np.isnan(normalized)] = np.nan
+    if isinstance(first, Spectrum):
+        return Spectrum(normalized, wavenumber=target, intensityE=normalizedE)
+    return PumpProbe(
+        normalized, wavenumber=target, pp_delay=first.pp_delay,
+        pump_freq=first.pump_freq, pump_width=first.pump_width,
+        cc_width=first.cc_width, intensityE=normalizedE
+    )
@@ -0,0 +1,202 @@
+"""Reduce raw data over the scan axis in one pass.
+
+`aggregate` calculates several statistics of raw data, e.g. the median and
+the standard error of the mean over the scans, in one traversal of the
+data. The data is split into tiles of pp_delays and pixels. Every tile is read
+once and all requested statistics are calculated while it is in cache.
+Tiles are processed by a thread pool. numpy releases the GIL during the
+reductions, so the threads run in parallel. The number of threads is
+taken from the `PYSFG_NUM_THREADS` environment variable or the number of
+cpus and can be changed with `set_num_threads`. The result does not
+depend on the number of threads.
+
+The median, mean, std and sem are bit identical to `np.median`, `np.mean`,
+`np.std(ddof=1)` and `scipy.stats.sem`.
+
+Example:
+```
+stats = pysfg.reduce.aggregate(data['data'][selector.tselect], ('median', 'sem'))
+intensity, intensityE = stats['median'], stats['sem']
+```
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+STATISTICS = (
+    'median', 'mean', 'std', 'sem', 'clipped_mean', 'weighted_mean', 'weighted_meanE'
+)
+_num_threads = int(os.environ.get('PYSFG_NUM_THREADS', os.cpu_count() or 1))
+
+
+def set_num_threads(threads):
+    """Set the default number of threads of `aggregate`."""
+    global _num_threads
+    threads = int(threads)
+    if threads < 1:
+        raise ValueError('Need at least one thread')
+    _num_threads = threads
+
+
+def get_num_threads():
+    """Default number of threads of `aggregate`."""
+    return _num_threads
+
+
+def _tiles(shape, axes, block_size, tile_size):
+    """Index of the tiles of data and of the results.
+
+    Tiles split the pixel axis into blocks of block_size and the first not
+    reduced axis, e.g. pp_delay, into chunks of tile_size.
+    """
+    pixel = len(shape) - 1
+    outer = [i for i in range(pixel) if i not in axes]
+    rows = [slice(None)]
+    if outer:
+        rows = [
+            slice(start, start + tile_size)
+            for start in range(0, shape[outer[0]], tile_size)
+        ]
+    for row in rows:
+        for start in range(0, shape[pixel], block_size):
+            index = [slice(None)]*len(shape)
+            if outer:
+                index[outer[0]] = row
+            index[pixel] = slice(start, start + block_size)
+            reduced = tuple(index[i] for i in range(len(shape)) if i not in axes)
+            yield tuple(index), reduced
+
+
+def _median(block):
+    """Median along the last axis. Mirrors `np.median`."""
+    n = block.shape[-1]
+    if n % 2 == 0:
+        kth = [n//2 - 1, n//2]
+    else:
+        kth = [(n - 1)//2]
+    supports_nans = np.issubdtype(block.dtype, np.inexact)
+    if supports_nans:
+        kth.append(-1)
+    part = np.partition(block, kth, axis=-1)
+    index = n//2
+    if n % 2 == 1:
+        middle = part[..., index:index + 1]
+    else:
+        middle = part[..., index - 1:index + 1]
+    ret = np.mean(middle, axis=-1)
+    if supports_nans:
+        ret = np.where(np.isnan(part[..., -1]), np.nan, ret)
+    return ret
+
+
+def _reduce_block(block, axis, statistics, errors, clip):
+    """All requested statistics of one block."""
+    ret = {}
+    if isinstance(axis, int):
+        axis = (axis,)
+    n = int(np.prod([block.shape[i] for i in axis]))
+    # Reduced axes last for the median.
+    flat = np.moveaxis(block, axis, range(-len(axis), 0))
+    flat = flat.reshape(flat.shape[:flat.ndim - len(axis)] + (n,))
+
+    if {'median', 'clipped_mean'} & set(statistics):
+        ret['median'] = _median(flat)
+    if {'mean', 'std', 'sem', 'clipped_mean'} & set(statistics):
+        # Same operations as np.mean and np.std.
+        dtype = 'f8' if issubclass(block.dtype.type, (np.integer, np.bool_)) else None
+        mean = np.true_divide(np.sum(block, axis=axis, keepdims=True, dtype=dtype), n)
+        ret['mean'] = np.squeeze(mean, axis=axis)
+    if {'std', 'sem', 'clipped_mean'} & set(statistics):
+        x = np.asanyarray(block - mean)
+        np.multiply(x, x, out=x)
+        var = np.sum(x, axis=axis)/max(n - 1, 0)
+        ret['std'] = np.sqrt(var)
+    if 'sem' in statistics:
+        ret['sem'] = ret['std']/np.sqrt(n)
+    if 'clipped_mean' in statistics:
+        # Mean of the values within clip standard deviations of the median.
+        limit = clip*ret['std'][..., None]
+        keep = np.abs(flat - ret['median'][..., None]) <= limit
+        ret['clipped_mean'] = np.sum(flat, axis=-1, where=keep)/np.sum(keep, axis=-1)
+    if {'weighted_mean', 'weighted_meanE'} & set(statistics):
+        flat_errors = np.moveaxis(errors, axis, range(-len(axis), 0))
+        flat_errors = flat_errors.reshape(flat.shape)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = 1/np.square(flat_errors)
+            valid = np.isfinite(weights) & np.isfinite(flat)
+            weights = np.where(valid, weights, 0)
+            total = np.sum(np.where(valid, flat, 0)*weights, axis=-1)
+            weight = np.sum(weights, axis=-1)
+            ret['weighted_mean'] = total/weight
+            ret['weighted_meanE'] = 1/np.sqrt(weight)
+    return {key: ret[key] for key in statistics}
+
+
+def aggregate(
+        data,
+        statistics=('median', 'sem'),
+        axis=1,
+        errors=None,
+        clip=3,
+        block_size=128,
+        tile_size=16,
+        threads=None,
+):
+    """Calculate statistics of data over the scan axis in one pass.
+
+    data: Array with pixel as last axis. E.g. 4D victor data or data
+      selected with a `SelectorPP`.
+    statistics: Names of the statistics to calculate. Possible are
+      'median', 'mean', 'std', 'sem', 'clipped_mean', 'weighted_mean'
+      and 'weighted_meanE'. std and sem use ddof=1.
+    axis: Axis or tuple of axes to reduce. The pixel axis can not be reduced.
+    errors: Uncertainties of data. Needed for the inverse variance weighted
+      mean 'weighted_mean' and its uncertainty 'weighted_meanE'.
+    clip: Values further than clip standard deviations away from the median
+      are ignored by 'clipped_mean'.
+    block_size: Number of pixels per tile.
+    tile_size: Number of pp_delays, or entries of the first not reduced
+      axis, per tile.
+    threads: Number of threads to process tiles with. Defaults to
+      `get_num_threads()`.
+
+    Returns dict of statistic name and resulting array.
+    """
+    data = np.asanyarray(data)
+    if isinstance(statistics, str):
+        statistics = (statistics,)
+    for name in statistics:
+        if name not in STATISTICS:
+            raise ValueError('Unknown statistic: %s' % name)
+    axes = (axis,) if isinstance(axis, int) else tuple(axis)
+    axes = tuple(i % data.ndim for i in axes)
+    if data.ndim - 1 in axes:
+        raise ValueError('The pixel axis can not be reduced')
+    if {'weighted_mean', 'weighted_meanE'} & set(statistics):
+        if isinstance(errors, type(None)):
+            raise ValueError('Weighted mean needs errors')
+        errors = np.broadcast_to(errors, data.shape)
+
+    shape = tuple(length for i, length in enumerate(data.shape) if i not in axes)
+    ret = {name: np.empty(shape) for name in statistics}
+    tiles = list(_tiles(data.shape, axes, block_size, tile_size))
+    if isinstance(threads, type(None)):
+        threads = get_num_threads()
+
+    def work(tile):
+        index, out_index = tile
+        tile_errors = None
+        if not isinstance(errors, type(None)):
+            tile_errors = errors[index]
+        result = _reduce_block(data[index], axes, statistics, tile_errors, clip)
+        for name in statistics:
+            ret[name][out_index] = result[name]
+
+    if threads > 1 and len(tiles) > 1:
+        with ThreadPoolExecutor(min(threads, len(tiles))) as executor:
+            list(executor.map(work, tiles))
+    else:
+        for tile in tiles:
+            work(tile)
+    return ret
@@ -1,8 +1,68 @@
 """The select mdule. Used for slicing of 4D data."""
 
+import numpy as np
+
+
+def range_to_slice(axis, start=None, stop=None, closed=True):
+    """Slice of the indices of axis with values between start and stop.
+
+    The axis must be monotone, but can be ascending or descending. The
+    slice is found by bisection, so this is O(log n).
+
+    axis: 1D monotone array. E.g. wavenumber, wavelength or pp_delay.
+    start, stop: Limits of the range in units of axis. None means no limit.
+      The order of start and stop does not matter.
+    closed: If True, values equal to start or stop are included. Else only
+      values strictly between start and stop are selected.
+
+    Returns slice
+    """
+    axis = np.asarray(axis)
+    lower = -np.inf if isinstance(start, type(None)) else start
+    upper = np.inf if isinstance(stop, type(None)) else stop
+    lower, upper = min(lower, upper), max(lower, upper)
+    descending = len(axis) > 1 and axis[0] > axis[-1]
+    if descending:
+        axis = axis[::-1]
+    if closed:
+        left = np.searchsorted(axis, lower, 'left')
+        right = np.searchsorted(axis, upper, 'right')
+    else:
+        left = np.searchsorted(axis, lower, 'right')
+        right = np.searchsorted(axis, upper, 'left')
+    right = max(left, right)
+    if descending:
+        return slice(int(len(axis) - right), int(len(axis) - left))
+    return slice(int(left), int(right))
+
+
+def nearest_index(axis, value):
+    """Index of the axis entry closest to value.
+
+    axis: 1D monotone array, ascending or descending.
+    value: number or array of numbers.
+
+    Returns int or array of int.
+    """
+    axis = np.asarray(axis)
+    descending = len(axis) > 1 and axis[0] > axis[-1]
+    if descending:
+        axis = axis[::-1]
+    right = np.clip(np.searchsorted(axis, value), 1, len(axis) - 1)
+    left = right - 1
+    index = np.where(np.abs(value - axis[left]) <= np.abs(axis[right] - value), left, right)
+    if descending:
+        index = len(axis) - 1 - index
+    if np.ndim(index) == 0:
+        return int(index)
+    return index
+
+
 class SelectorPP:
     def __init__(
-            self, pp_delays=None, scans=None, spectra=None, pixel=None
+            self, pp_delays=None, scans=None, spectra=None, pixel=None,
+            wavenumber=None, wavelength=None, delay=None, calibration=None,
+            timedelay=None
     ):
         """Selector object to slice in 4D pump-probe data files.
 
@@ -28,12 +88,49 @@ class SelectorPP:
 
         use data[SelectorPP.tselect] to select a subset of data.
 
+        Ranges can also be given in physical units. They are resolved into
+        slices by bisection.
+        ```
+        calibration = pysfg.calibration.from_victor_header(data)
+        SelectorPP(
+            spectra=0, wavenumber=[2800, 3000], calibration=calibration,
+            delay=[-500, 1000], timedelay=data['timedelay'],
+        )
+        ```
+
+        wavenumber: [start, stop] range in 1/cm. Needs calibration.
+        wavelength: [start, stop] range in nm. Needs calibration.
+        delay: [start, stop] range in the units of timedelay, e.g. fs.
+        Only one of pixel, wavenumber and wavelength and only one of
+        pp_delays and delay can be given.
+        calibration: `pysfg.Calibration` to translate wavenumber and wavelength.
+        timedelay: Array of pp_delays to translate delay.
+
         """
         self.select = [slice(None), slice(None), slice(None), slice(None)]
         self.pp_delays = pp_delays
         self.scans = scans
         self.spectra = spectra
         self.pixel = pixel
+        ranges = [
+            name for name, value in
+            (('pixel', pixel), ('wavenumber', wavenumber), ('wavelength', wavelength))
+            if not isinstance(value, type(None))
+        ]
+        if len(ranges) > 1:
+            raise ValueError('Only one of %s can select the pixel' % ', '.join(ranges))
+        for name, value in (('wavenumber', wavenumber), ('wavelength', wavelength)):
+            if isinstance(value, type(None)):
+                continue
+            if isinstance(calibration, type(None)):
+                raise ValueError('Selecting by %s needs a calibration' % name)
+            self.pixel = getattr(calibration, name + '_slice')(*value)
+        if not isinstance(delay, type(None)):
+            if not isinstance(pp_delays, type(None)):
+                raise ValueError('Only one of pp_delays, delay can select the pp_delays')
+            if isinstance(timedelay, type(None)):
+                raise ValueError('Selecting by delay needs the timedelay axis')
+            self.pp_delays = range_to_slice(timedelay, *delay)
 
     def _cast(self, value):
         if isinstance(value, int) or isinstance(value, slice):
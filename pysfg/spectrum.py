@@ -3,13 +3,18 @@
 
 import logging
 import json
+from functools import lru_cache, wraps
 from pathlib import Path
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix, issparse
 from scipy.ndimage import gaussian_filter1d
 from scipy.constants import speed_of_light as c0
 from scipy.optimize import minimize
+from scipy.fft import next_fast_len
+from scipy.signal import get_window
 import matplotlib.pyplot as plt
+from . import kernels
 
 
 class BaseSpectrum():
@@ -156,7 +161,10 @@ class BaseSpectrum():
         plt.plot(getattr(self, x), getattr(self, y), *args, **kwargs)
 
 class PSSHG():
-    def __init__(self, interference, local_oszillator, sample, wavelength=None, mask=None, reference=None):
+    def __init__(
+            self, interference, local_oszillator, sample, wavelength=None, mask=None,
+            reference=None, resample=False, fft_length=None, window=None
+    ):
         """
         Phase Resolved SHG spectrum class.
 
@@ -170,34 +178,150 @@ class PSSHG():
         mask: slice or array to mask time_domain data (after fft) with. This mask is used
           to filter the data in the time domain with.
         reference: Complex 1D array reference to determine phaseshift to.
+        resample: If True, the cross term is linearly interpolated onto a
+          uniform frequency grid before the fft and the spectrum is
+          interpolated back onto the wavelength axis. Needs wavelength in nm.
+        fft_length: Length of the fft. None uses the number of pixels,
+          'fast' the next length scipy.fft can transform fast. The cross
+          term is zero padded and the spectrum is truncated to the number
+          of pixels again. The mask is applied to the padded time domain.
+        window: Window to apply to the cross term before the fft. Either an
+          array or anything `scipy.signal.get_window` understands, e.g. 'hann'.
 
         """
-        self.interference = np.array(interference)
-        self.local_oszillator = np.array(local_oszillator)
-        self.sample = np.array(sample)
+        self._cross_term = None
+        self._time_domain = None
+        self._spectrum = None
+        self._phaseshift = None
+        self._amplitude = None
+        self._interference = np.array(interference)
+        self._local_oszillator = np.array(local_oszillator)
+        self._sample = np.array(sample)
+        self._resample = resample
+        self._fft_length = fft_length
+        self._window = window
         if isinstance(wavelength, type(None)):
-            wavelength = np.arange(len(self.interference))
-        self.wavelength = np.array(wavelength)
+            wavelength = np.arange(np.shape(self.interference)[-1])
+        self.wavelength = wavelength
         self.mask = mask
-        self.N = len(self.wavelength)
         self.reference = reference
+
+    def _invalidate(self):
+        """Drop cached results, because the raw data has changed."""
+        self._cross_term = None
+        self._time_domain = None
+        self._spectrum = None
         self._phaseshift = None
         self._amplitude = None
 
+    @property
+    def wavelength(self):
+        """Wavelength in nm according to the pixel axis."""
+        return self._wavelength
+
+    @wavelength.setter
+    def wavelength(self, value):
+        self._wavelength = np.array(value)
+        self.N = len(self._wavelength)
+        self._mask = None
+        self._invalidate()
+
+    @property
+    def resample(self):
+        """Resample the cross term onto a uniform frequency grid before the fft."""
+        return self._resample
+
+    @resample.setter
+    def resample(self, value):
+        self._resample = value
+        self._invalidate()
+
+    @property
+    def fft_length(self):
+        """Requested fft length. None, 'fast' or an integer."""
+        return self._fft_length
+
+    @fft_length.setter
+    def fft_length(self, value):
+        self._fft_length = value
+        self._mask = None
+        self._invalidate()
+
+    @property
+    def window(self):
+        """Window applied to the cross term before the fft."""
+        return self._window
+
+    @window.setter
+    def window(self, value):
+        self._window = value
+        self._invalidate()
+
+    @property
+    def fft_size(self):
+        """Number of points of the fft and the time domain."""
+        if isinstance(self.fft_length, type(None)):
+            return self.N
+        if self.fft_length == 'fast':
+            return next_fast_len(self.N)
+        if self.fft_length < self.N:
+            raise ValueError('fft_length must not be smaller than the number of pixels')
+        return int(self.fft_length)
+
+    @property
+    def interference(self):
+        """Background subtracted interference data."""
+        return self._interference
+
+    @interference.setter
+    def interference(self, value):
+        self._interference = np.array(value)
+        self._invalidate()
+
+    @property
+    def local_oszillator(self):
+        """Intensity of the local oszillator."""
+        return self._local_oszillator
+
+    @local_oszillator.setter
+    def local_oszillator(self, value):
+        self._local_oszillator = np.array(value)
+        self._invalidate()
+
+    @property
+    def sample(self):
+        """Sample shg spectrum."""
+        return self._sample
+
+    @sample.setter
+    def sample(self, value):
+        self._sample = np.array(value)
+        self._invalidate()
+
     @property
     def mask(self):
         """Array to mask `PSSHG.time_domain` with."""
+        # The time domain has fft_size points, so no fft is needed to build
+        # the mask. The mask is shared by all leading axes.
+        if isinstance(self._mask, type(None)):
+            value = self._mask_value
+            if isinstance(value, type(None)):
+                self._mask = np.ones(self.fft_size, dtype=int)
+            elif isinstance(value, slice):
+                self._mask = np.zeros(self.fft_size, dtype=int)
+                self._mask[value] = 1
+            else:
+                self._mask = np.array(value, dtype=int)
         return self._mask
 
     @mask.setter
     def mask(self, value):
-        if isinstance(value, type(None)):
-            self._mask = np.ones_like(self.time_domain, dtype=int)
-        elif isinstance(value, slice):
-            self._mask = np.zeros_like(self.time_domain, dtype=int)
-            self._mask[value] = 1
-        else:
-            self._mask = np.array(value, dtype=int)
+        self._mask_value = value
+        self._mask = None
+        # Only the spectrum depends on the mask.
+        self._spectrum = None
+        self._phaseshift = None
+        self._amplitude = None
 
     @property
     def reference(self):
@@ -217,7 +341,9 @@ class PSSHG():
     def cross_term(self):
         """The `PSSHG.cross_term` is what is left after local oszillator
         and sample spectral contributions are subtracted from the interferencedata"""
-        return self.interference - self.local_oszillator - self.sample
+        if isinstance(self._cross_term, type(None)):
+            self._cross_term = self.interference - self.local_oszillator - self.sample
+        return self._cross_term
 
     @property
     def time_domain(self):
@@ -225,28 +351,73 @@ class PSSHG():
         # Signal in time domain
         # The use of ifft instead of fft is not important. It gives just nicer numbers
         # here.
-        return np.fft.ifft(self.cross_term)
+        if isinstance(self._time_domain, type(None)):
+            cross_term = self.cross_term
+            if self.resample:
+                cross_term = (self._resample_matrix @ cross_term.T).T
+            if not isinstance(self.window, type(None)):
+                cross_term = cross_term * self._window_array
+            self._time_domain = np.fft.ifft(cross_term, n=self.fft_size)
+        return self._time_domain
+
+    @property
+    def _window_array(self):
+        if isinstance(self.window, (str, tuple)):
+            return get_window(self.window, self.N, fftbins=False)
+        return np.asarray(self.window)
+
+    @property
+    def _resample_matrix(self):
+        """Sparse interpolation from the frequency axis to the uniform grid."""
+        return interpolation_matrix(self.THz, self.THz_uniform)
+
+    @property
+    def THz_uniform(self):
+        """Uniform frequency grid in THz used if `PSSHG.resample` is True."""
+        THz = self.THz
+        return np.linspace(THz.min(), THz.max(), self.N)
 
     @property
     def time_delay(self):
         """Calculate the time delay of the time_domain signal. E.g. the pulse delay
         This calculation assumes that PSSHG.wavelength is in nm."""
-        return np.fft.fftfreq(self.N, np.abs(np.diff(self.THz).mean()))
+        if self.resample:
+            spacing = np.diff(self.THz_uniform[:2])[0]
+        else:
+            spacing = np.abs(np.diff(self.THz).mean())
+        return np.fft.fftfreq(self.fft_size, spacing)
 
     @property
     def spectrum(self):
         """The complex ps-shg spectrum measured."""
-        return np.fft.fft(self.time_domain*self.mask)
+        if isinstance(self._spectrum, type(None)):
+            spectrum = np.fft.fft(self.time_domain*self.mask)[..., :self.N]
+            if self.resample:
+                back = interpolation_matrix(self.THz_uniform, self.THz)
+                spectrum = (back @ spectrum.T).T
+            self._spectrum = spectrum
+        return self._spectrum
 
     @property
     def df(self):
         """A dataframe representation of the complete raw data of this `PSSHG` object.
         Can be used for easy exporting and importing.
+
+        The processing options resample, fft_length and window are not
+        stored. The mask is only stored if it has one entry per pixel.
         """
-        return pd.DataFrame(
-            data=[self.interference, self.local_oszillator, self.sample, self.wavelength, self.mask, self.reference.imag, self.reference.real],
-            index=('interference', 'local_oszillator', 'sample', 'wavelength', 'mask', 'reference.imag', 'reference.real'),
-        )
+        data = {
+            'interference': self.interference,
+            'local_oszillator': self.local_oszillator,
+            'sample': self.sample,
+            'wavelength': self.wavelength,
+            'mask': self.mask,
+            'reference.imag': self.reference.imag,
+            'reference.real': self.reference.real,
+        }
+        if len(self.mask) != self.N:
+            del data['mask']
+        return pd.DataFrame(data=list(data.values()), index=list(data.keys()))
 
     def to_json(self, *args, **kwargs):
         """Save the PSSHG as pandas dataframe into a json file under the in given path."""
@@ -262,10 +433,29 @@ class PSSHG():
         """Frequency in THz, assumging wavelength is in nm."""
         return self.frequency * 10**-12
 
+    def solve_phaseshift(self):
+        """Determine phaseshift and amplitude between spectrum and reference.
+
+        Uses the closed form solution of `solve_phaseshift`. Results are
+        stored in `PSSHG.phaseshift` and `PSSHG.amplitude`.
+
+        Returns phaseshift and amplitude
+        """
+        self._phaseshift, self._amplitude = solve_phaseshift(self.spectrum, self.reference)
+        return self._phaseshift, self._amplitude
+
     def minimize_phaseshift(self, x0=[0, 1], bounds=[(-np.pi, np.pi), (0, None)], **kwargs):
+        """Determine phaseshift and amplitude with a bounded minimizer.
+
+        Slow fallback of `PSSHG.solve_phaseshift` e.g. for custom bounds.
+        Returns the `scipy.optimize.minimize` result.
+        """
+        spectrum = self.spectrum
+        reference = self.reference
+
         def chi2(x0): # Only one argument is allowed for minimization here
             phase, A = x0
-            diff = A*self.spectrum*np.e**(1j*phase)-self.reference
+            diff = A*spectrum*np.e**(1j*phase)-reference
             return np.sum(diff.real**2 + diff.imag**2)
           # Boundaries
         ret = minimize(chi2, x0, bounds=bounds, **kwargs)
@@ -276,15 +466,15 @@ class PSSHG():
     @property
     def phaseshift(self):
         """Calculate relative phaseshift of spectrum and reference data in radiance"""
-        if not self._phaseshift:
-            self._phaseshift = self.minimize_phaseshift().x[0]
+        if isinstance(self._phaseshift, type(None)):
+            self.solve_phaseshift()
         return self._phaseshift
 
     @property
     def amplitude(self):
         """The amplitude used for the phaseshift minimization."""
-        if not self._amplitude:
-            self._amplitude = self.minimize_phaseshift().x[1]
+        if isinstance(self._amplitude, type(None)):
+            self.solve_phaseshift()
         return self._amplitude
 
     @property
@@ -295,7 +485,7 @@ class PSSHG():
     @property
     def spectrum_phaseshifted(self):
         """Phase shift spectrum to match reference spectrum."""
-        return self.spectrum*np.e**(1j*self.phaseshift)
+        return self.spectrum*np.e**(1j*np.expand_dims(self.phaseshift, -1))
 
     def shift_spectrum(self, phaseshift=None, amplitude=None):
         """Phase and Amplitude Shifted version of the spectrum
@@ -303,10 +493,12 @@ class PSSHG():
         phase: Phase to shift the spectrum by in radiance. If None `self.phaseshift` is used.
         amplitude: Amplitude to shift change the spectrum by. If None `self.amplitude` is used.
         """
-        if not phaseshift:
+        if isinstance(phaseshift, type(None)):
             phaseshift = self.phaseshift
-        if not amplitude:
+        if isinstance(amplitude, type(None)):
             amplitude = self.amplitude
+        phaseshift = np.expand_dims(phaseshift, -1)
+        amplitude = np.expand_dims(amplitude, -1)
         return self.spectrum*np.e**(1j*phaseshift)*amplitude
 
     @property
@@ -335,6 +527,208 @@ class PSSHG():
         y = str(y)
         plt.plot(getattr(self, x), getattr(self, y), *args, **kwargs)
 
+
+class PSSHGStack(PSSHG):
+    def __init__(self, interference, local_oszillator, sample, wavelength=None, mask=None, reference=None, **kwargs):
+        """
+        Stack of Phase Resolved SHG spectra, e.g. the frames of a measurement.
+
+        All calculations of `PSSHG` run along the last axis for all frames at
+        once. Phaseshift and amplitude are arrays with one value per frame.
+
+        *Arguments*
+        interference: 2D array of shape (n_frames, n_pixel) with background
+          subtracted interference data
+        local_oszillator: Local oszillator intensity. Either 1D array shared by
+          all frames or 2D array with one spectrum per frame.
+        sample: Sample shg spectrum. Either 1D or 2D like local_oszillator.
+        wavelength: 1D array with wavelength in nm according to pixel axis.
+        mask: slice or 1D array to mask time_domain data with.
+        reference: Complex 1D or 2D array reference to determine phaseshift to.
+        kwargs: resample, fft_length and window as for `PSSHG`.
+        """
+        interference = np.array(interference)
+        if interference.ndim != 2:
+            raise ValueError('interference must be of shape (n_frames, n_pixel)')
+        super().__init__(interference, local_oszillator, sample, wavelength, mask, reference, **kwargs)
+
+    def __len__(self):
+        return len(self.interference)
+
+    def frame(self, i):
+        """`PSSHG` object of the i-th frame."""
+        def select(data):
+            data = np.asarray(data)
+            if data.ndim == 2:
+                return data[i]
+            return data
+        return PSSHG(
+            self.interference[i], select(self.local_oszillator), select(self.sample),
+            self.wavelength, self.mask, select(self.reference), self.resample,
+            self.fft_length, self.window
+        )
+
+    def minimize_phaseshift(self, *args, **kwargs):
+        """Run the bounded minimizer frame by frame.
+
+        Returns list of `scipy.optimize.minimize` results.
+        """
+        ret = [self.frame(i).minimize_phaseshift(*args, **kwargs) for i in range(len(self))]
+        self._phaseshift = np.array([r.x[0] for r in ret])
+        self._amplitude = np.array([r.x[1] for r in ret])
+        return ret
+
+    @property
+    def phaseshift_mean(self):
+        """Circular mean of the phaseshifts of all frames in radiance."""
+        return np.angle(np.mean(np.exp(1j*self.phaseshift)))
+
+    @property
+    def phaseshift_std(self):
+        """Circular standard deviation of the phaseshifts of all frames in radiance."""
+        resultant = np.abs(np.mean(np.exp(1j*self.phaseshift)))
+        return np.sqrt(-2*np.log(np.minimum(resultant, 1)))
+
+    @property
+    def amplitude_mean(self):
+        """Mean amplitude of all frames."""
+        return np.mean(self.amplitude)
+
+    @property
+    def amplitude_std(self):
+        """Standard deviation of the amplitudes of all frames."""
+        return np.std(self.amplitude)
+
+    @property
+    def df(self):
+        raise NotImplementedError('Use PSSHGStack.frame to export single frames')
+
+
+def phase_drift(chunks, local_oszillator, sample, reference, wavelength=None, mask=None, **kwargs):
+    """Frame resolved phaseshift of a PS-SHG acquisition.
+
+    The frames are processed chunk by chunk with `PSSHGStack`, so memory
+    does not depend on the number of frames.
+
+    chunks: iterable of 2D arrays of shape (n_frames, n_pixel) with background
+      subtracted interference data. E.g. from `pysfg.read.spe.iter_frames`.
+    local_oszillator: 1D array with intensity of local oszillator.
+    sample: 1D array with sample shg spectrum
+    reference: Complex 1D array reference to determine phaseshift to.
+    wavelength: 1D array with wavelength in nm according to pixel axis.
+    mask: slice or array to mask time_domain data with.
+    kwargs: resample, fft_length and window as for `PSSHG`.
+
+    Returns phaseshift and amplitude of each frame and the drift corrected
+    complex spectrum. For the drift corrected spectrum each frame is shifted
+    by its phaseshift relative to the mean phaseshift before averaging.
+    """
+    phaseshift, amplitude = [], []
+    total, n_frames = 0, 0
+    for chunk in chunks:
+        stack = PSSHGStack(chunk, local_oszillator, sample, wavelength, mask, reference, **kwargs)
+        phaseshift.append(stack.phaseshift)
+        amplitude.append(stack.amplitude)
+        total = total + stack.shift_spectrum(amplitude=1).sum(axis=0)
+        n_frames += len(stack)
+    if n_frames == 0:
+        raise ValueError('Need at least one frame')
+    phaseshift = np.concatenate(phaseshift)
+    amplitude = np.concatenate(amplitude)
+    mean_phaseshift = np.angle(np.mean(np.exp(1j*phaseshift)))
+    spectrum = total/n_frames*np.exp(-1j*mean_phaseshift)
+    return phaseshift, amplitude, spectrum
+
+
+def _read_only(value):
+    """Make the arrays of value, also of a sparse matrix, read only."""
+    if issparse(value):
+        value = value.tocsr()
+        arrays = (value.data, value.indices, value.indptr)
+    else:
+        arrays = (value,)
+    for array in arrays:
+        array.setflags(write=False)
+    return value
+
+
+def axis_cache(maxsize):
+    """Cache a function of a source and a target axis.
+
+    The axes are converted to float arrays and keyed by their bytes. As the
+    results are shared between all callers, their arrays are made read only.
+    """
+    def decorator(function):
+        @lru_cache(maxsize=maxsize)
+        def cached(source, target, dtype):
+            result = function(
+                np.frombuffer(source, dtype=dtype), np.frombuffer(target, dtype=dtype)
+            )
+            if isinstance(result, tuple):
+                return tuple(_read_only(value) for value in result)
+            return _read_only(result)
+
+        @wraps(function)
+        def wrapper(source, target):
+            source = np.asarray(source, dtype=float)
+            target = np.asarray(target, dtype=float)
+            return cached(source.tobytes(), target.tobytes(), source.dtype.str)
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
+
+
+@axis_cache(maxsize=32)
+def _interpolation_matrix(source, target):
+    order = np.argsort(source)
+    x = source[order]
+    right = np.clip(np.searchsorted(x, target), 1, len(x) - 1)
+    left = right - 1
+    weight = np.clip((target - x[left])/(x[right] - x[left]), 0, 1)
+    rows = np.arange(len(target))
+    matrix = csr_matrix(
+        (np.concatenate([1 - weight, weight]),
+         (np.concatenate([rows, rows]), np.concatenate([order[left], order[right]]))),
+        shape=(len(target), len(source))
+    )
+    return matrix
+
+
+def interpolation_matrix(source, target):
+    """Sparse matrix for linear interpolation from source to target points.
+
+    `interpolation_matrix(x, xp) @ y` equals `np.interp(xp, x, y)` also for
+    unsorted x. Matrices are cached per source and target axis, so repeated
+    processing with the same calibration reuses them.
+
+    source: 1D array with the points the data is sampled at.
+    target: 1D array with the points to interpolate onto.
+
+    Returns read only `scipy.sparse.csr_matrix` of shape (len(target), len(source))
+    """
+    return _interpolation_matrix(source, target)
+
+
+def solve_phaseshift(spectrum, reference):
+    """Phaseshift and amplitude that match spectrum to reference.
+
+    Minimizes `|A*spectrum*exp(1j*phase) - reference|**2` over the last
+    axis. With z = A*exp(1j*phase) this is a linear least squares problem
+    with the exact solution `z = <spectrum, reference>/<spectrum, spectrum>`.
+
+    spectrum: complex array. Leading axes are treated as different spectra.
+    reference: complex array broadcastable to spectrum.
+
+    Returns phaseshift in radiance between -pi and pi and amplitude >= 0.
+    Both have the shape of the leading axes of spectrum.
+    """
+    spectrum = np.asarray(spectrum)
+    z = np.sum(np.conj(spectrum)*reference, axis=-1)/np.sum(np.abs(spectrum)**2, axis=-1)
+    return np.angle(z), np.abs(z)
+
+
 class Spectrum(BaseSpectrum):
     def __init__(self, intensity, baseline=None, norm=None, wavenumber=None,
                  intensityE=None, pixel=None):
@@ -507,7 +901,10 @@ class PumpProbe(BaseSpectrum):
         return df
 
     def __sub__(self, other):
-        """Returns a dictionary with all the important pump-probe data."""
+        """Returns a `Bleach` object of the difference.
+
+        The fields of the bleach are only calculated when they are used.
+        """
         if not np.all(self.wavenumber == other.wavenumber):
             raise NotImplementedError
         if not np.all(self.pp_delay == other.pp_delay):
@@ -515,44 +912,56 @@ class PumpProbe(BaseSpectrum):
 
         # This corrects for static differences in pumped and probed
         return Bleach(
-            intensity=self.intensity - other.intensity,
-            baseline=np.mean([self.baseline, other.baseline], 0),
-            norm=np.mean([self.norm, other.norm], 0),
             wavenumber=self.wavenumber,
             pp_delay=self.pp_delay,
-            basesubed=self.basesubed - other.basesubed,
-            normalized=self.normalized - other.normalized,
-            intensityE=np.sqrt(self.intensityE**2 + other.intensityE**2),
             pixel=self.pixel,
-            normalizedE=np.sqrt(self.normalizedE**2+other.normalizedE**2),
+            parents=(self, other),
+            mode='difference',
         )
 
     def __truediv__(self, other):
-        """Returns a dictionary with all the important pump-probe data."""
+        """Returns a `Bleach` object of the ratio.
+
+        The fields of the bleach are only calculated when they are used.
+        """
         if not np.all(self.wavenumber == other.wavenumber):
             raise NotImplementedError
         if not np.all(self.pp_delay == other.pp_delay):
             raise NotImplementedError
         return Bleach(
-            intensity=self.intensity / other.intensity,
-            baseline=self.baseline / other.baseline,
-            norm=np.mean([self.norm, other.norm], 0),
             wavenumber=self.wavenumber,
             pp_delay=self.pp_delay,
-            basesubed=self.basesubed / other.basesubed,
-            normalized=self.normalized / other.normalized,
-            intensityE=np.sqrt((self.intensityE/other.intensity)**2 +
-                               (self.intensity*other.intensityE/other.intensity**2)**2),
             pixel=self.pixel,
-            normalizedE=np.sqrt((self.normalizedE/other.normalized)**2 +
-                               (self.normalized*other.normalizedE/other.normalized**2)**2),
+            parents=(self, other),
+            mode='ratio',
         )
 
 
+def _lazy_field(name, doc=None):
+    """Property of a `Bleach` field, that is calculated from the parents on first use."""
+    def getter(self):
+        value = self._fields.get(name)
+        if isinstance(value, type(None)) and not isinstance(self._parents, type(None)):
+            value = self._compute(name)
+            self._fields[name] = value
+        return value
+
+    def setter(self, value):
+        self._fields[name] = value
+
+    return property(getter, setter, doc=doc)
+
+
 # This class is very simmilar to PumpProbe, but it doesn't impose
 # Anything on the data. Maybe its not worth it and instead one should
 # just use a dict here.
 class Bleach():
+    # Fields that can be calculated from the parent `PumpProbe` objects
+    fields = (
+        'intensity', 'baseline', 'norm', 'basesubed', 'normalized',
+        'intensityE', 'normalizedE'
+    )
+
     def __init__(
             self,
             intensity=None,
@@ -568,6 +977,8 @@ class Bleach():
             intensityE=None,
             pixel=None,
             normalizedE=None,
+            parents=None,
+            mode='difference',
     ):
         """Class to encapuslate bleach data.
 
@@ -575,10 +986,25 @@ class Bleach():
         basically the same as PumpProbe, but doens't check for shapes. As the
         shapes don't always need to be defined.
 
+        If `parents` are given, all fields that are not passed explicitly
+        are calculated on demand from the two parent `PumpProbe` objects. This
+        way only the arrays that are actually used get computed. The parents
+        are kept by reference, not copied. Changing a parent before a field
+        is used changes that field. Call `Bleach.materialize` to calculate
+        all fields and to drop the references to the parents.
+
         It allows to export the data with `Bleach.to_json` and also generates
-        DataFrames with `Bleach.df`. Data can be imported with `spectrum.json_to_bleach`
+        DataFrames with `Bleach.df`. A subset of the fields can be exported
+        with the fields argument of `Bleach.to_json`. Data can be imported with `spectrum.json_to_bleach`
 
+        parents: tuple of two `PumpProbe` objects.
+        mode: 'difference' or 'ratio'. How the parents are combined.
         """
+        if mode not in ('difference', 'ratio'):
+            raise ValueError('Unknown mode: %s' % mode)
+        self._fields = {}
+        self._parents = parents
+        self.mode = mode
         self.intensity = intensity
         self.baseline = baseline
         self.norm = norm
@@ -594,12 +1020,138 @@ class Bleach():
         self.normalizedE = normalizedE
         # TODO implement getter and setter
 
+    intensity = _lazy_field('intensity')
+    baseline = _lazy_field('baseline')
+    norm = _lazy_field('norm')
+    basesubed = _lazy_field('basesubed', 'Baseline subtracted intensity')
+    normalized = _lazy_field('normalized', 'Normalized bleach')
+    intensityE = _lazy_field('intensityE', 'Uncertainty of the intensity')
+    normalizedE = _lazy_field('normalizedE', 'Uncertainty of the normalized bleach')
+
+    def _compute(self, name):
+        """Calculate field name from the parents.
+
+        Values and uncertainties are calculated together by the fused
+        kernels of `pysfg.kernels`. The partner field is cached as well.
+        """
+        this, other = self._parents
+        pairs = {
+            'intensity': 'intensityE', 'intensityE': 'intensity',
+            'normalized': 'normalizedE', 'normalizedE': 'normalized',
+        }
+        if name in pairs:
+            value = name.rstrip('E')
+            kernel = {'difference': kernels.difference, 'ratio': kernels.ratio}[self.mode]
+            result = dict(zip((value, value + 'E'), kernel(
+                getattr(this, value), getattr(this, value + 'E'),
+                getattr(other, value), getattr(other, value + 'E'),
+            )))
+            if isinstance(self._fields.get(pairs[name]), type(None)):
+                self._fields[pairs[name]] = result[pairs[name]]
+            return result[name]
+
+        if name == 'norm' or (name == 'baseline' and self.mode == 'difference'):
+            return (getattr(this, name) + getattr(other, name))/2
+        if self.mode == 'difference':
+            return getattr(this, name) - getattr(other, name)
+        return getattr(this, name) / getattr(other, name)
+
+    def materialize(self):
+        """Calculate all fields and drop the references to the parents.
+
+        Returns the bleach itself.
+        """
+        for name in self.fields:
+            getattr(self, name)
+        self._parents = None
+        return self
+
+    def _like(self, **fields):
+        """New Bleach with fields and the axes of this bleach."""
+        return Bleach(
+            wavenumber=self.wavenumber, pp_delay=self.pp_delay, pixel=self.pixel,
+            pump_freq=self.pump_freq, pump_width=self.pump_width,
+            cc_width=self.cc_width, **fields
+        )
+
+    def _combine(self, other, operation):
+        """Combine two bleaches field by field.
+
+        Uncertainties add in quadrature. Baseline and norm are averaged, as
+        in `average`. Fields that are missing in either bleach stay None.
+        """
+        _check_grids((self, other))
+        fields = {}
+        for name in self.fields:
+            this, that = getattr(self, name), getattr(other, name)
+            if isinstance(this, type(None)) or isinstance(that, type(None)):
+                continue
+            if name.endswith('E'):
+                fields[name] = np.sqrt(this**2 + that**2)
+            elif name in ('baseline', 'norm'):
+                fields[name] = (this + that)/2
+            else:
+                fields[name] = operation(this, that)
+        return self._like(**fields)
+
+    def __add__(self, other):
+        """Sum of two bleaches with propagated uncertainties."""
+        return self._combine(other, np.add)
+
+    def __sub__(self, other):
+        """Difference of two bleaches with propagated uncertainties."""
+        return self._combine(other, np.subtract)
+
+    def __mul__(self, factor):
+        """Multiply the fields of the bleach by a number.
+
+        Baseline and norm are kept. Missing fields stay None.
+        """
+        if not np.isscalar(factor):
+            raise NotImplementedError('Bleach can only be multiplied by numbers')
+        fields = {}
+        for name in self.fields:
+            value = getattr(self, name)
+            if isinstance(value, type(None)):
+                continue
+            if name in ('baseline', 'norm'):
+                fields[name] = value
+            elif name.endswith('E'):
+                fields[name] = value * np.abs(factor)
+            else:
+                fields[name] = value * factor
+        return self._like(**fields)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, factor):
+        """Divide all fields of the bleach by a number."""
+        return self * (1/factor)
+
     @property
     def df(self):
-        """Return a long form pandas dataframe."""
+        """Return a long form pandas dataframe of all fields.
+
+        See `Bleach.to_df`.
+        """
+        return self.to_df()
+
+    def to_df(self, fields=None):
+        """Return a long form pandas dataframe.
+
+        fields: Names of the fields to export. Lazy fields among them are
+            calculated. Default are all fields, the bleach is materialized
+            for this. Fields that are None are left out.
+        """
         # TODO andd pump_width, pump_pos and cc_width.
+        if isinstance(fields, type(None)):
+            self.materialize()
+            fields = [
+                key for key in self.fields
+                if not isinstance(getattr(self, key), type(None))
+            ]
         dfs = []
-        for key in ('intensity', 'baseline', 'norm', 'basesubed', 'normalized', 'intensityE', 'normalizedE'):
+        for key in fields:
             df = pd.DataFrame(
                 getattr(self, key),
             )
@@ -621,10 +1173,13 @@ class Bleach():
         df = df.append(d, ignore_index=True)
         return df
 
-    def to_json(self, *args, **kwargs):
-        """Save spectrum to json with pd.Dataframe.to_json."""
+    def to_json(self, *args, fields=None, **kwargs):
+        """Save spectrum to json with pd.Dataframe.to_json.
+
+        fields: Names of the fields to save. See `Bleach.to_df`.
+        """
         logging.info('Saving to: %s' % args[0])
-        self.df.to_json(*args, **kwargs)
+        self.to_df(fields).to_json(*args, **kwargs)
 
     def get_trace(
             self, pixel=slice(None), delay=slice(None),
@@ -654,6 +1209,43 @@ class Bleach():
             delay=delay, bleachE=traceE,
         )
 
+    def get_traces(self, pixel=None, wavenumber=None, delay=slice(None)):
+        """Generate a TraceStack object with many traces of this bleach at once.
+
+        All traces and their uncertainties are calculated in one pass by
+        multiplying the data with a sparse averaging matrix.
+
+        pixel: list of (start, stop) windows refering to the `bleach.pixel` array.
+          As with `Bleach.get_trace`, start and stop are excluded.
+        wavenumber: list of (start, stop) windows refering to the `bleach.wavenumber`
+          array. Can be given instead of pixel.
+        delay: slice of pp_delays to use.
+        """
+        if not isinstance(delay, slice):
+            raise NotImplementedError('Delay must be slice object')
+        if isinstance(pixel, type(None)) == isinstance(wavenumber, type(None)):
+            raise ValueError('Pass either pixel or wavenumber windows')
+        if not isinstance(pixel, type(None)):
+            windows = np.array(pixel, dtype=float, ndmin=2)
+            axis = self.pixel
+        else:
+            windows = np.array(wavenumber, dtype=float, ndmin=2)
+            axis = self.wavenumber
+        average, counts = _window_matrix(axis, windows)
+
+        traces = average @ self.normalized[delay].T
+        # Error propagation for the uncertainty of the mean
+        tracesE = np.sqrt(average.power(2) @ (self.normalizedE[delay]**2).T)
+        # Empty windows have no mean
+        traces[counts == 0] = np.nan
+        tracesE[counts == 0] = np.nan
+        return TraceStack(
+            self.pp_delay[delay], bleach=traces, bleachE=tracesE,
+            pixel=pixel, wavenumber=wavenumber, delay=delay,
+            pump_freq=self.pump_freq, pump_width=self.pump_width,
+            cc_width=self.cc_width,
+        )
+
     def gaussian_filter1d(self, prop, *args, **kwargs):
         """Return gaussian filtered version of prop."""
         data = getattr(self, prop)
@@ -859,6 +1451,329 @@ class Trace():
             json.dump(self.dict, outfile)
 
 
+def _window_matrix(axis, windows):
+    """Sparse matrix to average axis values within open (start, stop) windows.
+
+    axis: 1D array. Doesn't need to be sorted.
+    windows: 2D array of shape (number of windows, 2)
+
+    Returns the averaging matrix of shape (len(windows), len(axis)) and the
+    number of axis points per window.
+    """
+    axis = np.asarray(axis)
+    order = np.argsort(axis, kind='stable')
+    sorted_axis = axis[order]
+    start = np.searchsorted(sorted_axis, windows.min(axis=1), side='right')
+    stop = np.searchsorted(sorted_axis, windows.max(axis=1), side='left')
+    counts = np.clip(stop - start, 0, None)
+
+    # Index of every selected axis point, window after window
+    rows = np.repeat(np.arange(len(windows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    columns = order[np.repeat(start, counts) + offsets]
+    weights = np.repeat(1/np.where(counts > 0, counts, 1), counts)
+    matrix = csr_matrix(
+        (weights, (rows, columns)), shape=(len(windows), len(axis))
+    )
+    return matrix, counts
+
+
+class TraceStack():
+    def __init__(
+            self, pp_delay, bleach, bleachE=None, pixel=None, wavenumber=None,
+            delay=None, pump_freq=None, pump_width=None, cc_width=None,
+    ):
+        """Class to encapsulate many traces of the same bleach.
+
+        Typically created by `Bleach.get_traces`. All traces share the same
+        pp_delay axis and are saved together into one json file with
+        `TraceStack.to_json`. Use `spectrum.json_to_tracestack` to read them
+        back. Indexing returns a single `Trace` object.
+
+        pp_delay: 1D array of pump_probe delays
+        bleach: 2D array of shape (number of traces, len(pp_delay))
+        bleachE: Uncertainty of the bleach. Same shape as bleach.
+        pixel: list of (start, stop) pixel windows used for the traces.
+        wavenumber: list of (start, stop) wavenumber windows used for the traces.
+        delay: slice of delays selected during creation
+        pump_freq: central pump frequency as int
+        pump_width: spectral width of the pump freq.
+        cc_width: temporal width of the cross correlation.
+        """
+        self.pp_delay = np.array(pp_delay)
+        self.bleach = bleach
+        self.bleachE = bleachE
+        self.pixel = pixel
+        self.wavenumber = wavenumber
+        self.delay = delay
+        self.pump_freq = pump_freq
+        self.pump_width = pump_width
+        self.cc_width = cc_width
+
+    @property
+    def bleach(self):
+        return self._bleach
+
+    @bleach.setter
+    def bleach(self, value):
+        value = np.array(value, ndmin=2)
+        if value.shape[1:] != self.pp_delay.shape:
+            raise ValueError(
+                "Shape of pp_delay {} and shape of bleach {} don't match".format(
+                    self.pp_delay.shape, value.shape
+                )
+            )
+        self._bleach = value
+
+    @property
+    def bleachE(self):
+        return self._bleachE
+
+    @bleachE.setter
+    def bleachE(self, value):
+        self._bleachE = np.array(value) * np.ones_like(self.bleach)
+
+    def _windows(self, value):
+        if isinstance(value, type(None)):
+            return None
+        value = np.array(value, ndmin=2)
+        if value.shape != (len(self), 2):
+            raise ValueError("Can't use {} as windows".format(value))
+        return value
+
+    @property
+    def pixel(self):
+        """Array of (start, stop) pixel windows or None"""
+        return self._pixel
+
+    @pixel.setter
+    def pixel(self, value):
+        self._pixel = self._windows(value)
+
+    @property
+    def wavenumber(self):
+        """Array of (start, stop) wavenumber windows or None"""
+        return self._wavenumber
+
+    @wavenumber.setter
+    def wavenumber(self, value):
+        self._wavenumber = self._windows(value)
+
+    def __len__(self):
+        return len(self.bleach)
+
+    def __getitem__(self, index):
+        """Return a single `Trace` object."""
+        if isinstance(index, slice):
+            raise NotImplementedError('Only integer indexing is allowed')
+        pixel, wavenumber = None, None
+        if not isinstance(self.pixel, type(None)):
+            pixel = self.pixel[index]
+        if not isinstance(self.wavenumber, type(None)):
+            wavenumber = self.wavenumber[index]
+        return Trace(
+            self.pp_delay, self.bleach[index], pixel=pixel, delay=self.delay,
+            pump_freq=self.pump_freq, pump_width=self.pump_width,
+            cc_width=self.cc_width, bleachE=self.bleachE[index],
+            wavenumber=wavenumber,
+        )
+
+    @property
+    def traces(self):
+        """List of `Trace` objects"""
+        return [self[index] for index in range(len(self))]
+
+    @property
+    def dict(self):
+        d = {
+            "pp_delay": self.pp_delay.tolist(),
+            "bleach": self.bleach.tolist(),
+            "bleachE": self.bleachE.tolist(),
+            "pump_freq": self.pump_freq,
+            "pump_width": self.pump_width,
+            "cc_width": self.cc_width,
+        }
+        for key in ('pixel', 'wavenumber'):
+            value = getattr(self, key)
+            if isinstance(value, type(None)):
+                d[key] = None
+            else:
+                d[key] = value.tolist()
+        if isinstance(self.delay, slice):
+            d['delay'] = [self.delay.start, self.delay.stop, self.delay.step]
+        else:
+            d['delay'] = None
+        return d
+
+    def to_json(self, fname):
+        """Save all traces into one json file."""
+        logging.info('Saving to: %s' % fname)
+        with open(Path(fname), "w") as outfile:
+            json.dump(self.dict, outfile)
+
+
+def _check_grids(spectra, align=False):
+    """Check that all spectra share the same wavenumber and pp_delay axes.
+
+    align: If True, spectra with different pp_delays are aligned on the
+      pp_delays they have in common.
+
+    Returns the common pp_delays and a list with the pp_delay index of each
+    spectrum.
+    """
+    first = spectra[0]
+    for spectrum in spectra[1:]:
+        if not np.array_equal(first.wavenumber, spectrum.wavenumber):
+            raise ValueError('Wavenumbers of the spectra must be the same')
+
+    pp_delay = getattr(first, 'pp_delay', None)
+    if isinstance(pp_delay, type(None)):
+        return None, [slice(None) for spectrum in spectra]
+    if all(np.array_equal(pp_delay, spectrum.pp_delay) for spectrum in spectra):
+        return pp_delay, [slice(None) for spectrum in spectra]
+    if not align:
+        raise ValueError('pp_delays of the spectra are not the same. Use align=True')
+    pp_delay = first.pp_delay
+    for spectrum in spectra[1:]:
+        pp_delay = np.intersect1d(pp_delay, spectrum.pp_delay)
+    if len(pp_delay) == 0:
+        raise ValueError('Spectra have no pp_delays in common')
+    index = []
+    for spectrum in spectra:
+        order = np.argsort(spectrum.pp_delay)
+        index.append(order[np.searchsorted(spectrum.pp_delay, pp_delay, sorter=order)])
+    return pp_delay, index
+
+
+def inverse_variance_mean(values, errors):
+    """Inverse-variance weighted mean of an iterable of arrays.
+
+    The arrays are summed up one after the other, so only two accumulators
+    are kept in memory, no matter how many arrays there are. Values with
+    non finite value or uncertainty get zero weight.
+
+    values: iterable of arrays
+    errors: iterable of uncertainties. Same shapes as values.
+
+    Returns the weighted mean and its uncertainty.
+    """
+    total, weights = None, None
+    for value, error in zip(values, errors):
+        with np.errstate(divide='ignore'):
+            weight = 1/np.square(error, dtype=float)
+        invalid = ~np.isfinite(weight) | ~np.isfinite(value)
+        weight = np.where(invalid, 0, weight)
+        if isinstance(total, type(None)):
+            total = np.where(invalid, 0, value * weight)
+            weights = weight
+        else:
+            total += np.where(invalid, 0, value * weight)
+            weights += weight
+    if isinstance(total, type(None)):
+        raise ValueError('Need at least one array')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return total/weights, 1/np.sqrt(weights)
+
+
+def _mean(values):
+    """Unweighted mean of an iterable of arrays."""
+    total, number = None, 0
+    for value in values:
+        if isinstance(total, type(None)):
+            total = np.array(value, dtype=float)
+        else:
+            total += value
+        number += 1
+    return total/number
+
+
+def _mean_error(errors):
+    """Uncertainty of the unweighted mean of an iterable of arrays."""
+    total, number = None, 0
+    for error in errors:
+        if isinstance(total, type(None)):
+            total = np.square(error, dtype=float)
+        else:
+            total += np.square(error)
+        number += 1
+    return np.sqrt(total)/number
+
+
+def stack(spectra, prop, align=False):
+    """Stack property prop of many spectra into one array.
+
+    spectra: list of `PumpProbe` or `Bleach` objects with the same axes.
+    prop: name of the property to stack, e.g. 'normalized'.
+    align: Align the spectra on their common pp_delays.
+
+    Returns array of shape (len(spectra), ...)
+    """
+    spectra = list(spectra)
+    pp_delay, index = _check_grids(spectra, align)
+    return np.stack([getattr(spectrum, prop)[i] for spectrum, i in zip(spectra, index)])
+
+
+def average(spectra, weighted=True, align=False):
+    """Average repeated measurements.
+
+    With weighted=True, an inverse-variance weighted mean is calculated. The
+    weights of `Bleach` objects are given by `normalizedE` and `intensityE`,
+    the weights of `PumpProbe` objects by `intensityE`. Baseline and norm
+    are always averaged without weights. Fields that are missing in any of
+    the spectra stay None. Memory stays linear in the number
+    of spectra, because the mean is accumulated spectrum by spectrum.
+
+    spectra: list of `PumpProbe` or `Bleach` objects with the same wavenumber axis.
+    weighted: Use inverse-variance weights. Else use the plain mean.
+    align: Align the spectra on their common pp_delays. Else pp_delays must match.
+
+    Returns a `PumpProbe` or `Bleach` object.
+    """
+    spectra = list(spectra)
+    if not all(isinstance(spectrum, (PumpProbe, Bleach)) for spectrum in spectra):
+        raise NotImplementedError('Only PumpProbe and Bleach objects can be averaged')
+    pp_delay, index = _check_grids(spectra, align)
+
+    def values(prop):
+        return (getattr(spectrum, prop)[i] for spectrum, i in zip(spectra, index))
+
+    def weighted_mean(prop, error):
+        if weighted:
+            return inverse_variance_mean(values(prop), values(error))
+        return _mean(values(prop)), _mean_error(values(error))
+
+    def available(*props):
+        return not any(
+            isinstance(getattr(spectrum, prop), type(None))
+            for spectrum in spectra for prop in props
+        )
+
+    first = spectra[0]
+    fields = {}
+    for prop in ('baseline', 'norm'):
+        if available(prop):
+            fields[prop] = _mean(values(prop))
+    if available('intensity', 'intensityE'):
+        fields['intensity'], fields['intensityE'] = weighted_mean('intensity', 'intensityE')
+    if isinstance(first, PumpProbe):
+        return PumpProbe(
+            wavenumber=first.wavenumber, pp_delay=pp_delay, pixel=first.pixel,
+            pump_freq=first.pump_freq, pump_width=first.pump_width,
+            cc_width=first.cc_width, **fields
+        )
+    if available('basesubed', 'intensityE'):
+        fields['basesubed'] = weighted_mean('basesubed', 'intensityE')[0]
+    if available('normalized', 'normalizedE'):
+        fields['normalized'], fields['normalizedE'] = weighted_mean(
+            'normalized', 'normalizedE'
+        )
+    return Bleach(
+        wavenumber=first.wavenumber, pp_delay=pp_delay, pixel=first.pixel,
+        pump_freq=first.pump_freq, pump_width=first.pump_width,
+        cc_width=first.cc_width, **fields
+    )
+
+
 def json_to_spectrum(*args, **kwargs):
     """Read Spectrum for json file."""
     df = pd.read_json(*args, **kwargs)
@@ -874,10 +1789,10 @@ def _json_to_dict(*args, **kwargs):
     for name, group in df.groupby("name"):
         # Need to make a copy here to prevent error messages.
         d = group.drop("name", axis=1)
-        if name == "intensity":
-            data["pp_delay"] = d.pop("pp_delay")
-        else:
+        if name in ("wavenumber", "pixel"):
             d.drop("pp_delay", axis=1, inplace=True)
+        else:
+            data["pp_delay"] = d.pop("pp_delay").to_numpy()
         data[name] = d.to_numpy()
 
     # PandasDataframes transform to 2d arrays
@@ -917,6 +1832,15 @@ def json_to_trace(fname):
     return Trace(**data)
 
 
+def json_to_tracestack(fname):
+    """Read TraceStack from json file."""
+    with open(Path(fname)) as f:
+        data = json.load(f)
+    if not isinstance(data.get('delay'), type(None)):
+        data['delay'] = slice(*data['delay'])
+    return TraceStack(**data)
+
+
 def json_to_PSSHG(*args, **kwargs):
     df = pd.read_json(*args, **kwargs)
     data = {index: df.loc[index] for index in df.index}
@@ -17,36 +17,36 @@ def run(config, config_path):
     static_difference_correction = config.get('static_difference_correction', False)
     heat_correction = config.get('heat_correction', False)
     out = config_path / Path(config['out'])
+    # Fields to save. Default are all fields.
+    fields = config.get('fields')
 
     # This generates a `pysfg.Bleach` object.
+    # Level of the bleach without pump. The corrections keep this level.
     if mode == "difference":
         logging.info('Run difference mode')
         bleach = probed_data - pumped_data
+        baseline = 0
     elif mode == "ratio":
         logging.info('Run ratio mode')
-        # By removing 1 here, the subsequent heat and static_difference_corrections work
-        # correctly. At the end. we add the 1 again.
         bleach = probed_data / pumped_data
-        bleach.normalized -= 1
+        baseline = 1
     else:
         raise ValueError('Cant understand given mode')
 
     if static_difference_correction:
         logging.info('Running static difference correction')
         # This corrects for static differences between pumped and unpumped
-        bleach.normalized = bleach.normalized-bleach.normalized[0]
-
+        bleach.normalized -= bleach.normalized[0] - baseline
 
     if heat_correction:
         kwargs = heat_correction
         logging.info('Running heat correction with: {}'.format(kwargs))
         # Heat correction
-        bleach.normalized = pysfg.filter.heat_filter(bleach.normalized, bleach.pp_delay, **kwargs)
-
-    if mode == "ratio":
-        bleach.normalized += 1
+        bleach.normalized = pysfg.filter.heat_filter(
+            bleach.normalized, bleach.pp_delay, baseline=baseline, **kwargs
+        )
     # Save bleach in cache folder
-    bleach.to_json(out)
+    bleach.to_json(out, fields=fields)
 
 
 def main():
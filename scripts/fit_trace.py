@@ -5,34 +5,36 @@ import argparse
 import logging
 import yaml
 import pysfg
-import numpy as np
 import IPython.display as ipd
 
 
-def run(config, config_path):
+def problem(config, config_path):
+    """Fit problem (x, y, yerr, kwargs) of a config entry."""
     logging.debug(config)
     fpath = config_path / Path(config['trace_data'])
     roi = slice(*config.get('roi', [None]))
     roi_pp_delay = config.get('roi_pp_delay')
     pp_delay_scale = config.get('pp_delay_scale', 1)
     bleach_scale = config.get('bleach_scale', 1)
-    out = config_path / Path(config['out'])
     kwargs = config.get('kwargs', {})
     tr = pysfg.json_to_trace(fpath)
     logging.info('Running %s' % fpath)
 
     if roi_pp_delay:
-        roi_pp_delay = slice(*roi_pp_delay)
-        index = np.where((tr.pp_delay>roi_pp_delay.start)&(tr.pp_delay<roi_pp_delay.stop))[0]
-        _p = tr.pp_delay[index]
-        roi = slice(_p.min(), _p.max())
-
-    fit = pysfg.fit.TraceFourLevel(
-        x=tr.pp_delay[roi]*pp_delay_scale, # To get from fs to ps
-        y=tr.bleach[roi]*bleach_scale, # Scale by 10 to have numbers closer to 1
-        yerr=tr.bleachE[roi]*bleach_scale,
-        **kwargs,
+        roi = pysfg.select.range_to_slice(tr.pp_delay, *roi_pp_delay, closed=False)
+
+    return (
+        tr.pp_delay[roi]*pp_delay_scale, # To get from fs to ps
+        tr.bleach[roi]*bleach_scale, # Scale by 10 to have numbers closer to 1
+        tr.bleachE[roi]*bleach_scale,
+        kwargs,
     )
+
+
+def run(config, config_path):
+    x, y, yerr, kwargs = problem(config, config_path)
+    out = config_path / Path(config['out'])
+    fit = pysfg.fit.TraceFourLevel(x=x, y=y, yerr=yerr, **kwargs)
     ipd.display(fit.minuit.migrad())
     #ipd.display(fit.minuit.hesse())
     #print(fit.minuit.values)
@@ -41,6 +43,20 @@ def run(config, config_path):
     fit.to_json(out)
     return fit
 
+
+def run_batch(configs, config_path, jobs=None):
+    """Fit all config entries in a pool of jobs processes.
+
+    Returns the results table of `pysfg.fit.fit_batch`.
+    """
+    problems = [problem(config, config_path) for config in configs]
+    results = pysfg.fit.fit_batch(problems, pysfg.fit.TraceFourLevel, jobs)
+    for config, serialized in zip(configs, results['fit']):
+        pysfg.fit.dict_to_json(serialized, config_path / Path(config['out']))
+    logging.info('Batch results:\n%s' % results.drop(columns='fit').to_string())
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(description='Make Traces.')
     parser.add_argument(
@@ -51,6 +67,10 @@ def main():
         '--debug', default="INFO",
         help="Debug Level. Default INFO, Possible: DEBUG, INFO, WARN, ERROR, CRITICAL ",
     )
+    parser.add_argument(
+        '--jobs', type=int,
+        help="Fit the traces in a pool of JOBS processes. 0 uses all cpus. Default fits one after the other.",
+    )
     args = parser.parse_args()
     if args.debug:
         logging.basicConfig(level=getattr(logging, args.debug))
@@ -64,8 +84,11 @@ def main():
         # scalar values to Python in the dictionary format
         config = yaml.load(file, Loader=yaml.FullLoader)
 
-    for data_config in config['data']:
-        run(data_config, config_path)
+    if isinstance(args.jobs, type(None)):
+        for data_config in config['data']:
+            run(data_config, config_path)
+    else:
+        run_batch(config['data'], config_path, args.jobs or None)
 
 
 if __name__ == "__main__":
@@ -4,11 +4,12 @@
 
 from pathlib import Path
 import numpy as np
+import pandas as pd
 import pysfg
 import yaml
 import logging
 import argparse
-from scipy.stats import sem
+
 
 def run(config, config_path):
     """The run loop"""
@@ -24,7 +25,9 @@ def run(config, config_path):
     if reference:
         reference = config_path / Path(reference)
     mask = config.get('mask')
+    fft_options = {key: config.get(key) for key in ('resample', 'fft_length', 'window')}
     out = config_path / Path(config['out'])
+    frames = config.get('frames')
 
     if mask:
         mask = slice(*mask)
@@ -32,6 +35,7 @@ def run(config, config_path):
     background_data = pysfg.read.spe.data_file(background_data)
     wavelength = background_data['wavelength'][pixel_slice]
     background_data = np.median(background_data['raw_data'], [0, 1])[pixel_slice]
+    interference_fname = interference_data
     interference_data = pysfg.read.spe.data_file(interference_data)
     interference_data = np.median(interference_data['raw_data'], [0, 1])[pixel_slice] - background_data + background_offset.get('interference', 0)
     local_oszillator_data = pysfg.read.spe.data_file(local_oszillator_data)
@@ -44,11 +48,55 @@ def run(config, config_path):
     # correct for LO and Sample SHG contributions
     spectrum = pysfg.spectrum.PSSHG(
         interference_data, local_oszillator_data, sample_shg_data,
-        wavelength, mask=mask, reference=reference
+        wavelength, mask=mask, reference=reference, **fft_options
     )
     logging.info('Saving to %s'%out)
     spectrum.to_json(out)
 
+    if frames:
+        run_frames(
+            frames, config_path, interference_fname, pixel_slice, background_data,
+            background_offset.get('interference', 0), spectrum
+        )
+
+
+def run_frames(
+    config, config_path, fname, pixel_slice, background_data, offset, spectrum
+):
+    """Frame resolved phase of the interference data.
+
+    The frames are streamed from the spe file in chunks of `chunk_size`
+    frames. Phaseshift and amplitude of each frame relative to the
+    reference of `spectrum` are saved to `out`. The drift corrected
+    spectrum is saved to `spectrum_out` if given.
+    """
+    chunk_size = config.get('chunk_size', 100)
+    out = config_path / Path(config['out'])
+    spectrum_out = config.get('spectrum_out')
+
+    chunks = (
+        np.median(chunk, 1)[:, pixel_slice] - background_data + offset
+        for chunk in pysfg.read.spe.iter_frames(fname, chunk_size)
+    )
+    phaseshift, amplitude, drift_corrected = pysfg.spectrum.phase_drift(
+        chunks, spectrum.local_oszillator, spectrum.sample, spectrum.reference,
+        spectrum.wavelength, spectrum.mask, resample=spectrum.resample,
+        fft_length=spectrum.fft_length, window=spectrum.window
+    )
+    df = pd.DataFrame({'phaseshift': phaseshift, 'amplitude': amplitude})
+    df.index.name = 'frame'
+    logging.info('Saving to %s' % out)
+    df.to_json(out)
+    if spectrum_out:
+        spectrum_out = config_path / Path(spectrum_out)
+        df = pd.DataFrame({
+            'wavelength': spectrum.wavelength,
+            'real': drift_corrected.real,
+            'imag': drift_corrected.imag,
+        })
+        logging.info('Saving to %s' % spectrum_out)
+        df.to_json(spectrum_out)
+
 
 def main():
     """main function taking care of user input and running main loop."""
@@ -12,7 +12,6 @@ import pysfg
 import yaml
 import logging
 import argparse
-from scipy.stats import sem
 
 
 def run(config, config_path):
@@ -26,6 +25,7 @@ def run(config, config_path):
     # Read config
     intensity_data = config_path / Path(config['intensity_data'])
     intensity_selector = pysfg.SelectorPP(**config.get('intensity_selector', {}))
+    spike_filter = config.get('spike_filter')
     background_data = config.get('background_data')
     background_selector = pysfg.SelectorPP(**config.get('background_selector', {}))
     norm_data = config.get('norm_data')
@@ -53,6 +53,16 @@ def run(config, config_path):
     intensity_data_selected = intensity_data['data'][intensity_selector.tselect]
     logging.info('Using data_select is: \n%s' % intensity_selector)
 
+    # Remove cosmic spikes before the scans are combined. spike_filter can be
+    # True or a dict of kwargs for pysfg.filter.remove_spikes.
+    if spike_filter:
+        if not isinstance(spike_filter, dict):
+            spike_filter = {}
+        intensity_data_selected, spikes = pysfg.filter.remove_spikes(
+            intensity_data_selected, **spike_filter
+        )
+        logging.info('Removed %s spikes', spikes.sum())
+
     # This allows to pass norm as path to a norm spectrum in json format,
     # to leave it empty or to pass an array.
     if not isinstance(norm_data, type(None)):
@@ -69,7 +79,13 @@ def run(config, config_path):
 
     # This allows to pass background data as number or as path to data file, or to leave
     # it empty
-    if not isinstance(background_data, type(None)):
+    if background_data == 'auto':
+        # Master background with the detector settings of the data
+        library = pysfg.background.from_config(config['background_library'], config_path)
+        background_data = library.master(intensity_data)[
+            background_selector.spectra, intensity_selector.pixel
+        ]
+    elif not isinstance(background_data, type(None)):
         if isinstance(background_data, str):
             background_data = config_path / Path(background_data)
             background_data = pysfg.read.victor.data_file(background_data)
@@ -83,7 +99,7 @@ def run(config, config_path):
     wavelength = intensity_data.get('wavelength')
     if not isinstance(wavelength, type(None)):
         logging.info('Use wavelength of data file to calculate wavenumber.')
-        wavenumber = pysfg.calibration.Calibration2(
+        wavenumber = pysfg.calibration.from_wavelength(
             vis_wl=calibration_config['vis_wl'],
             wavelength=wavelength
         ).wavenumber[intensity_selector.pixel]
@@ -92,7 +108,7 @@ def run(config, config_path):
            calibration_config.get('calib_coeff'):
             raise NotImplementedError('Calibration not fully implemented for .spe files')
     else:
-        calibration = pysfg.Calibration(
+        calibration = pysfg.calibration.from_parameters(
             calibration_config.get('central_wl', intensity_data['central_wl']),
             calibration_config.get('vis_wl', intensity_data['vis_wl']),
             calibration_config.get('calib_central_wl', intensity_data['calib_central_wl']),
@@ -101,15 +117,15 @@ def run(config, config_path):
         wavenumber = calibration.wavenumber[intensity_selector.pixel]
         logging.info('Using Calibration with: \n%s' % calibration)
 
-    intensity = np.median(
-        intensity_data_selected,
+    intensity = pysfg.reduce.aggregate(
+        intensity_data_selected, 'median',
         axis=(0, 1)  # Median over pp_delay and scans
-    )
+    )['median']
 
-    intensityE = sem(
-        np.median(intensity_data_selected, axis=0),
-        axis=(0)  # Median over pp_delay standard error of the mean over scans.
-    )
+    intensityE = pysfg.reduce.aggregate(
+        pysfg.reduce.aggregate(intensity_data_selected, 'median', axis=0)['median'],
+        'sem', axis=0  # Median over pp_delay standard error of the mean over scans.
+    )['sem']
 
     spectrum = pysfg.Spectrum(
         intensity=intensity,
@@ -134,7 +150,13 @@ def main():
         '--debug', default="INFO",
         help="Debug Level. Default INFO, Possible: DEBUG, INFO, WARN, ERROR, CRITICAL ",
     )
+    parser.add_argument(
+        '--threads', type=int,
+        help="Number of threads to reduce the data with. Default is PYSFG_NUM_THREADS or the number of cpus.",
+    )
     args = parser.parse_args()
+    if args.threads:
+        pysfg.reduce.set_num_threads(args.threads)
     if args.debug:
         logging.basicConfig(level=getattr(logging, args.debug))
     else:
@@ -154,6 +176,7 @@ def main():
         # Combine local and global calibration parameters.
         data_config_calibration = dict(data_config.get('calibration', {}))
         data_config['calibration'] = {**calibration_config, **data_config_calibration}
+        data_config.setdefault('background_library', config.get('background_library'))
         run(data_config, config_path)
 
 
@@ -6,22 +6,33 @@ import argparse
 import pysfg
 import logging
 import yaml
-from scipy.stats import sem
 
 
 def run(config, config_path):
+    """Main run loop element.
+
+    config is a dict describing the configuration of this run.
+    config_path is the path of the folder where this configuration file is located.
+
+    With a `channels` list, several spectra of the same data file are
+    processed from one read, one calibration and one reduction. Each channel
+    needs its `spectra` index and `out` path and can set its own
+    `background_spectra` and `norm_data`. Without channels the spectrum of the
+    intensity_selector is written to `out`.
+    """
     logging.debug(config)
     # Read config
     intensity_data = config_path / Path(config['intensity_data'])
     intensity_selector = pysfg.SelectorPP(**config.get('intensity_selector', {}))
     intensity_filter = config.get('intensity_filter', None)
+    spike_filter = config.get('spike_filter')
     drift_correction_params = config.get("drift_correction_params")
+    noise_model = config.get('noise_model')
     background_data = config.get('background_data')
     background_selector = pysfg.SelectorPP(**config.get('background_selector', {}))
     background_selector.pixel = intensity_selector.pixel
     norm_data = config.get('norm_data')
     calibration_config = config.get('calibration', {})
-    out = config_path / Path(config['out'])
     pump_freq = config.get('pump_freq')
     pump_width = config.get('pump_width')
     cc_width = config.get('cc_width')
@@ -32,28 +43,57 @@ def run(config, config_path):
         intensity_selector.spectra = 0
     if background_selector.spectra == slice(None):
         background_selector.spectra = 0
+    channels = config.get('channels')
+    if isinstance(channels, type(None)):
+        channels = [{'spectra': intensity_selector.spectra, 'out': config['out']}]
+    spectra = [channel['spectra'] for channel in channels]
+    background_spectra = [
+        channel.get('background_spectra', background_selector.spectra) for channel in channels
+    ]
+
     # Import Data and get its structure
     logging.info('****New Config****')
     logging.info('Importing: %s', intensity_data)
     logging.info('Using data_select is: %s', intensity_selector)
+    logging.info('Using spectra: %s', spectra)
     intensity_data = pysfg.read.victor.data_file(intensity_data)
-    intensity_data_selected = intensity_data['data'][intensity_selector.tselect]
-
-    # background can be a path, number or None.
-    if isinstance(background_data, str):
+    # All channels at once. Shape is (pp_delay, scans, channels, pixel)
+    intensity_data_selected = intensity_data['data'][
+        intensity_selector.pp_delays, intensity_selector.scans,
+        spectra, intensity_selector.pixel
+    ]
+
+    # Remove cosmic spikes before the scans are combined. spike_filter can be
+    # True or a dict of kwargs for pysfg.filter.remove_spikes.
+    if spike_filter:
+        if not isinstance(spike_filter, dict):
+            spike_filter = {}
+        intensity_data_selected, spikes = pysfg.filter.remove_spikes(
+            intensity_data_selected, **spike_filter
+        )
+        logging.info('Removed %s spikes', spikes.sum())
+
+    # background can be auto, a path, number or None.
+    if background_data == 'auto':
+        # Master background with the detector settings of the data
+        library = pysfg.background.from_config(config['background_library'], config_path)
+        background_data_selected = library.master(intensity_data)[
+            background_spectra, background_selector.pixel
+        ] * np.ones_like(intensity_data_selected)
+    elif isinstance(background_data, str):
         background_data = pysfg.read.victor.data_file(config_path / Path(background_data))
-        background_data_selected = background_data['data'][background_selector.tselect]
+        background_data_selected = background_data['data'][
+            background_selector.pp_delays, background_selector.scans,
+            background_spectra, background_selector.pixel
+        ]
     elif background_data:
         background_data_selected = background_data * np.ones_like(intensity_data_selected)
     else:
         background_data_selected = np.zeros_like(intensity_data_selected)
-    baseline = np.median(
-        background_data_selected,
-        axis=(1)
-    )
+    baseline = pysfg.reduce.aggregate(background_data_selected, 'median')['median']
 
     # Get calibration. Not passed vales are read from datafile.
-    calibration = pysfg.Calibration(
+    calibration = pysfg.calibration.from_parameters(
         calibration_config.get('central_wl', intensity_data['central_wl']),
         calibration_config.get('vis_wl', intensity_data['vis_wl']),
         calibration_config.get('calib_central_wl', intensity_data['calib_central_wl']),
@@ -70,49 +110,67 @@ def run(config, config_path):
             filter_function = lambda x: gaussian_filter1d(x, **gf_keywords)
 
     # Apply drift correction must be applied to the scan axis. Thus before the
-    # calculation if intensity from intensity_data_selected
+    # calculation if intensity from intensity_data_selected. The drift is
+    # estimated and corrected for every channel on its own.
     if not isinstance(drift_correction_params, type(None)):
-        logging.info("Applying drift correction %s", drift_correction_params)
-        intensity_data_selected = pysfg.filter.drift_correction(
-            drift_correction_params, intensity_data_selected,
-            np.mean(background_data_selected, axis=1, keepdims=True) * np.ones_like(intensity_data_selected)
+        drift_background = np.mean(background_data_selected, axis=1, keepdims=True)
+        # Raw data can be integers. The channels are corrected in place as float.
+        intensity_data_selected = np.asarray(intensity_data_selected, dtype=float)
+        for index in range(len(channels)):
+            params = drift_correction_params
+            if params == 'auto':
+                params = pysfg.filter.estimate_drift(
+                    intensity_data_selected[:, :, index], drift_background[:, :, index],
+                    slice(*config.get('drift_correction_roi', [None])),
+                    config.get('drift_correction_deg', 1),
+                )
+            logging.info("Applying drift correction %s", params)
+            pysfg.filter.drift_correction(
+                params, intensity_data_selected[:, :, index], drift_background[:, :, index],
+                inplace=True,
+            )
+
+    if noise_model:
+        # Inverse variance weighted mean of the scans with analytic uncertainty.
+        noise_model = pysfg.noise.NoiseModel.from_header(intensity_data, **noise_model)
+        logging.info('Using %s', noise_model)
+        intensity, intensityE = pysfg.noise.scan_average(
+            intensity_data_selected, noise_model, background_data_selected
         )
-
-    intensity = np.median(
-        intensity_data_selected,
-        axis=(1)  # Takes the median of the scans
-    )
+    else:
+        # Median of the scans and uncertainties from the scans in one pass.
+        stats = pysfg.reduce.aggregate(intensity_data_selected, ('median', 'sem'))
+        intensity = stats['median']
+        intensityE = stats['sem']
     if intensity_filter:
         intensity = filter_function(intensity)
 
-    intensityE = sem(
-        intensity_data_selected,
-        axis=(1)  # Estimate uncertainties from scans
-    )
-
     if intensity_filter:
         baseline = filter_function(baseline)
 
-    norm = None
-    if norm_data:
-        norm = pysfg.spectrum.json_to_spectrum(config_path / Path(norm_data)).basesubed
-        if len(norm) != np.shape(intensity)[-1]:
-            norm = norm[intensity_selector.pixel]
-
-    spectrum = pysfg.spectrum.PumpProbe(
-        intensity=intensity,
-        baseline=baseline,
-        norm=norm,
-        wavenumber=calibration.wavenumber[intensity_selector.pixel],
-        pp_delay=intensity_data['timedelay'],
-        intensityE=intensityE,
-        pixel=intensity_selector.pixel,
-        pump_freq=pump_freq,
-        pump_width=pump_width,
-        cc_width=cc_width,
-    )
+    wavenumber = calibration.wavenumber[intensity_selector.pixel]
+    for index, channel in enumerate(channels):
+        norm = None
+        channel_norm_data = channel.get('norm_data', norm_data)
+        if channel_norm_data:
+            norm = pysfg.spectrum.json_to_spectrum(config_path / Path(channel_norm_data)).basesubed
+            if len(norm) != np.shape(intensity)[-1]:
+                norm = norm[intensity_selector.pixel]
+
+        spectrum = pysfg.spectrum.PumpProbe(
+            intensity=intensity[:, index],
+            baseline=baseline[:, index],
+            norm=norm,
+            wavenumber=wavenumber,
+            pp_delay=intensity_data['timedelay'],
+            intensityE=intensityE[:, index],
+            pixel=intensity_selector.pixel,
+            pump_freq=pump_freq,
+            pump_width=pump_width,
+            cc_width=cc_width,
+        )
 
-    spectrum.to_json(out)
+        spectrum.to_json(config_path / Path(channel['out']))
 
 
 def main():
@@ -125,7 +183,13 @@ def main():
         '--debug', default="INFO",
         help="Debug Level. Default INFO, Possible: DEBUG, INFO, WARN, ERROR, CRITICAL ",
     )
+    parser.add_argument(
+        '--threads', type=int,
+        help="Number of threads to reduce the data with. Default is PYSFG_NUM_THREADS or the number of cpus.",
+    )
     args = parser.parse_args()
+    if args.threads:
+        pysfg.reduce.set_num_threads(args.threads)
     if args.debug:
         logging.basicConfig(level=getattr(logging, args.debug))
     else:
@@ -151,6 +215,7 @@ def main():
         data_config['pump_freq'] =  data_config.get('pump_freq', pump_freq)
         data_config['pump_width'] = data_config.get('pump_width', pump_width)
         data_config['cc_width'] =  data_config.get('cc_width', cc_width)
+        data_config.setdefault('background_library', config.get('background_library'))
         run(data_config, config_path)
 
 
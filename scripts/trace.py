@@ -12,18 +12,27 @@ def run(config, config_path):
     logging.debug(config)
     bleach_data = pysfg.spectrum.json_to_bleach(config_path / Path(config["bleach_data"]))
     traces_config = config.get('traces')
+    windows = []
     for trace_config_block in traces_config:
-        out = config_path / Path(trace_config_block['out'])
-        pixel = slice(*trace_config_block.get('pixel', [None]))
+        pixel = trace_config_block.get('pixel', [-np.inf, np.inf])
         wavenumber = trace_config_block.get('wavenumber')
         if wavenumber:
-            wavenumber = slice(*wavenumber)
-            index = np.where((bleach_data.wavenumber>wavenumber.start)&(bleach_data.wavenumber<wavenumber.stop))[0]
+            index = pysfg.select.range_to_slice(bleach_data.wavenumber, *wavenumber, closed=False)
             _p = bleach_data.pixel[index]
-            pixel = slice(_p.min(), _p.max())
-        trace = bleach_data.get_trace(pixel=pixel)
+            pixel = [_p.min(), _p.max()]
+        windows.append(pixel)
+
+    # All traces are calculated at once.
+    traces = bleach_data.get_traces(pixel=windows)
+    for trace_config_block, trace in zip(traces_config, traces.traces):
+        out = config_path / Path(trace_config_block['out'])
         trace.to_json(out)
 
+    # Optionally save all traces into a single file
+    out = config.get('out')
+    if out:
+        traces.to_json(config_path / Path(out))
+
 
 def main():
     parser = argparse.ArgumentParser(description='Make Traces.')
@@ -0,0 +1,102 @@
+"""Unittest module for the pysfg.background module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import pysfg
+
+DATA = Path(__file__).parent / 'data'
+
+
+class TestBackgroundLibrary(unittest.TestCase):
+    files = [DATA / 'gold_bg.dat', DATA / 'bg_quartz.dat', DATA / 'bg_d2o-docpe.dat']
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_settings(self):
+        data = pysfg.read.victor.data_file(DATA / 'gold.dat')
+        self.assertEqual(pysfg.background.settings(data), (15, 1, None, 680, None))
+        data = pysfg.read.spe.data_file(DATA / 'gold.spe')
+        key = pysfg.background.settings(data)
+        self.assertEqual(key[:4], (10, None, -55, 660))
+        self.assertIsInstance(key[4], str)
+
+    def test_master(self):
+        library = pysfg.background.BackgroundLibrary.from_files(self.files)
+        self.assertEqual(len(library), 3)
+        data = pysfg.read.victor.data_file(DATA / 'gold.dat')
+        background = pysfg.read.victor.data_file(DATA / 'gold_bg.dat')
+        self.assertIn(data, library)
+        self.assertTrue(np.array_equal(
+            library.master(data), np.median(background['data'], axis=(0, 1))
+        ))
+        with self.assertRaises(ValueError):
+            library.master(pysfg.read.spe.data_file(DATA / 'gold.spe'))
+        with self.assertRaises(ValueError):
+            library.master(data)[0, 0] = 0
+
+    def test_pooling(self):
+        first = self.tmp / 'first_bg.dat'
+        shutil.copy(DATA / 'bg_quartz.dat', first)
+        shutil.copy(DATA / 'sc_quartz.dat', self.tmp / 'second_bg.dat')
+        library = pysfg.background.BackgroundLibrary.from_files(self.tmp.glob('*.dat'))
+        self.assertEqual(len(library), 1)
+        stack = np.concatenate([
+            pysfg.read.victor.data_file(DATA / name)['data'][0]
+            for name in ('bg_quartz.dat', 'sc_quartz.dat')
+        ])
+        master = library.master(pysfg.read.victor.data_file(first))
+        self.assertTrue(np.array_equal(master, np.median(stack, axis=0)))
+
+    def test_cache(self):
+        shutil.copy(DATA / 'gold_bg.dat', self.tmp / 'gold_bg.dat')
+        cache = self.tmp / 'background.npz'
+        library = pysfg.background.BackgroundLibrary.from_files(
+            [self.tmp / 'gold_bg.dat'], cache
+        )
+        self.assertTrue(cache.is_file())
+        loaded = pysfg.background.BackgroundLibrary.load(cache)
+        self.assertEqual(loaded.sources, library.sources)
+        self.assertEqual(list(loaded.masters), list(library.masters))
+        for key in library.masters:
+            self.assertTrue(np.array_equal(loaded.masters[key], library.masters[key]))
+
+        # Changed background files invalidate the cache
+        shutil.copy(DATA / 'bg_quartz.dat', self.tmp / 'bg_quartz.dat')
+        library = pysfg.background.BackgroundLibrary.from_files(
+            self.tmp.glob('*.dat'), cache
+        )
+        self.assertEqual(len(pysfg.background.BackgroundLibrary.load(cache)), 2)
+        mtime = os.stat(cache).st_mtime
+        pysfg.background.BackgroundLibrary.from_files(self.tmp.glob('*.dat'), cache)
+        self.assertEqual(os.stat(cache).st_mtime, mtime)
+
+    def test_library(self):
+        fname = self.tmp / 'gold_bg.dat'
+        shutil.copy(DATA / 'gold_bg.dat', fname)
+        library = pysfg.background.library([fname])
+        self.assertIs(pysfg.background.library([fname]), library)
+
+        # Changed background files are picked up
+        os.utime(fname, (0, 0))
+        self.assertIsNot(pysfg.background.library([fname]), library)
+
+    def test_from_config(self):
+        library = pysfg.background.from_config(
+            {'files': ['data/*bg*.dat', 'data/*.spe']}, Path(__file__).parent
+        )
+        data = pysfg.read.spe.data_file(DATA / 'quartz_v2.spe')
+        self.assertEqual(library.master(data).shape, data['data'].shape[2:])
+        with self.assertRaises(ValueError):
+            pysfg.background.from_config({}, DATA)
+
+
+if __name__ == '__main__':
+    unittest.main()
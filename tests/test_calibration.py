@@ -36,6 +36,23 @@ class TestCalibration(unittest.TestCase):
         os.chdir(dir_path)
         wv = pysfg.calibration.from_vivian_file(Path("data/gold.dat"))
         self.assertListEqual(wv.wavenumber.tolist(), np.load(Path("results/wavenumber_vivian.npy")).tolist())
+    def test_from_parameters(self):
+        c = pysfg.calibration.from_parameters(674, 800, 670, np.array([3.42740e-02, 6.42101e+02]))
+        self.assertIs(c, pysfg.calibration.from_parameters(674., 800., 670., [3.42740e-02, 6.42101e+02]))
+        self.assertEqual(c, pysfg.calibration.Calibration(674, 800, 670, [3.42740e-02, 6.42101e+02]))
+        self.assertEqual(len({c, pysfg.calibration.Calibration(674, 800, 670, [3.42740e-02, 6.42101e+02])}), 1)
+        self.assertListEqual(c.wavenumber.tolist(), np.load(dir_path / Path("results/wavenumber.npy")).tolist())
+        self.assertIs(c.wavenumber, c.wavenumber)
+        with self.assertRaises(AttributeError):
+            c.vis_wl = 810
+        with self.assertRaises(ValueError):
+            c.wavenumber[0] = 0
+
+    def test_from_wavelength(self):
+        wavelength = np.linspace(600, 700, 100)
+        c = pysfg.calibration.from_wavelength(800, wavelength)
+        self.assertIs(c, pysfg.calibration.from_wavelength(800, wavelength.copy()))
+        self.assertTrue(np.all(c.wavenumber == pysfg.calibration.Calibration2(800, wavelength).wavenumber))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+"""Unittest module for the pysfg.filter module."""
+
+import unittest
+import numpy as np
+import pysfg
+
+
+class TestHeat(unittest.TestCase):
+    times = np.linspace(-500, 5000, 40)
+    H0 = np.linspace(-0.1, 0.1, 50)
+    tau = np.linspace(500, 1500, 50)
+
+    def test_heat_time(self):
+        ret = pysfg.filter.heat_time(self.times, self.H0, self.tau)
+        self.assertEqual(ret.shape, (40, 50))
+        for i, t in enumerate(self.times):
+            expected = [pysfg.filter.heat_time(t, H0, tau) for H0, tau in zip(self.H0, self.tau)]
+            self.assertTrue(np.allclose(ret[i], expected))
+        self.assertTrue(np.all(ret[self.times <= 0] == 0))
+
+    def test_heat_filter(self):
+        data = np.random.rand(40, 50)
+        ret = pysfg.filter.heat_filter(data, self.times, 700)
+        for pixel in (0, 20):
+            h = pysfg.filter.heat_time(self.times, data[-1, pixel], 700)
+            self.assertTrue(np.allclose(ret[:, pixel], data[:, pixel] - h))
+        ret1 = pysfg.filter.heat_filter(data + 1, self.times, 700, baseline=1)
+        self.assertTrue(np.allclose(ret1, ret + 1))
+
+    def test_fit_heat(self):
+        data = pysfg.filter.heat_time(self.times, self.H0, self.tau)
+        H0, tau = pysfg.filter.fit_heat(data, self.times, taus=self.tau)
+        self.assertTrue(np.allclose(H0, self.H0))
+        self.assertTrue(np.allclose(tau[self.H0 != 0], self.tau[self.H0 != 0]))
+        H0, tau = pysfg.filter.fit_heat(data, self.times, tau=self.tau, tail=1000)
+        self.assertTrue(np.allclose(H0, self.H0))
+        ret = pysfg.filter.heat_filter(data, self.times, tau='auto', taus=self.tau)
+        self.assertTrue(np.allclose(ret, 0))
+        ret = pysfg.filter.heat_filter(
+            data + 1, self.times, tau='auto', taus=self.tau, baseline=1
+        )
+        self.assertTrue(np.allclose(ret, 1))
+
+
+class TestDrift(unittest.TestCase):
+    # (pp_delay, scans, pixel) data with a linear drift over the acquisition
+    shape = (10, 6, 50)
+    params = [-0.002, 1]
+    background = 100
+
+    def data(self):
+        signal = np.random.rand(*self.shape) + 10
+        drift = np.poly1d(self.params)(np.arange(60)).reshape(self.shape[:2], order='F')
+        return signal * drift[:, :, None] + self.background, signal
+
+    def test_drift_correction(self):
+        data, signal = self.data()
+        background = np.ones_like(data) * self.background
+        ret = pysfg.filter.drift_correction(self.params, data, background)
+        self.assertTrue(np.allclose(ret, signal + self.background))
+        # Old implementation as reference
+        _data = data - background
+        line = np.poly1d(self.params)
+        c_factors = line(0)/line(np.arange(60))
+        c_factors = np.reshape(c_factors, self.shape[:2], order='F')
+        expected = np.transpose(c_factors.T * _data.T) + background
+        self.assertTrue(np.all(ret == expected))
+        ret = pysfg.filter.drift_correction(self.params, data, self.background, inplace=True)
+        self.assertIs(ret, data)
+        self.assertTrue(np.all(ret == expected))
+
+    def test_estimate_drift(self):
+        data, signal = self.data()
+        params = pysfg.filter.estimate_drift(data, self.background, slice(10, 40))
+        self.assertAlmostEqual(params[0]/params[1], self.params[0]/self.params[1], 3)
+        ret = pysfg.filter.drift_correction(params, data, self.background)
+        self.assertTrue(np.allclose(ret, signal + self.background, rtol=1e-3))
+
+
+class TestSpikes(unittest.TestCase):
+    def test_remove_spikes(self):
+        rng = np.random.default_rng(0)
+        signal = np.exp(-np.linspace(-3, 3, 200)**2)*1000 + 500
+        for n_scans in (2, 5):
+            data = rng.normal(signal, 5, (4, n_scans, 2, 200))
+            spikes = np.zeros(data.shape, dtype=bool)
+            spikes[1, 0, 0, 50] = True
+            spikes[2, 1, 1, 100:102] = True
+            spikes[3, 0, 1, 199] = True
+            data[spikes] += 500
+            cleaned, mask = pysfg.filter.remove_spikes(data, chunk_size=3)
+            self.assertTrue(np.all(mask == spikes))
+            self.assertTrue(np.all(cleaned[~mask] == data[~mask]))
+            self.assertTrue(np.all(np.abs(cleaned - signal) < 50))
+
+    def test_no_spikes(self):
+        rng = np.random.default_rng(1)
+        data = rng.normal(1000, 10, (10, 3, 1600))
+        cleaned, mask = pysfg.filter.remove_spikes(data)
+        self.assertFalse(np.any(mask))
+        cleaned, mask = pysfg.filter.remove_spikes(data, inplace=True)
+        self.assertIs(cleaned, data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,18 @@
+import itertools
+import runpy
 import unittest
 import numpy as np
 import pysfg
 import os
 from pathlib import Path
+from scipy.integrate import quad
+from scipy.stats import norm as gaussian
 
 path = os.path.abspath(__file__)
 dir_path = Path(os.path.dirname(path))
+four_level_reference = runpy.run_path(
+    str(dir_path / Path('data/four_level_reference.py'))
+)['four_level_reference']
 
 
 class TestFit(unittest.TestCase):
@@ -36,7 +43,172 @@ class TestFit(unittest.TestCase):
         fit = pysfg.fit.from_json(fname)
         self.assertListEqual(fit.y.tolist(), self.fit.y.tolist())
 
+    def test_four_level_model(self):
+        t = np.concatenate([np.linspace(-2, 10, 300), [-10000, -5, 20, 100]])
+        for params in itertools.product(
+                (0.03, 0.3, 0.9), (0.3, 1.9, 5), (0.7, 2.5), (0.2, 0.85, 1.5),
+                (-0.1, 0.1), (0.1, 0.3), (-1, 0)
+        ):
+            with np.errstate(all='ignore'):
+                reference = four_level_reference(t, *params)
+            model = pysfg.fit.TraceFourLevel.model(None, t, *params)
+            self.assertTrue(np.all(np.isfinite(model)))
+            # The reference overflows far before time zero
+            valid = np.isfinite(reference)
+            self.assertTrue(np.allclose(
+                model[valid], reference[valid], rtol=1e-9, atol=1e-9
+            ))
+        self.assertAlmostEqual(
+            pysfg.fit.TraceFourLevel.model(None, 0.5, *self.values),
+            four_level_reference(0.5, *self.values)
+        )
+
+    def test_fast_decay(self):
+        u, sigma = np.linspace(-1, 1, 41), 0.15
+        for t1 in (0.005, 0.001, 1e-5):
+            rate = 1/t1
+            value = pysfg.fit._convolved_decay(rate, u, sigma)
+            expected = [quad(
+                lambda tau: np.exp(-rate*tau)*gaussian.pdf(time - tau, scale=sigma),
+                0, 50*t1
+            )[0] for time in u]
+            self.assertTrue(np.allclose(value, expected, rtol=1e-6, atol=1e-12))
+        params = dict(self.params, t1=0.001)
+        model = pysfg.fit.TraceFourLevel.model(None, u, *params.values())
+        self.assertTrue(np.all(np.isfinite(model)))
+
+
+def finite_differences(func, x, params, step=1e-6):
+    """Central finite differences of func by all params."""
+    jac = []
+    for i, value in enumerate(params):
+        delta = step*max(1, abs(value))
+        upper, lower = list(params), list(params)
+        upper[i] += delta
+        lower[i] -= delta
+        jac.append((func(x, *upper) - func(x, *lower))/(2*delta))
+    return np.array(jac)
+
+
+class TestGradient(unittest.TestCase):
+    t = np.linspace(-3, 8, 200)
+    cases = (
+        (pysfg.fit.Gaussian, (2, 1, 0.7, 0.3)),
+        (pysfg.fit.TraceExponential, (0.5, 1.7, 0.1, 0.2, -1, 0.3)),
+        (pysfg.fit.TraceFourLevel, (0.3, 1.9, 0.7, 0.85, 0.1, 0.15, -1)),
+        (pysfg.fit.TraceFourLevel, (0.8, 0.4, 1.2, 1.3, -0.2, 0.3, 0)),
+    )
+
+    def test_jacobian(self):
+        for FitClass, params in self.cases:
+            def model(t, *args):
+                return FitClass.model(None, t, *args)
+            jac = FitClass.jacobian(None, self.t, *params)
+            self.assertEqual(jac.shape, (len(params), len(self.t)))
+            self.assertTrue(np.allclose(
+                jac, finite_differences(model, self.t, params), rtol=1e-5, atol=1e-6
+            ), FitClass.__name__)
+
+    def test_grad(self):
+        rng = np.random.default_rng(0)
+        for FitClass, params in self.cases:
+            y = FitClass.model(None, self.t, *params) + rng.normal(0, 0.01, len(self.t))
+            fit = FitClass(self.t, y, np.full_like(self.t, 0.01))
+            start = [1.1*value for value in params]
+            grad = fit.lsq.grad(*start)
+            numeric = finite_differences(lambda x, *args: fit.lsq(*args), None, start)
+            self.assertTrue(np.allclose(grad, numeric, rtol=1e-5), FitClass.__name__)
+
+    def test_migrad(self):
+        rng = np.random.default_rng(1)
+        params = (0.5, 1.7, 0.1, 0.2, -1, 0.3)
+        y = pysfg.fit.TraceExponential.model(None, self.t, *params)
+        y += rng.normal(0, 0.01, len(self.t))
+        fit = pysfg.fit.TraceExponential(
+            self.t, y, np.full_like(self.t, 0.01),
+            A=0.3, t1=1, c=0, mu=0, ofs=-1, sigma=0.5
+        )
+        fit.minuit.migrad()
+        self.assertTrue(fit.minuit.fmin.is_valid)
+        self.assertGreater(fit.minuit.fmin.ngrad, 0)
+        self.assertTrue(np.allclose(fit.minuit.np_values(), params, atol=0.05))
+
+
+class TestBatch(unittest.TestCase):
+    def test_fit_batch(self):
+        t = np.linspace(-3, 8, 200)
+        rng = np.random.default_rng(2)
+        lifetimes = (0.8, 1.5, 3)
+        problems = []
+        for t1 in lifetimes:
+            y = pysfg.fit.TraceExponential.model(None, t, 0.5, t1, 0.1, 0.2, -1, 0.3)
+            y += rng.normal(0, 0.01, len(t))
+            init = dict(A=0.3, t1=1, c=0, mu=0, ofs=-1, sigma=0.5, fix_ofs=True)
+            problems.append((t, y, np.full_like(t, 0.01), init))
+
+        results = pysfg.fit.fit_batch(problems, pysfg.fit.TraceExponential)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results['valid'].all())
+        self.assertTrue(np.allclose(results['t1'], lifetimes, rtol=0.1))
+        self.assertTrue(np.all(results['t1E'] > 0))
+        self.assertEqual(results['ofsE'][0], results['fit'][0]['errors']['ofs'])
+
+        parallel = pysfg.fit.fit_batch(problems, pysfg.fit.TraceExponential, jobs=2)
+        self.assertTrue(parallel.drop(columns='fit').equals(results.drop(columns='fit')))
+        self.assertEqual(list(parallel['fit']), list(results['fit']))
+
+
+class TestGlobalFit(unittest.TestCase):
+    amplitudes = (0.05, 0.08, 0.03)
+    lifetimes = (1.0, 1.5, 0.4)
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.x, self.y, self.yerr = [], [], []
+        for i, (Amp, t1) in enumerate(zip(self.amplitudes, self.lifetimes)):
+            # Traces of different length
+            x = np.linspace(-1, 8, 40 + 5*i)
+            y = pysfg.fit.TraceFourLevel.model(None, x, Amp, t1, 0.7, 0.8, 0.1, 0.15, -1)
+            self.x.append(x)
+            self.y.append(y + rng.normal(0, 0.003, len(x)))
+            self.yerr.append(np.full_like(x, 0.003))
+        self.kwargs = dict(
+            Amp=0.1, t1=1, t2=0.7, c=0.5, mu=0, sigma=0.2, offset=-1,
+            fix_t2=True, fix_offset=True, limit_t1=(0.05, 10), limit_Amp=(0, 1),
+        )
+
+    def test_parameters(self):
+        fit = pysfg.fit.GlobalFit(
+            self.x, self.y, self.yerr, shared=('t2', 'mu', 'sigma'), Amp_2=0.02,
+            **self.kwargs
+        )
+        self.assertEqual(len(fit.minuit.parameters), 15)
+        self.assertEqual(fit.minuit.values['Amp_2'], 0.02)
+        self.assertEqual(fit.minuit.values['Amp_1'], 0.1)
+        self.assertTrue(fit.minuit.fixed['offset_2'])
+        self.assertTrue(fit.minuit.fixed['t2'])
+        with self.assertRaises(ValueError):
+            pysfg.fit.GlobalFit(self.x, self.y, self.yerr, shared=('tau',))
+
+    def test_grad(self):
+        fit = pysfg.fit.GlobalFit(self.x, self.y, self.yerr, **self.kwargs)
+        start = np.array(fit.minuit.np_values()) + 0.01
+        numeric = finite_differences(lambda x, *args: fit.lsq(*args), None, start)
+        self.assertTrue(np.allclose(fit.lsq.grad(*start), numeric, rtol=1e-5))
 
+    def test_migrad(self):
+        fit = pysfg.fit.GlobalFit(self.x, self.y, self.yerr, **self.kwargs)
+        fit.minuit.migrad()
+        self.assertTrue(fit.minuit.fmin.is_valid)
+        results = fit.results
+        self.assertEqual(len(results), 3)
+        self.assertTrue(np.allclose(results['Amp'], self.amplitudes, rtol=0.2))
+        self.assertTrue(np.allclose(results['mu'], 0.1, atol=0.02))
+        self.assertEqual(len(set(results['mu'])), 1)
+        self.assertTrue(np.allclose(
+            fit.fit(self.x[1], 1),
+            pysfg.fit.TraceFourLevel.model(None, self.x[1], *fit.values(1).values())
+        ))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,47 @@
+"""Unittest module for the pysfg.kernels module."""
+
+import unittest
+import numpy as np
+import pysfg
+
+
+class TestKernels(unittest.TestCase):
+    rng = np.random.default_rng(0)
+    a = rng.uniform(1, 2, (20, 30))
+    aE = rng.uniform(0, 0.1, (20, 30))
+    b = rng.uniform(1, 2, (20, 30))
+    bE = rng.uniform(0, 0.1, (20, 30))
+
+    def test_difference(self):
+        value, valueE = pysfg.kernels.difference(self.a, self.aE, self.b, self.bE)
+        self.assertTrue(np.all(value == self.a - self.b))
+        self.assertTrue(np.allclose(valueE, np.sqrt(self.aE**2 + self.bE**2)))
+
+    def test_ratio(self):
+        value, valueE = pysfg.kernels.ratio(self.a, self.aE, self.b, self.bE)
+        self.assertTrue(np.allclose(value, self.a/self.b))
+        self.assertTrue(np.allclose(valueE, np.sqrt(
+            (self.aE/self.b)**2 + (self.a*self.bE/self.b**2)**2
+        )))
+
+    def test_out(self):
+        out, outE = np.empty_like(self.a), np.empty_like(self.a)
+        value, valueE = pysfg.kernels.ratio(
+            self.a, self.aE, self.b, self.bE, out=out, outE=outE
+        )
+        self.assertIs(value, out)
+        self.assertIs(valueE, outE)
+
+    @unittest.skipIf(pysfg.kernels.numexpr is None, 'numexpr is not installed')
+    def test_numexpr(self):
+        for kernel in (pysfg.kernels.difference, pysfg.kernels.ratio):
+            value, valueE = kernel(self.a, self.aE, self.b, self.bE)
+            ne_value, ne_valueE = kernel(
+                self.a, self.aE, self.b, self.bE, backend='numexpr'
+            )
+            self.assertTrue(np.allclose(ne_value, value))
+            self.assertTrue(np.allclose(ne_valueE, valueE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Unittest module for the pysfg.noise module."""
+
+import unittest
+from pathlib import Path
+import numpy as np
+import pysfg
+
+DATA = Path(__file__).parent / 'data'
+
+
+class TestNoiseModel(unittest.TestCase):
+    def test_variance(self):
+        model = pysfg.noise.NoiseModel(
+            sensitivity=4, gain=2, readout=3, dark_current=0.5, exposure_time=10
+        )
+        self.assertEqual(model.electrons_per_count, 2)
+        variance = model.variance(np.array([300, 500, 100]), 300)
+        self.assertTrue(np.allclose(variance, np.array([0, 100, 0]) + 5/4 + 9))
+
+    def test_from_header(self):
+        data = pysfg.read.victor.data_file(DATA / 'gold.dat')
+        model = pysfg.noise.NoiseModel.from_header(data, sensitivity=4, readout=2)
+        self.assertEqual((model.gain, model.exposure_time, model.readout), (1, 15, 2))
+        for fname in ('gold.spe', 'quartz_v2.spe'):
+            model = pysfg.noise.NoiseModel.from_header(
+                pysfg.read.spe.data_file(DATA / fname)
+            )
+            self.assertEqual(model.exposure_time, 10)
+
+    def test_gains(self):
+        # The header gain is the code of the gain setting, not the gain.
+        data = dict(pysfg.read.victor.data_file(DATA / 'gold.dat'), gain=3)
+        model = pysfg.noise.NoiseModel.from_header(data, sensitivity=4)
+        self.assertEqual(model.electrons_per_count, 4)
+        model = pysfg.noise.NoiseModel.from_header(
+            data, sensitivity=4, gains={1: 1, 2: 2, 3: 4}
+        )
+        self.assertEqual(model.electrons_per_count, 1)
+        with self.assertRaises(ValueError):
+            pysfg.noise.NoiseModel.from_header(data, gains={1: 1})
+
+    def test_from_background(self):
+        background = np.random.default_rng(0).normal(300, 2, (10, 20, 1600))
+        model = pysfg.noise.NoiseModel.from_background(background, sensitivity=3)
+        self.assertAlmostEqual(model.readout, 2, places=1)
+        self.assertEqual(model.sensitivity, 3)
+
+
+class TestScanAverage(unittest.TestCase):
+    def test_scan_average(self):
+        rng = np.random.default_rng(0)
+        signal = np.linspace(100, 10000, 200)
+        data = rng.poisson(signal, (50, 8, 200)) + 300.
+        model = pysfg.noise.NoiseModel()
+        mean, meanE = pysfg.noise.scan_average(data, model, 300)
+        self.assertEqual(mean.shape, (50, 200))
+        self.assertTrue(np.allclose(meanE, np.sqrt(signal/8), rtol=0.1))
+        # Uncertainty describes the spread of the mean over pp_delays.
+        spread = np.std(mean, axis=0, ddof=1)
+        self.assertTrue(np.allclose(spread, meanE[0], rtol=0.5))
+        self.assertAlmostEqual(np.mean(spread/np.mean(meanE, axis=0)), 1, places=1)
+
+    def test_noisy_scan(self):
+        rng = np.random.default_rng(1)
+        data = rng.normal(1000, 1, (20, 5, 100))
+        data[:, 0] += rng.normal(0, 100, (20, 100))
+        model = pysfg.noise.NoiseModel(readout=1)
+        mean, meanE = pysfg.noise.scan_average(data, model, 1000)
+        self.assertLess(np.std(mean - 1000), np.std(np.mean(data, axis=1) - 1000))
+
+    def test_pump_probe(self):
+        data = pysfg.read.victor.data_file(DATA / 'gold.dat')
+        model = pysfg.noise.NoiseModel.from_header(data, readout=2)
+        pp = pysfg.experiments.victor.pumpProbe(
+            data, background_data=300, noise_model=model
+        )
+        self.assertEqual(pp.intensityE.shape, pp.intensity.shape)
+        self.assertTrue(np.all(pp.intensityE > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
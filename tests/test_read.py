@@ -34,6 +34,13 @@ class TestSpectrum(unittest.TestCase):
         self.assertAlmostEqual(data['data'].mean(), 588.4231, places=4)
         self.assertAlmostEqual(data['wavelength'].mean(), 699.8086142681037, places=4)
         self.assertEqual(data['ExperimentTimeLocal'], datetime(2017, 3, 2, 14, 28, 52))
+    def test_spe_iter_frames(self):
+        for fname in ("data/sample.spe", "data/sample_v2.spe"):
+            data = pysfg.read.spe.readSpeFile(dir_path / Path(fname))['data']
+            chunks = list(pysfg.read.spe.iter_frames(dir_path / Path(fname), 2))
+            self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+            self.assertTrue(np.all(np.concatenate(chunks) == data))
+            self.assertEqual(chunks[0].dtype, data.dtype)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,159 @@
+"""Unittest module for the pysfg.rebin module."""
+
+import unittest
+import numpy as np
+import pysfg
+from scipy.stats import norm as gaussian
+
+
+class TestRebin(unittest.TestCase):
+    calibration = pysfg.calibration.from_parameters(674, 800, 670, [0.034274, 642.101])
+    wavenumber = calibration.wavenumber
+    pixel = np.arange(1600)
+    pp_delays = np.linspace(-1, 10, 5)
+    intensity = gaussian(2500, 100).pdf(wavenumber)*1000 + 1
+    intensity2d = intensity * gaussian(4, 4).pdf(pp_delays)[:, None]
+
+    def test_matrix(self):
+        source = np.linspace(0, 10, 11)
+        target = np.array([-5, 0, 5, 10, 15])
+        matrix, covered = pysfg.rebin.rebin_matrix(source, target)
+        self.assertEqual(matrix.shape, (5, 11))
+        self.assertListEqual(covered.tolist(), [False, True, True, True, False])
+        self.assertTrue(np.allclose(matrix @ source, [0, 1, 5, 9, 0]))
+        self.assertIs(matrix, pysfg.rebin.rebin_matrix(source, target)[0])
+        with self.assertRaises(ValueError):
+            matrix.data[0] = 0
+        with self.assertRaises(ValueError):
+            covered[0] = True
+
+    def test_descending(self):
+        source = np.linspace(10, 0, 11)
+        target = np.linspace(0.5, 9.5, 10)
+        matrix, covered = pysfg.rebin.rebin_matrix(source, target)
+        self.assertTrue(np.allclose(matrix @ source, target))
+        self.assertTrue(np.all(covered))
+
+    def test_conserves_integral(self):
+        source = np.linspace(0, 10, 101)
+        target = np.linspace(0, 10, 27)
+        density = gaussian(5, 1).pdf(source)
+        matrix, covered = pysfg.rebin.rebin_matrix(source, target)
+        widths = np.diff(pysfg.rebin.bin_edges(target))
+        self.assertAlmostEqual(
+            np.sum(matrix @ density * widths), np.sum(density * 0.1), 2
+        )
+
+    def test_spectrum(self):
+        sp = pysfg.Spectrum(self.intensity, 1, 2, self.wavenumber, 0.1)
+        grid = pysfg.rebin.uniform_grid(self.wavenumber, step=5)
+        rsp = pysfg.rebin.rebin(sp, grid, self.calibration)
+        self.assertEqual(rsp.intensity.shape, grid.shape)
+        self.assertTrue(np.allclose(
+            rsp.normalized, np.interp(grid, self.wavenumber[::-1], sp.normalized[::-1]),
+            atol=0.01
+        ))
+        self.assertTrue(np.all(rsp.intensityE[1:-1] < np.interp(
+            grid, self.wavenumber[::-1], sp.intensityE[::-1])[1:-1]
+        ))
+
+    def test_pumpprobe_and_bleach(self):
+        pp = pysfg.PumpProbe(
+            self.intensity2d, 0, 1, self.wavenumber, self.pp_delays,
+            intensityE=self.intensity2d*0.1
+        )
+        grid = np.arange(2000, 2950, 10)
+        rpp = pysfg.rebin.rebin(pp, grid)
+        self.assertEqual(rpp.intensity.shape, (5, 95))
+        for i in range(5):
+            rsp = pysfg.rebin.rebin(pysfg.Spectrum(
+                pp.intensity[i], wavenumber=self.wavenumber,
+                intensityE=pp.intensityE[i]
+            ), grid)
+            self.assertTrue(np.allclose(rpp.intensity[i], rsp.intensity))
+            self.assertTrue(np.allclose(rpp.intensityE[i], rsp.intensityE))
+        bleach = pp - pp
+        # Only fields that are set are rebinned
+        bleach.normalized
+        bleach = pysfg.rebin.rebin(bleach, grid)
+        self.assertTrue(np.allclose(bleach.normalized, 0))
+        self.assertTrue(np.allclose(bleach.normalizedE, np.sqrt(2)*rpp.normalizedE))
+        self.assertEqual(bleach.intensity, None)
+
+    def test_bleach_missing_fields(self):
+        normalized = self.intensity2d/1000
+        bleach = pysfg.Bleach(
+            normalized=normalized, normalizedE=normalized*0.1,
+            wavenumber=self.wavenumber, pp_delay=self.pp_delays, pixel=self.pixel,
+        )
+        grid = np.arange(2000, 2950, 10)
+        rbleach = pysfg.rebin.rebin(bleach, grid)
+        self.assertEqual(rbleach.normalized.shape, (5, 95))
+        self.assertEqual(rbleach.normalizedE.shape, (5, 95))
+        self.assertEqual(rbleach.intensity, None)
+
+
+class TestStitch(unittest.TestCase):
+    calibrations = [
+        pysfg.calibration.from_parameters(central_wl, 800, 670, [0.034274, 642.101])
+        for central_wl in (660, 674)
+    ]
+    pp_delays = np.linspace(-1, 10, 5)
+
+    def spectra(self, error=0.01):
+        ret = []
+        for calibration in self.calibrations:
+            wavenumber = calibration.wavenumber
+            intensity = gaussian(2500, 300).pdf(wavenumber)*1000
+            ret.append(pysfg.Spectrum(
+                intensity, 0, 2, wavenumber, np.ones_like(intensity)*error
+            ))
+        return ret
+
+    def test_stitch(self):
+        spectra = self.spectra()
+        grid = np.arange(1500, 3400, 5.)
+        sp = pysfg.rebin.stitch(spectra, grid)
+        wavenumber = np.concatenate([s.wavenumber for s in spectra])
+        covered = (grid > wavenumber.min() + 5) & (grid < wavenumber.max() - 5)
+        self.assertTrue(np.allclose(
+            sp.intensity[covered], gaussian(2500, 300).pdf(grid[covered])*500, atol=1e-3
+        ))
+        self.assertTrue(np.all(np.isnan(sp.intensity[~covered][[0, -1]])))
+        # In the overlap both spectra contribute
+        first = pysfg.rebin.rebin(spectra[0], grid)
+        second = pysfg.rebin.rebin(spectra[1], grid)
+        overlap = np.isfinite(first.intensity) & np.isfinite(second.intensity)
+        self.assertTrue(np.any(overlap))
+        self.assertTrue(np.allclose(
+            sp.intensityE[overlap],
+            (first.normalizedE[overlap]**-2 + second.normalizedE[overlap]**-2)**-0.5
+        ))
+
+    def test_weights(self):
+        spectra = self.spectra()
+        spectra[1].intensity = spectra[1].intensity * 2
+        spectra[1].intensityE = spectra[1].intensityE * 1000
+        grid = np.arange(2400, 2600, 5.)
+        sp = pysfg.rebin.stitch(spectra, grid)
+        first = pysfg.rebin.rebin(spectra[0], grid)
+        self.assertTrue(np.allclose(sp.intensity, first.normalized, rtol=1e-5))
+
+    def test_pumpprobe(self):
+        spectra = self.spectra()
+        pps = [pysfg.PumpProbe(
+            np.outer(self.pp_delays, s.intensity), 0, 2, s.wavenumber,
+            self.pp_delays, intensityE=0.01
+        ) for s in spectra]
+        grid = np.arange(1800, 3000, 5.)
+        pp = pysfg.rebin.stitch(pps, grid)
+        sp = pysfg.rebin.stitch([pysfg.Spectrum(
+            p.intensity[-1], 0, 2, p.wavenumber, p.intensityE[-1]
+        ) for p in pps], grid)
+        self.assertEqual(pp.intensity.shape, (5, len(grid)))
+        self.assertTrue(np.allclose(pp.intensity[-1], sp.intensity, equal_nan=True))
+        self.assertTrue(np.allclose(pp.intensityE[-1], sp.intensityE, equal_nan=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
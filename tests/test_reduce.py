@@ -0,0 +1,93 @@
+"""Unittest module for the pysfg.reduce module."""
+
+import unittest
+import numpy as np
+import pysfg
+from scipy.stats import sem
+
+
+class TestAggregate(unittest.TestCase):
+    rng = np.random.default_rng(0)
+    data = rng.normal(1000, 30, (6, 5, 3, 1600))
+
+    def test_identical(self):
+        for scans in (4, 5):
+            data = self.data[:, :scans]
+            for dtype in (float, np.uint16):
+                typed = data.astype(dtype)
+                stats = pysfg.reduce.aggregate(
+                    typed, ('median', 'mean', 'std', 'sem'), block_size=100
+                )
+                self.assertTrue(np.array_equal(stats['median'], np.median(typed, axis=1)))
+                self.assertTrue(np.array_equal(stats['mean'], np.mean(typed, axis=1)))
+                self.assertTrue(np.array_equal(
+                    stats['std'], np.std(typed, axis=1, ddof=1)
+                ))
+                self.assertTrue(np.array_equal(stats['sem'], sem(typed, axis=1)))
+
+    def test_axes(self):
+        stats = pysfg.reduce.aggregate(self.data, 'median', axis=(0, 1))
+        self.assertTrue(np.array_equal(
+            stats['median'], np.median(self.data, axis=(0, 1))
+        ))
+        data = self.data.copy()
+        data[0, 1, 0, 10] = np.nan
+        stats = pysfg.reduce.aggregate(data, 'median')
+        self.assertTrue(np.array_equal(
+            stats['median'], np.median(data, axis=1), equal_nan=True
+        ))
+        with self.assertRaises(ValueError):
+            pysfg.reduce.aggregate(self.data, 'median', axis=-1)
+        with self.assertRaises(ValueError):
+            pysfg.reduce.aggregate(self.data, 'mode')
+
+    def test_threads(self):
+        single = pysfg.reduce.aggregate(self.data, ('median', 'sem'), threads=1)
+        for tile_size in (1, 4, 16):
+            threaded = pysfg.reduce.aggregate(
+                self.data, ('median', 'sem'), block_size=64, tile_size=tile_size,
+                threads=4,
+            )
+            for name in single:
+                self.assertTrue(np.array_equal(single[name], threaded[name]))
+        threads = pysfg.reduce.get_num_threads()
+        try:
+            pysfg.reduce.set_num_threads(3)
+            self.assertEqual(pysfg.reduce.get_num_threads(), 3)
+            threaded = pysfg.reduce.aggregate(
+                self.data, 'median', axis=(0, 1), block_size=100
+            )
+            self.assertTrue(np.array_equal(
+                threaded['median'], np.median(self.data, axis=(0, 1))
+            ))
+            with self.assertRaises(ValueError):
+                pysfg.reduce.set_num_threads(0)
+        finally:
+            pysfg.reduce.set_num_threads(threads)
+
+    def test_clipped_mean(self):
+        data = np.ones((2, 9, 10))
+        data[:, ::2] = 3
+        data[1, 4, 5] = 100
+        stats = pysfg.reduce.aggregate(data, 'clipped_mean', clip=2)
+        self.assertTrue(np.allclose(
+            stats['clipped_mean'][0], np.mean(data[0], axis=0)
+        ))
+        self.assertAlmostEqual(stats['clipped_mean'][1, 5], 2)
+
+    def test_weighted_mean(self):
+        data = np.array([[1, 2, np.nan], [3, 2, 1]])[:, :, None]
+        errors = np.array([[1, 1, np.inf], [1, 2, 1]])[:, :, None]
+        stats = pysfg.reduce.aggregate(
+            data, ('weighted_mean', 'weighted_meanE'), axis=0, errors=errors
+        )
+        self.assertTrue(np.allclose(stats['weighted_mean'][:, 0], [2, 2, 1]))
+        self.assertTrue(np.allclose(
+            stats['weighted_meanE'][:, 0], [np.sqrt(1/2), np.sqrt(4/5), 1]
+        ))
+        with self.assertRaises(ValueError):
+            pysfg.reduce.aggregate(data, 'weighted_mean')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 
 import unittest
+import shutil
+import tempfile
+import numpy as np
 import pysfg
 from pathlib import Path
 
@@ -37,7 +40,31 @@ class TestScriptTimescan(unittest.TestCase):
         }
         script.run(config, self.config_path)
 
-
+    def test_channels(self):
+        out = Path(tempfile.mkdtemp())
+        config = {
+            "intensity_data": "data/ts_gold.dat",
+            "intensity_selector": {"pixel": [520, 810]},
+            "background_data": 300,
+            "channels": [
+                {"spectra": 0, "out": str(out / "channel0.json")},
+                {"spectra": 1, "out": str(out / "channel1.json")},
+            ],
+        }
+        script.run(config, dir_path)
+        for spectra in (0, 1):
+            single = {
+                "intensity_data": "data/ts_gold.dat",
+                "intensity_selector": {"pixel": [520, 810], "spectra": spectra},
+                "background_data": 300,
+                "out": str(out / "single.json"),
+            }
+            script.run(single, dir_path)
+            channel = pysfg.spectrum.json_to_pumpprobe(out / ("channel%d.json" % spectra))
+            single = pysfg.spectrum.json_to_pumpprobe(out / "single.json")
+            self.assertTrue(np.array_equal(channel.intensity, single.intensity))
+            self.assertTrue(np.array_equal(channel.intensityE, single.intensityE))
+        shutil.rmtree(out)
 
 
 if __name__ == '__main__':
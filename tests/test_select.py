@@ -28,5 +28,47 @@ class TestSelectorPP(unittest.TestCase):
         self.assertTrue(np.all(self.data[p.tselect] == self.data[:, slice(2), :, :]))
 
 
+    def test_physical_units(self):
+        calibration = pysfg.calibration.from_parameters(674, 800, 670, [0.034274, 642.101], 8)
+        timedelay = np.array([-500, 0, 500, 1000])
+        wavenumber = calibration.wavenumber
+        p = pysfg.select.SelectorPP(
+            wavenumber=[wavenumber[5], wavenumber[2]], calibration=calibration,
+            delay=[0, 600], timedelay=timedelay
+        )
+        self.assertTrue(np.all(self.data[p.tselect] == self.data[1:3, :, :, 2:6]))
+        with self.assertRaises(ValueError):
+            pysfg.select.SelectorPP(wavenumber=[2800, 3000])
+        # Ranges and indices of the same axis can not be combined
+        with self.assertRaises(ValueError):
+            pysfg.select.SelectorPP(
+                pixel=slice(400, 1200), wavenumber=[2800, 3000], calibration=calibration
+            )
+        with self.assertRaises(ValueError):
+            pysfg.select.SelectorPP(pp_delays=[0, 3], delay=[0, 600], timedelay=timedelay)
+
+
+class TestRangeToSlice(unittest.TestCase):
+    def test_range_to_slice(self):
+        for axis in (np.linspace(0, 10, 21), np.linspace(10, 0, 21), np.array([3., 2, 2, 1])):
+            for start, stop in ((2, 5), (5, 2), (-1, 1.2), (2.1, 2.2), (None, 3), (20, 30)):
+                for closed in (True, False):
+                    lower = -np.inf if start is None else min(start, stop)
+                    upper = max(start if start is not None else -np.inf, stop)
+                    if closed:
+                        index = np.where((axis >= lower) & (axis <= upper))[0]
+                    else:
+                        index = np.where((axis > lower) & (axis < upper))[0]
+                    sl = pysfg.select.range_to_slice(axis, start, stop, closed)
+                    self.assertListEqual(list(range(len(axis))[sl]), index.tolist())
+
+    def test_to_pixel(self):
+        calibration = pysfg.calibration.from_parameters(674, 800, 670, [0.034274, 642.101])
+        pixel = np.array([0, 17, 800, 1599])
+        self.assertTrue(np.all(calibration.wavenumber_to_pixel(calibration.wavenumber[pixel]) == pixel))
+        self.assertTrue(np.all(calibration.wavelength_to_pixel(calibration.wavelength[pixel] + 0.001) == pixel))
+        self.assertEqual(calibration.wavenumber_to_pixel(10**6), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
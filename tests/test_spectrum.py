@@ -154,6 +154,131 @@ class TestBleach(unittest.TestCase):
         tr = self.bleach.get_trace(slice(20, 30))
         self.assertEqual(tr.bleach.mean(), 0.005120605673482265)
 
+    def test_lazy(self):
+        bleach = self.pp - self.pp2
+        self.assertEqual(bleach._fields.get('normalized'), None)
+        self.assertTrue(np.all(
+            bleach.normalized == self.pp.normalized - self.pp2.normalized
+        ))
+        self.assertEqual(bleach._fields.get('intensityE'), None)
+
+    def test_df_fields(self):
+        bleach = self.pp - self.pp2
+        df = bleach.to_df(['intensity', 'normalized'])
+        self.assertEqual(
+            set(df.name.unique()), {'intensity', 'normalized', 'wavenumber', 'pixel'}
+        )
+        self.assertEqual(bleach._fields.get('basesubed'), None)
+        bleach.to_json(
+            dir_path / Path("bleach.json"), fields=['normalized', 'normalizedE']
+        )
+        data = pysfg.spectrum.json_to_bleach(dir_path / Path("bleach.json"))
+        self.assertTrue(np.allclose(data.normalized, bleach.normalized))
+        self.assertTrue(np.allclose(data.pp_delay, self.pp_delays))
+        self.assertEqual(data.intensity, None)
+        data.to_json(dir_path / Path("bleach.json"))
+        data = pysfg.spectrum.json_to_bleach(dir_path / Path("bleach.json"))
+        self.assertTrue(np.allclose(data.pp_delay, self.pp_delays))
+
+    def test_json_all_fields(self):
+        bleach = self.pp - self.pp2
+        bleach.to_json(dir_path / Path("bleach.json"))
+        self.assertEqual(bleach._parents, None)
+        data = pysfg.spectrum.json_to_bleach(dir_path / Path("bleach.json"))
+        for name in bleach.fields:
+            self.assertTrue(np.allclose(
+                getattr(data, name), getattr(bleach, name), rtol=1e-6
+            ), name)
+
+    def test_materialize(self):
+        bleach = (self.pp / self.pp2).materialize()
+        self.assertEqual(bleach._parents, None)
+        for name in bleach.fields:
+            self.assertEqual(getattr(bleach, name).shape, (20, 99))
+
+    def test_add(self):
+        bleach = self.bleach + self.bleach
+        self.assertTrue(np.allclose(bleach.normalized, 2*self.bleach.normalized))
+        self.assertTrue(np.allclose(bleach.normalizedE, np.sqrt(2)*self.bleach.normalizedE))
+        bleach = (self.bleach - self.bleach/2) * 2
+        self.assertTrue(np.allclose(bleach.normalized, self.bleach.normalized))
+
+    def test_average(self):
+        bleach2 = self.bleach * 1.1
+        bleach2.normalizedE = self.bleach.normalizedE * 2
+        mean = pysfg.spectrum.average([self.bleach, bleach2])
+        w1, w2 = 1, 1/4
+        expected = (w1*self.bleach.normalized + w2*bleach2.normalized)/(w1 + w2)
+        self.assertTrue(np.allclose(mean.normalized, expected))
+        self.assertTrue(np.allclose(
+            mean.normalizedE, self.bleach.normalizedE/np.sqrt(w1 + w2)
+        ))
+        mean = pysfg.spectrum.average([self.bleach, bleach2], weighted=False)
+        self.assertTrue(np.allclose(
+            mean.normalized, (self.bleach.normalized + bleach2.normalized)/2
+        ))
+
+    def test_missing_fields(self):
+        bleach = pysfg.Bleach(
+            normalized=self.bleach.normalized, normalizedE=self.bleach.normalizedE,
+            wavenumber=self.wavenumber, pp_delay=self.pp_delays, pixel=self.pixel,
+        )
+        for result in (
+                bleach + bleach, bleach - bleach, bleach * 2,
+                pysfg.spectrum.average([bleach, bleach]),
+        ):
+            self.assertEqual(result.intensity, None)
+            self.assertEqual(result.baseline, None)
+            self.assertEqual(result.normalized.shape, (20, 99))
+        mean = pysfg.spectrum.average([bleach, bleach])
+        self.assertTrue(np.allclose(mean.normalized, bleach.normalized))
+
+    def test_combine_baseline(self):
+        bleach = self.bleach + self.bleach
+        self.assertTrue(np.allclose(bleach.baseline, self.bleach.baseline))
+        self.assertTrue(np.allclose(bleach.norm, self.bleach.norm))
+
+    def test_average_pumpprobe(self):
+        mean = pysfg.spectrum.average([self.pp, self.pp2])
+        self.assertIsInstance(mean, pysfg.PumpProbe)
+        self.assertEqual(mean.intensity.shape, (20, 99))
+
+    def test_average_align(self):
+        pp = pysfg.PumpProbe(
+            self.intensity[2:], self.baseline[2:], self.norm, self.wavenumber,
+            self.pp_delays[2:], intensityE=self.intensityE[2:], pixel=self.pixel
+        )
+        with self.assertRaises(ValueError):
+            pysfg.spectrum.average([self.pp, pp])
+        mean = pysfg.spectrum.average([self.pp, pp], align=True)
+        self.assertTrue(np.all(mean.pp_delay == self.pp_delays[2:]))
+        self.assertTrue(np.allclose(mean.intensity, self.intensity[2:]))
+        stacked = pysfg.spectrum.stack([self.pp, pp], 'intensity', align=True)
+        self.assertEqual(stacked.shape, (2, 18, 99))
+
+    def test_traces(self):
+        windows = [(20, 30), (40, 60), (0, 100)]
+        traces = self.bleach.get_traces(windows)
+        self.assertEqual(traces.bleach.shape, (3, 20))
+        for window, trace in zip(windows, traces.traces):
+            tr = self.bleach.get_trace(slice(*window))
+            self.assertTrue(np.allclose(trace.bleach, tr.bleach))
+            self.assertTrue(np.allclose(trace.bleachE, tr.bleachE))
+
+    def test_traces_wavenumber(self):
+        traces = self.bleach.get_traces(wavenumber=[(50, 70)])
+        index = np.where((self.wavenumber > 50) & (self.wavenumber < 70))[0]
+        self.assertTrue(np.allclose(
+            traces.bleach[0], self.bleach.normalized[:, index].mean(axis=1)
+        ))
+
+    def test_traces_to_and_from_json(self):
+        traces = self.bleach.get_traces([(20, 30), (40, 60)])
+        traces.to_json(dir_path / Path("traces.json"))
+        tr = pysfg.json_to_tracestack(dir_path / Path("traces.json"))
+        self.assertTrue(np.allclose(tr.bleach, traces.bleach))
+        self.assertTrue(np.all(tr.pixel == traces.pixel))
+
     def test_to_and_from_json(self):
         os.chdir(dir_path)
         self.bleach.to_json(Path("bleach.json"))
@@ -161,6 +286,128 @@ class TestBleach(unittest.TestCase):
         self.assertTrue(np.all(bleach.intensity - self.bleach.intensity < 0.0001))
 
 
+class TestPSSHG(unittest.TestCase):
+    pixel = np.arange(160)
+    local_oszillator = gaussian(80, 30).pdf(pixel)*1000
+    sample = gaussian(80, 30).pdf(pixel)*10
+    field = np.sqrt(local_oszillator*sample)
+    interference = local_oszillator + sample + 2*field*np.cos(0.4*pixel)
+
+    def test_cache(self):
+        ps = pysfg.spectrum.PSSHG(
+            self.interference, self.local_oszillator, self.sample, mask=slice(4, 70)
+        )
+        spectrum = ps.spectrum
+        self.assertIs(ps.spectrum, spectrum)
+        self.assertTrue(np.allclose(
+            spectrum, np.fft.fft(np.fft.ifft(ps.cross_term)*ps.mask)
+        ))
+        ps.mask = None
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term))
+        ps.sample = self.sample*2
+        self.assertTrue(np.allclose(
+            ps.cross_term, self.interference - self.local_oszillator - 2*self.sample
+        ))
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term))
+
+    def test_phaseshift(self):
+        ps = pysfg.spectrum.PSSHG(
+            self.interference, self.local_oszillator, self.sample, mask=slice(4, 70)
+        )
+        ps.reference = ps.spectrum*np.exp(0.5j)*2
+        self.assertAlmostEqual(ps.phaseshift, 0.5, 4)
+        self.assertAlmostEqual(ps.amplitude, 2, 4)
+        phaseshift, amplitude = ps.phaseshift, ps.amplitude
+        ret = ps.minimize_phaseshift()
+        self.assertAlmostEqual(ret.x[0], phaseshift, 4)
+        self.assertAlmostEqual(ret.x[1], amplitude, 4)
+
+    def test_solve_phaseshift(self):
+        spectrum = np.fft.fft(self.field*np.exp(0.3j*self.pixel))
+        phases = np.array([-3, -1, 0, 2])
+        amplitudes = np.array([0.5, 1, 2, 3])
+        reference = amplitudes[:, None]*spectrum*np.exp(1j*phases[:, None])
+        phaseshift, amplitude = pysfg.spectrum.solve_phaseshift(
+            spectrum, reference
+        )
+        self.assertTrue(np.allclose(phaseshift, phases))
+        self.assertTrue(np.allclose(amplitude, amplitudes))
+
+    def test_stack(self):
+        phases = np.array([0, 0.5, 1])
+        interference = self.local_oszillator + self.sample + 2*self.field*np.cos(
+            0.4*self.pixel + phases[:, None]
+        )
+        ps = pysfg.spectrum.PSSHGStack(
+            interference, self.local_oszillator, self.sample, mask=slice(4, 70)
+        )
+        ps.reference = ps.frame(0).spectrum
+        self.assertEqual(ps.spectrum.shape, (3, 160))
+        self.assertEqual(ps.phaseshift.shape, (3,))
+        for i in range(len(ps)):
+            frame = ps.frame(i)
+            self.assertTrue(np.allclose(ps.spectrum[i], frame.spectrum))
+            self.assertAlmostEqual(ps.phaseshift[i], frame.phaseshift)
+            self.assertTrue(np.allclose(
+                ps.spectrum_phaseshifted[i], frame.spectrum_phaseshifted
+            ))
+        self.assertAlmostEqual(ps.phaseshift_mean, ps.phaseshift[1], 4)
+        self.assertAlmostEqual(ps.amplitude_mean, 1, 2)
+
+    def test_fft_length(self):
+        ps = pysfg.spectrum.PSSHG(
+            self.interference[:157], self.local_oszillator[:157],
+            self.sample[:157], np.linspace(400, 420, 157), fft_length='fast'
+        )
+        self.assertEqual(ps.fft_size, 160)
+        self.assertEqual(ps.mask.shape, (160,))
+        self.assertEqual(ps.time_delay.shape, (160,))
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term))
+        ps.fft_length = 200
+        self.assertEqual(ps.time_domain.shape, (200,))
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term))
+
+    def test_resample(self):
+        wavelength = np.linspace(400, 420, 160)
+        ps = pysfg.spectrum.PSSHG(
+            self.interference, self.local_oszillator, self.sample, wavelength,
+            resample=True
+        )
+        spacing = np.diff(ps.THz_uniform)
+        self.assertTrue(np.allclose(spacing, spacing[0]))
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term, atol=0.1))
+        ps.wavelength = wavelength[::-1]
+        self.assertTrue(np.allclose(ps.spectrum, ps.cross_term, atol=0.1))
+
+    def test_interpolation_matrix(self):
+        x = np.array([3, 1, 2, 5, 4.5])
+        y = x**2
+        xp = np.linspace(0, 6, 13)
+        matrix = pysfg.spectrum.interpolation_matrix(x, xp)
+        order = np.argsort(x)
+        self.assertTrue(np.allclose(matrix @ y, np.interp(xp, x[order], y[order])))
+        self.assertIs(matrix, pysfg.spectrum.interpolation_matrix(x, xp))
+        with self.assertRaises(ValueError):
+            matrix.data[0] = 0
+
+    def test_phase_drift(self):
+        phases = np.linspace(0, 1, 5)
+        interference = self.local_oszillator + self.sample + 2*self.field*np.cos(
+            0.4*self.pixel + phases[:, None]
+        )
+        ps = pysfg.spectrum.PSSHGStack(
+            interference, self.local_oszillator, self.sample, mask=slice(4, 70)
+        )
+        ps.reference = ps.frame(2).spectrum
+        phaseshift, amplitude, spectrum = pysfg.spectrum.phase_drift(
+            (interference[:2], interference[2:]), self.local_oszillator,
+            self.sample, ps.reference, mask=slice(4, 70)
+        )
+        self.assertTrue(np.allclose(phaseshift, ps.phaseshift))
+        self.assertTrue(np.allclose(amplitude, ps.amplitude))
+        self.assertTrue(np.allclose(spectrum, ps.reference, atol=1e-2))
+
+
 class TestTrace(unittest.TestCase):
     pp_delays = np.linspace(-1, 10, 20)
     bleach = np.linspace(1, -1, 20)